@@ -1,4 +1,8 @@
 import logging
+from agent_builder.metrics import STAGE_SECONDS
+from agent_builder.components.batch import bounded_map, abounded_map
+from agent_builder.components.memory import Memory
+from agent_builder.llm_providers.rate_limit import BULK, priority
 from agent_builder.tools.format_response_tool import FormatResponseTool
 
 class Agent:
@@ -11,19 +15,131 @@ class Agent:
         self.planner = planner
         self.executor = executor
         self.formatter = FormatResponseTool()
+        # The planner routes commands to, and recognises calls of, the tools this executor has
+        if hasattr(planner, 'use_tools') and hasattr(executor, 'tool_registry'):
+            planner.use_tools(executor.tool_registry)
 
-    def act(self, input_data, format_response=True, show_full_details=False):
+    def act(self, input_data, format_response=True, show_full_details=False, defer_format=False):
+        """
+        Run one turn. With format_response, LLM replies are formatted for display (the provider's
+        raw response when show_full_details is set); defer_format=True returns a DeferredFormat
+        that formats only when it is printed or converted to str.
+        """
+        return self._act(input_data, self.memory, format_response, show_full_details, defer_format)
+
+    def _act(self, input_data, memory, format_response, show_full_details, defer_format=False):
+        try:
+            with STAGE_SECONDS.time(stage="act"):
+                with STAGE_SECONDS.time(stage="plan"):
+                    plan = self.planner.plan(input_data, memory)
+                with STAGE_SECONDS.time(stage="execute"):
+                    result = self.executor.execute(plan)
+                with STAGE_SECONDS.time(stage="memory"):
+                    memory.add_interaction(input_data=input_data, result=result)
+                with STAGE_SECONDS.time(stage="format"):
+                    return self._present(plan, result, format_response, show_full_details, defer_format)
+        except Exception as e:
+            logging.exception(f"Agent act error for input: {input_data}")
+            memory.add_interaction(input_data=input_data, result=f"Agent error: {str(e)}")
+            return f"Agent error: {str(e)}"
+
+    def _present(self, plan, result, format_response, show_full_details, defer_format=False):
+        # If it's an LLM response and formatting is requested, format for display. The raw
+        # provider response is a lazy view: it is only converted when full details are shown
+        if format_response and plan.get('type') == 'llm_response':
+            value = plan['raw'] if show_full_details and plan.get('raw') is not None else result
+            return self.formatter.defer(value) if defer_format else self.formatter.run(value)
+        return result
+
+    async def aact(self, input_data, format_response=True, show_full_details=False, defer_format=False):
+        """
+        Asynchronous counterpart of act(). Many agents (each with its own memory) can run
+        concurrently on one event loop.
+        """
+        return await self._aact(input_data, self.memory, format_response, show_full_details, defer_format)
+
+    async def _aact(self, input_data, memory, format_response, show_full_details, defer_format=False):
+        try:
+            with STAGE_SECONDS.time(stage="act"):
+                with STAGE_SECONDS.time(stage="plan"):
+                    plan = await self.planner.aplan(input_data, memory)
+                with STAGE_SECONDS.time(stage="execute"):
+                    result = await self.executor.aexecute(plan)
+                with STAGE_SECONDS.time(stage="memory"):
+                    memory.add_interaction(input_data=input_data, result=result)
+                with STAGE_SECONDS.time(stage="format"):
+                    return self._present(plan, result, format_response, show_full_details, defer_format)
+        except Exception as e:
+            logging.exception(f"Agent act error for input: {input_data}")
+            memory.add_interaction(input_data=input_data, result=f"Agent error: {str(e)}")
+            return f"Agent error: {str(e)}"
+
+    def act_many(self, inputs, concurrency=8, ordered=True, memory_factory=None, format_response=False):
+        """
+        Run many independent inputs through the agent on a thread pool with at most `concurrency`
+        turns in flight. Inputs are consumed lazily and results are yielded as a stream: in input
+        order when ordered=True, otherwise as (index, result) pairs as soon as each completes.
+        Each input gets its own memory from memory_factory (default: an empty memory that keeps
+        nothing); the agent's own memory is never touched. Batch turns run at BULK priority, so
+        rate-limited providers serve interactive act() calls first.
+        """
+        def run(input_data):
+            with priority(BULK):
+                return self._act(input_data, self._batch_memory(memory_factory), format_response, False)
+        return bounded_map(run, inputs, concurrency=concurrency, ordered=ordered)
+
+    def aact_many(self, inputs, concurrency=8, ordered=True, memory_factory=None, format_response=False):
+        """
+        Asynchronous counterpart of act_many(): an async generator running at most `concurrency`
+        turns at a time on the current event loop.
+        """
+        async def run(input_data):
+            with priority(BULK):
+                return await self._aact(input_data, self._batch_memory(memory_factory), format_response, False)
+        return abounded_map(run, inputs, concurrency=concurrency, ordered=ordered)
+
+    @staticmethod
+    def _batch_memory(memory_factory):
+        return memory_factory() if memory_factory else Memory(max_turns=0)
+
+    def act_stream(self, input_data):
+        """
+        Streaming counterpart of act(): yields text deltas as the LLM produces them. Tool actions
+        yield the tool result once it is available. The complete result is added to memory when
+        the stream is exhausted.
+        """
+        try:
+            stream = self.planner.plan_stream(input_data, self.memory)
+            for delta in stream:
+                yield delta
+            # plan is not timed here: the generator's time includes the consumer's
+            with STAGE_SECONDS.time(stage="execute"):
+                result = self.executor.execute(stream.plan)
+            if stream.plan.get('type') != 'llm_response':
+                yield str(result)
+            with STAGE_SECONDS.time(stage="memory"):
+                self.memory.add_interaction(input_data=input_data, result=result)
+        except Exception as e:
+            logging.exception(f"Agent act error for input: {input_data}")
+            self.memory.add_interaction(input_data=input_data, result=f"Agent error: {str(e)}")
+            yield f"Agent error: {str(e)}"
+
+    async def aact_stream(self, input_data):
+        """
+        Asynchronous counterpart of act_stream().
+        """
         try:
-            plan = self.planner.plan(input_data, self.memory)
-            result = self.executor.execute(plan)
-            self.memory.add_interaction(input_data=input_data, result=result)
-            # If it's an LLM response and formatting is requested, format for display
-            if format_response and plan.get('type') == 'llm_response':
-                if show_full_details and plan.get('raw') is not None:
-                    return self.formatter.run(plan['raw'])
-                return self.formatter.run(result)
-            return result
+            stream = self.planner.aplan_stream(input_data, self.memory)
+            async for delta in stream:
+                yield delta
+            # plan is not timed here: the generator's time includes the consumer's
+            with STAGE_SECONDS.time(stage="execute"):
+                result = await self.executor.aexecute(stream.plan)
+            if stream.plan.get('type') != 'llm_response':
+                yield str(result)
+            with STAGE_SECONDS.time(stage="memory"):
+                self.memory.add_interaction(input_data=input_data, result=result)
         except Exception as e:
             logging.exception(f"Agent act error for input: {input_data}")
             self.memory.add_interaction(input_data=input_data, result=f"Agent error: {str(e)}")
-            return f"Agent error: {str(e)}" 
\ No newline at end of file
+            yield f"Agent error: {str(e)}"
@@ -0,0 +1,8 @@
+from .servers import LatencyModel, ServerHandle, StandInServer, start_stand_in_server
+
+__all__ = [
+    'LatencyModel',
+    'ServerHandle',
+    'StandInServer',
+    'start_stand_in_server',
+]
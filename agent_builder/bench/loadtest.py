@@ -0,0 +1,222 @@
+"""
+End-to-end load test against local stand-in LLM servers.
+
+    agent-builder-bench --provider ollama --provider openai --concurrency 16 --turns 500 \
+        --latency lognormal --latency-ms 40 --mode async
+
+Starts a stand-in server (see agent_builder.bench.servers), drives Agent.act / aact /
+act_stream through the real provider classes at the requested concurrency, and prints one JSON
+report per provider: throughput, p50/p95/p99 turn latency, time to first token when streaming,
+and framework overhead per turn (client-observed latency minus the time the server spent on the
+request), plus the mean time of each agent stage from agent_builder.metrics.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from agent_builder import metrics
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import CONVERSATION_TEMPLATE, Planner
+from .servers import LatencyModel, ServerHandle, start_stand_in_server
+
+PROVIDERS = ("ollama", "anaconda", "openai")
+MODES = ("sync", "async", "stream")
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_ms(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    return {
+        "mean": statistics.fmean(ordered) * 1000,
+        "p50": percentile(ordered, 50) * 1000,
+        "p95": percentile(ordered, 95) * 1000,
+        "p99": percentile(ordered, 99) * 1000,
+        "max": ordered[-1] * 1000,
+    }
+
+
+def build_llm(provider: str, server: ServerHandle, pool_maxsize: int) -> Any:
+    if provider == "ollama":
+        from agent_builder.llm_providers.ollama_llm import OllamaLLM
+        return OllamaLLM(model=server.model_name, base_url=server.url, pool_maxsize=pool_maxsize)
+    if provider == "anaconda":
+        from agent_builder.llm_providers.anaconda_llm import AnacondaLLM
+        return AnacondaLLM(model=server.model_name, base_url=server.url, pool_maxsize=pool_maxsize)
+    if provider == "openai":
+        from agent_builder.llm_providers.openai_llm import OpenAILLM
+        return OpenAILLM(model=server.model_name, api_key="bench", base_url=f"{server.url}/v1", confirm_tokens=False)
+    raise ValueError(f"Unknown provider {provider!r}; expected one of {', '.join(PROVIDERS)}")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_tokens: List[float] = []
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, first_token: Optional[float], result: Any) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+            if first_token is not None:
+                self.first_tokens.append(first_token)
+            if isinstance(result, str) and result.startswith(("Agent error", "Planning error", "An error occurred")):
+                self.errors += 1
+
+
+def _sync_turn(agent: Agent, prompt: str, recorder: Recorder, stream: bool) -> None:
+    start = time.perf_counter()
+    first = None
+    if stream:
+        parts = []
+        for delta in agent.act_stream(prompt):
+            if first is None:
+                first = time.perf_counter() - start
+            parts.append(delta)
+        result = "".join(parts)
+    else:
+        result = agent.act(prompt, format_response=False)
+    recorder.record(time.perf_counter() - start, first, result)
+
+
+def run_threads(make_agent, prompts: List[str], concurrency: int, recorder: Recorder, stream: bool) -> None:
+    # One agent (session memory) per worker, like one chat session per connection
+    local = threading.local()
+
+    def turn(prompt):
+        agent = getattr(local, "agent", None)
+        if agent is None:
+            agent = local.agent = make_agent()
+        _sync_turn(agent, prompt, recorder, stream)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(turn, prompts))
+
+
+async def run_async(make_agent, prompts: List[str], concurrency: int, recorder: Recorder) -> None:
+    queue = list(reversed(prompts))
+
+    async def worker():
+        agent = make_agent()
+        while queue:
+            prompt = queue.pop()
+            start = time.perf_counter()
+            result = await agent.aact(prompt, format_response=False)
+            recorder.record(time.perf_counter() - start, None, result)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def run_provider(provider: str, args: argparse.Namespace) -> Dict[str, Any]:
+    latency = LatencyModel(args.latency, args.latency_ms / 1000, args.spread, seed=args.seed)
+    server = start_stand_in_server(in_process=args.in_process, latency=latency, reply_tokens=args.reply_tokens,
+                                   token_delay=args.token_ms / 1000)
+    try:
+        llm = build_llm(provider, server, pool_maxsize=args.concurrency)
+        planner = Planner(llm=llm, prompt_template=CONVERSATION_TEMPLATE)
+        executor = Executor()
+
+        def make_agent():
+            return Agent(Memory(max_turns=args.memory_turns), planner, executor)
+
+        def drive(prompts, recorder):
+            if args.mode == "async":
+                asyncio.run(run_async(make_agent, prompts, args.concurrency, recorder))
+            else:
+                run_threads(make_agent, prompts, args.concurrency, recorder, stream=args.mode == "stream")
+
+        drive([f"warmup {i}" for i in range(args.warmup)], Recorder())
+        server.reset_stats()
+        metrics.REGISTRY.clear()
+
+        recorder = Recorder()
+        prompts = [f"question {i} about load testing" for i in range(args.turns)]
+        start = time.perf_counter()
+        drive(prompts, recorder)
+        elapsed = time.perf_counter() - start
+
+        service = server.service_times()
+        mean_turn = statistics.fmean(recorder.latencies) if recorder.latencies else 0.0
+        mean_service = statistics.fmean(service) if service else 0.0
+        stages = {}
+        for stage in ("act", "plan", "execute", "memory", "format"):
+            count = metrics.STAGE_SECONDS.count(stage=stage)
+            if count:
+                stages[stage] = metrics.STAGE_SECONDS.total(stage=stage) / count * 1000
+        report = {
+            "provider": provider,
+            "mode": args.mode,
+            "concurrency": args.concurrency,
+            "turns": len(recorder.latencies),
+            "errors": recorder.errors,
+            "duration_s": elapsed,
+            "throughput_turns_per_s": len(recorder.latencies) / elapsed if elapsed else 0.0,
+            "latency_ms": summarize_ms(recorder.latencies),
+            "server_ms": summarize_ms(service),
+            "overhead_ms_per_turn": (mean_turn - mean_service) * 1000,
+            "stages_ms": stages,
+        }
+        if recorder.first_tokens:
+            report["first_token_ms"] = summarize_ms(recorder.first_tokens)
+        return report
+    finally:
+        server.stop()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="agent-builder-bench", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--provider", action="append", choices=PROVIDERS,
+                        help="Provider protocol to test (repeatable; default: all)")
+    parser.add_argument("--mode", choices=MODES, default="sync",
+                        help="sync: Agent.act on threads, async: Agent.aact tasks, stream: Agent.act_stream")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--latency", choices=LatencyModel.KINDS, default="fixed",
+                        help="Server time-to-first-token distribution")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Mean time to first token")
+    parser.add_argument("--spread", type=float, default=0.5,
+                        help="Relative spread (uniform) or sigma (lognormal) of the latency")
+    parser.add_argument("--reply-tokens", type=int, default=16)
+    parser.add_argument("--token-ms", type=float, default=0.0, help="Delay between streamed tokens")
+    parser.add_argument("--memory-turns", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run the stand-in server in this process (default: a child process)")
+    parser.add_argument("--output", help="Also append the JSON report as one line to this file")
+    args = parser.parse_args(argv)
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("provider", "output")},
+        "results": [run_provider(provider, args) for provider in (args.provider or PROVIDERS)],
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+"""
+Local stand-in LLM servers for load testing.
+
+One ThreadingHTTPServer speaks the three wire protocols the providers use:
+  - Ollama:               POST /api/generate      (JSON, or NDJSON when "stream": true)
+  - Anaconda / llama.cpp: POST /completion        (JSON, or server-sent events when "stream": true)
+  - OpenAI-compatible:    POST /v1/chat/completions (JSON, or SSE chunks ending in [DONE])
+plus the model-listing and health endpoints. Each reply waits for a latency drawn from a
+LatencyModel before the first token and, when streaming, token_delay between tokens. The time
+the server spent on each request is recorded so the harness can subtract it from client latency.
+"""
+import json
+import math
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+class LatencyModel:
+    """
+    Time-to-first-token distribution, in seconds:
+      fixed        always mean
+      uniform      uniform in [mean * (1 - spread), mean * (1 + spread)]
+      exponential  exponential with the given mean
+      lognormal    log-normal with the given mean and sigma = spread (heavy right tail)
+    """
+    KINDS = ("fixed", "uniform", "exponential", "lognormal")
+
+    def __init__(self, kind: str = "fixed", mean: float = 0.05, spread: float = 0.5, seed: int = None):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}; expected one of {', '.join(self.KINDS)}")
+        self.kind = kind
+        self.mean = mean
+        self.spread = spread
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            if self.kind == "fixed" or self.mean <= 0:
+                return max(0.0, self.mean)
+            if self.kind == "uniform":
+                return self._random.uniform(self.mean * (1 - self.spread), self.mean * (1 + self.spread))
+            if self.kind == "exponential":
+                return self._random.expovariate(1 / self.mean)
+            # Choose mu so that the distribution's mean is self.mean
+            mu = math.log(self.mean) - self.spread ** 2 / 2
+            return self._random.lognormvariate(mu, self.spread)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY, Nagle's algorithm and the
+    # client's delayed ACK add ~40ms to every keep-alive response and swamp what we measure
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, obj, code=200):
+        body = json.dumps(obj).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _chunk(self, data: str):
+        raw = data.encode()
+        self.wfile.write(f"{len(raw):x}\r\n".encode() + raw + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/_bench/stats":
+            with self.server._record_lock:
+                self._send_json({"service_times": list(self.server.service_times)})
+        elif path in ("/models", "/v1/models"):
+            self._send_json({"object": "list", "data": [{"id": self.server.model_name, "object": "model"}]})
+        elif path == "/api/tags":
+            self._send_json({"models": [{"name": self.server.model_name}]})
+        else:
+            self._send_json({"status": "ok"})
+
+    def do_POST(self):
+        start = time.perf_counter()
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        path = self.path.split("?")[0]
+        if path == "/_bench/reset":
+            self.server.reset_stats()
+            self._send_json({"status": "ok"})
+            return
+        if path == "/api/generate":
+            prompt = body.get("prompt", "")
+        elif path == "/completion":
+            prompt = body.get("prompt", "")
+        elif path in ("/chat/completions", "/v1/chat/completions"):
+            prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        else:
+            self._send_json({"error": "not found"}, 404)
+            return
+        server = self.server
+        words = [f"w{i}" for i in range(server.reply_tokens)]
+        prompt_tokens = len(prompt.split())
+        time.sleep(server.latency.sample())
+        stream = bool(body.get("stream"))
+        if path == "/api/generate":
+            self._ollama(words, prompt_tokens, stream)
+        elif path == "/completion":
+            self._llama_cpp(words, prompt_tokens, stream)
+        else:
+            self._openai(words, prompt_tokens, stream)
+        server.record(time.perf_counter() - start)
+
+    def _between_tokens(self, index):
+        if index and self.server.token_delay:
+            time.sleep(self.server.token_delay)
+
+    def _ollama(self, words, prompt_tokens, stream):
+        usage = {"prompt_eval_count": prompt_tokens, "eval_count": len(words)}
+        if not stream:
+            self._send_json(dict(model=self.server.model_name, response=" ".join(words), done=True, **usage))
+            return
+        self._start_chunked("application/x-ndjson")
+        for i, word in enumerate(words):
+            self._between_tokens(i)
+            self._chunk(json.dumps({"response": word + " ", "done": False}) + "\n")
+        self._chunk(json.dumps(dict(response="", done=True, **usage)) + "\n")
+        self._chunk("")
+
+    def _llama_cpp(self, words, prompt_tokens, stream):
+        usage = {"tokens_evaluated": prompt_tokens, "tokens_predicted": len(words)}
+        if not stream:
+            self._send_json(dict(content=" ".join(words), stop=True, **usage))
+            return
+        self._start_chunked("text/event-stream")
+        for i, word in enumerate(words):
+            self._between_tokens(i)
+            self._chunk(f"data: {json.dumps({'content': word + ' ', 'stop': False})}\n\n")
+        self._chunk(f"data: {json.dumps(dict(content='', stop=True, **usage))}\n\n")
+        self._chunk("")
+
+    def _openai(self, words, prompt_tokens, stream):
+        created = int(time.time())
+        base = {"id": "chatcmpl-bench", "created": created, "model": self.server.model_name}
+        if not stream:
+            self._send_json(dict(base, object="chat.completion", choices=[{
+                "index": 0, "finish_reason": "stop",
+                "message": {"role": "assistant", "content": " ".join(words)},
+            }], usage={"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                       "total_tokens": prompt_tokens + len(words)}))
+            return
+        self._start_chunked("text/event-stream")
+        for i, word in enumerate(words):
+            self._between_tokens(i)
+            chunk = dict(base, object="chat.completion.chunk", choices=[
+                {"index": 0, "delta": {"content": word + " "}, "finish_reason": None}])
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+        done = dict(base, object="chat.completion.chunk", choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        self._chunk(f"data: {json.dumps(done)}\n\n")
+        self._chunk("data: [DONE]\n\n")
+        self._chunk("")
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency: LatencyModel = None, reply_tokens: int = 16, token_delay: float = 0.0,
+                 model_name: str = "bench-model", host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), StandInHandler)
+        self.latency = latency or LatencyModel()
+        self.reply_tokens = reply_tokens
+        self.token_delay = token_delay
+        self.model_name = model_name
+        self.service_times: List[float] = []
+        self._record_lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def record(self, seconds: float) -> None:
+        with self._record_lock:
+            self.service_times.append(seconds)
+
+    def reset_stats(self) -> None:
+        with self._record_lock:
+            self.service_times = []
+
+
+class ServerHandle:
+    """A running stand-in server, in this process or a child process; stats are read over HTTP."""
+    def __init__(self, url: str, model_name: str, stop):
+        self.url = url
+        self.model_name = model_name
+        self._stop = stop
+
+    def _call(self, method: str, path: str) -> dict:
+        request = urllib.request.Request(self.url + path, method=method, data=b"" if method == "POST" else None)
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())
+
+    def service_times(self) -> List[float]:
+        return self._call("GET", "/_bench/stats")["service_times"]
+
+    def reset_stats(self) -> None:
+        self._call("POST", "/_bench/reset")
+
+    def stop(self) -> None:
+        self._stop()
+
+
+def _serve_in_child(kwargs, ready) -> None:
+    server = StandInServer(**kwargs)
+    ready.put(server.url)
+    server.serve_forever()
+
+
+def start_stand_in_server(in_process: bool = True, **kwargs) -> ServerHandle:
+    """
+    Start a stand-in server on a free port. in_process=False runs it in a child process so the
+    server does not compete with the code under test for the GIL (closer to a real remote server).
+    """
+    model_name = kwargs.get("model_name", "bench-model")
+    if in_process:
+        server = StandInServer(**kwargs)
+        threading.Thread(target=server.serve_forever, name="stand-in-llm", daemon=True).start()
+
+        def stop():
+            server.shutdown()
+            server.server_close()
+        return ServerHandle(server.url, model_name, stop)
+    import multiprocessing
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve_in_child, args=(kwargs, ready), daemon=True)
+    process.start()
+    url = ready.get(timeout=30)
+
+    def stop():
+        process.terminate()
+        process.join()
+    return ServerHandle(url, model_name, stop)
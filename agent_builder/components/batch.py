@@ -0,0 +1,78 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator
+
+def bounded_map(func: Callable[[Any], Any], inputs: Iterable[Any], concurrency: int = 8,
+                ordered: bool = True) -> Iterator[Any]:
+    """
+    Apply func to every input on a thread pool, with at most `concurrency` calls in flight.
+    Inputs are pulled lazily, so memory stays flat for arbitrarily large iterables.
+    Yields results in input order when ordered=True, otherwise (index, result) pairs as they complete.
+    """
+    concurrency = max(1, concurrency)
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="agent-batch")
+    in_flight = deque() if ordered else set()
+    indexes = {}
+    try:
+        for index, item in enumerate(inputs):
+            future = pool.submit(func, item)
+            if ordered:
+                in_flight.append(future)
+                if len(in_flight) >= concurrency:
+                    yield in_flight.popleft().result()
+            else:
+                indexes[future] = index
+                in_flight.add(future)
+                if len(in_flight) >= concurrency:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield indexes.pop(future), future.result()
+        if ordered:
+            while in_flight:
+                yield in_flight.popleft().result()
+        else:
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield indexes.pop(future), future.result()
+    finally:
+        # Reached early when the consumer stops iterating: drop work that has not started
+        for future in in_flight:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+async def abounded_map(func: Callable[[Any], Awaitable[Any]], inputs: Iterable[Any], concurrency: int = 8,
+                       ordered: bool = True) -> AsyncIterator[Any]:
+    """
+    Asynchronous counterpart of bounded_map: runs the coroutine func on at most `concurrency`
+    inputs at a time on the current event loop.
+    """
+    import asyncio
+    concurrency = max(1, concurrency)
+    in_flight = deque() if ordered else set()
+    indexes = {}
+    try:
+        for index, item in enumerate(inputs):
+            task = asyncio.ensure_future(func(item))
+            if ordered:
+                in_flight.append(task)
+                if len(in_flight) >= concurrency:
+                    yield await in_flight.popleft()
+            else:
+                indexes[task] = index
+                in_flight.add(task)
+                if len(in_flight) >= concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield indexes.pop(task), task.result()
+        if ordered:
+            while in_flight:
+                yield await in_flight.popleft()
+        else:
+            while in_flight:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield indexes.pop(task), task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
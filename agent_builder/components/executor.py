@@ -1,8 +1,13 @@
-from typing import Any, Dict
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Tuple
+import inspect
 import logging
+import threading
 from agent_builder.tools.echo_tool import EchoTool
 from agent_builder.tools.format_response_tool import FormatResponseTool
 from agent_builder.tools.token_counter_tool import TokenCounterTool
+from agent_builder.utils import run_sync
 
 class ToolRegistry:
     """
@@ -10,29 +15,132 @@ class ToolRegistry:
     """
     def __init__(self):
         self.tools = {}
+        # Bumped on every change so a Router knows when to rebuild its rules
+        self.version = 0
 
     def register(self, name: str, tool: Any):
         self.tools[name] = tool
+        self.version += 1
 
     def get(self, name: str):
         return self.tools.get(name)
 
+def register_default_tools(tool_registry: ToolRegistry) -> ToolRegistry:
+    tool_registry.register('echo', EchoTool())
+    tool_registry.register('format_response', FormatResponseTool())
+    tool_registry.register('token_counter', TokenCounterTool())
+    return tool_registry
+
+def _dependency_counts(deps: Dict[str, List[str]]) -> Tuple[Dict[str, int], Dict[str, List[str]]]:
+    """(number of unfinished dependencies, dependent actions) for each action id."""
+    waiting = {step_id: len(set(step_deps)) for step_id, step_deps in deps.items()}
+    dependents = {step_id: [] for step_id in deps}
+    for step_id, step_deps in deps.items():
+        for dep in set(step_deps):
+            dependents[dep].append(step_id)
+    return waiting, dependents
+
+def _schedule(plan: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[str]], List[str]]:
+    """
+    Validate a multi-action plan and return (steps by id, dependencies by id, a topological order).
+    Steps without an id are numbered "1", "2", ... by position.
+    """
+    steps, deps = {}, {}
+    for index, step in enumerate(plan.get('actions') or []):
+        step_id = str(step.get('id', index + 1))
+        if step_id in steps:
+            raise ValueError(f"Duplicate action id '{step_id}'")
+        depends_on = step.get('depends_on') or []
+        steps[step_id] = step
+        deps[step_id] = [str(d) for d in ([depends_on] if isinstance(depends_on, (str, int)) else depends_on)]
+    for step_id, step_deps in deps.items():
+        for dep in step_deps:
+            if dep not in steps:
+                raise ValueError(f"Action '{step_id}' depends on unknown action '{dep}'")
+    waiting, dependents = _dependency_counts(deps)
+    ready = deque(step_id for step_id, count in waiting.items() if count == 0)
+    order = []
+    while ready:
+        step_id = ready.popleft()
+        order.append(step_id)
+        for child in dependents[step_id]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                ready.append(child)
+    if len(order) != len(steps):
+        cycle = sorted(step_id for step_id in steps if step_id not in order)
+        raise ValueError(f"Dependency cycle between actions {', '.join(cycle)}")
+    return steps, deps, order
+
+def _bind(step: Dict[str, Any], deps: List[str], results: Dict[str, Any]) -> Dict[str, Any]:
+    """Pass dependency results to a step: {id} in input_text is replaced by that action's result and,
+    unless the step sets its own context, context is a dict of the dependencies' results."""
+    if not deps:
+        return step
+    step = dict(step)
+    input_text = step.get('input_text')
+    if isinstance(input_text, str):
+        for dep in deps:
+            input_text = input_text.replace('{' + dep + '}', str(results[dep]))
+        step['input_text'] = input_text
+    if step.get('context') is None:
+        step['context'] = {dep: results[dep] for dep in deps}
+    return step
+
 class Executor:
     """
     Executor for agent actions. Handles:
       - {'type': 'llm_response', 'content': ...}: returns content directly
       - {'type': 'tool', 'tool': ..., 'input_text': ..., 'context': ...}: invokes tool
+      - {'type': 'plan', 'actions': [...]}: runs several actions, each with an optional 'id' and
+        'depends_on' list. Independent actions run concurrently (on a pool of max_workers threads,
+        or as tasks in aexecute); an action starts once its dependencies have finished and receives
+        their results (see _bind). Returns {id: result} in plan order. Actions whose dependency
+        failed are skipped. Tools used in plans may be called from several threads at once.
+    Tools may optionally provide a coroutine arun(input_text, context) used by aexecute;
+    tools with only run() are executed in a worker thread there. The plan thread pool is created
+    on first use; close() (or leaving a `with Executor() as executor:` block) shuts it down.
     """
-    def __init__(self, tool_registry: ToolRegistry = None):
-        self.tool_registry = tool_registry or ToolRegistry()
-        # Register default tools
-        self.tool_registry.register('echo', EchoTool())
-        self.tool_registry.register('format_response', FormatResponseTool())
-        self.tool_registry.register('token_counter', TokenCounterTool())
+    def __init__(self, tool_registry: ToolRegistry = None, max_workers: int = 8):
+        self.tool_registry = register_default_tools(tool_registry or ToolRegistry())
+        self.max_workers = max(1, max_workers)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    @staticmethod
+    def _action_type(action: Dict[str, Any]) -> Any:
+        action_type = action.get('type')
+        if action_type is None:
+            # Hand-built actions often leave out the type
+            if 'actions' in action:
+                return 'plan'
+            if 'tool' in action:
+                return 'tool'
+        return action_type
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="agent-executor")
+        return self._pool
+
+    def close(self) -> None:
+        """Shut down the plan thread pool, waiting for running actions. A later plan starts a new one."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def __enter__(self) -> "Executor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def execute(self, action: Dict[str, Any]) -> Any:
         try:
-            action_type = action.get('type')
+            action_type = self._action_type(action)
             if action_type == 'llm_response':
                 return action.get('content', '')
             elif action_type == 'tool':
@@ -44,9 +152,132 @@ class Executor:
                     logging.error(f"Tool '{tool_name}' not found in registry.")
                     return f"Error: Tool '{tool_name}' not found."
                 return tool.run(input_text, context)
+            elif action_type == 'plan':
+                return self._execute_plan(action)
+            else:
+                logging.error(f"Unknown action type: {action_type}")
+                return f"Error: Unknown action type '{action_type}'"
+        except Exception as e:
+            logging.exception(f"Error executing action: {action}")
+            return f"Execution error: {str(e)}"
+
+    def _run_step(self, step: Dict[str, Any]) -> Any:
+        action_type = self._action_type(step)
+        if action_type == 'llm_response':
+            return step.get('content', '')
+        if action_type != 'tool':
+            raise ValueError(f"Unknown action type '{action_type}' in plan")
+        tool = self.tool_registry.get(step.get('tool'))
+        if not tool:
+            raise LookupError(f"Tool '{step.get('tool')}' not found.")
+        return tool.run(step.get('input_text'), step.get('context', None))
+
+    async def _arun_step(self, step: Dict[str, Any]) -> Any:
+        tool = self.tool_registry.get(step.get('tool')) if self._action_type(step) == 'tool' else None
+        arun = getattr(tool, 'arun', None)
+        if arun is not None and inspect.iscoroutinefunction(arun):
+            return await arun(step.get('input_text'), step.get('context', None))
+        return await run_sync(self._run_step, step)
+
+    @staticmethod
+    def _step_failed(step_id: str, e: Exception, results: Dict[str, Any], failed: set) -> None:
+        logging.error(f"Plan action '{step_id}' failed: {e}")
+        results[step_id] = f"Execution error: {str(e)}"
+        failed.add(step_id)
+
+    def _execute_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        steps, deps, _ = _schedule(plan)
+        results, failed = {}, set()
+        waiting, dependents = _dependency_counts(deps)
+        ready = deque(step_id for step_id in steps if waiting[step_id] == 0)
+        running = {}
+
+        def finished(step_id):
+            for child in dependents[step_id]:
+                waiting[child] -= 1
+                if waiting[child] == 0:
+                    ready.append(child)
+
+        while ready or running:
+            while ready:
+                step_id = ready.popleft()
+                blocked = next((dep for dep in deps[step_id] if dep in failed), None)
+                if blocked is not None:
+                    results[step_id] = f"Skipped: dependency '{blocked}' failed"
+                    failed.add(step_id)
+                    finished(step_id)
+                    continue
+                step = _bind(steps[step_id], deps[step_id], results)
+                if not ready and not running:
+                    # Nothing to overlap with: run on this thread instead of hopping to the pool
+                    try:
+                        results[step_id] = self._run_step(step)
+                    except Exception as e:
+                        self._step_failed(step_id, e, results, failed)
+                    finished(step_id)
+                    continue
+                running[self._get_pool().submit(self._run_step, step)] = step_id
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step_id = running.pop(future)
+                try:
+                    results[step_id] = future.result()
+                except Exception as e:
+                    self._step_failed(step_id, e, results, failed)
+                finished(step_id)
+        return {step_id: results[step_id] for step_id in steps}
+
+    async def _aexecute_plan(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        import asyncio
+        steps, deps, order = _schedule(plan)
+        results, failed = {}, set()
+        limit = asyncio.Semaphore(self.max_workers)
+        tasks = {}
+
+        async def run(step_id):
+            if deps[step_id]:
+                await asyncio.wait([tasks[dep] for dep in set(deps[step_id])])
+            blocked = next((dep for dep in deps[step_id] if dep in failed), None)
+            if blocked is not None:
+                results[step_id] = f"Skipped: dependency '{blocked}' failed"
+                failed.add(step_id)
+                return
+            async with limit:
+                try:
+                    results[step_id] = await self._arun_step(_bind(steps[step_id], deps[step_id], results))
+                except Exception as e:
+                    self._step_failed(step_id, e, results, failed)
+
+        # Topological order guarantees every dependency's task exists before its dependents start
+        for step_id in order:
+            tasks[step_id] = asyncio.ensure_future(run(step_id))
+        await asyncio.gather(*tasks.values())
+        return {step_id: results[step_id] for step_id in steps}
+
+    async def aexecute(self, action: Dict[str, Any]) -> Any:
+        try:
+            action_type = self._action_type(action)
+            if action_type == 'llm_response':
+                return action.get('content', '')
+            elif action_type == 'tool':
+                tool_name = action.get('tool')
+                input_text = action.get('input_text')
+                context = action.get('context', None)
+                tool = self.tool_registry.get(tool_name)
+                if not tool:
+                    logging.error(f"Tool '{tool_name}' not found in registry.")
+                    return f"Error: Tool '{tool_name}' not found."
+                arun = getattr(tool, 'arun', None)
+                if arun is not None and inspect.iscoroutinefunction(arun):
+                    return await arun(input_text, context)
+                return await run_sync(tool.run, input_text, context)
+            elif action_type == 'plan':
+                return await self._aexecute_plan(action)
             else:
                 logging.error(f"Unknown action type: {action_type}")
                 return f"Error: Unknown action type '{action_type}'"
         except Exception as e:
             logging.exception(f"Error executing action: {action}")
-            return f"Execution error: {str(e)}" 
\ No newline at end of file
+            return f"Execution error: {str(e)}"
@@ -1,46 +1,279 @@
-from typing import List, Dict, Any
+from collections import deque
+from collections.abc import MutableSequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable
 import logging
+import threading
+import uuid
+from agent_builder.tools.token_counter_tool import TokenCounterTool
+
+SUMMARY_PROMPT = (
+    "Condense the conversation below into a brief summary. Keep facts, names, decisions and open "
+    "questions; drop pleasantries.\n\n"
+    "Current summary:\n{summary}\n\n"
+    "Conversation to fold in:\n{turns}\n\n"
+    "Updated summary:"
+)
+
+# Shared by all Memory instances so summarization never runs on the request thread
+_compaction_pool = None
+_compaction_pool_lock = threading.Lock()
+
+def _get_compaction_pool() -> ThreadPoolExecutor:
+    global _compaction_pool
+    with _compaction_pool_lock:
+        if _compaction_pool is None:
+            _compaction_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="memory-compaction")
+        return _compaction_pool
+
+class Turn:
+    """
+    Compact record of one interaction. Keeps the original values for get_history() and the
+    rendered transcript text used by get_context().
+    """
+    __slots__ = ('first_key', 'second_key', 'first', 'second', 'text', 'tokens')
+
+    def __init__(self, first_key: str, second_key: str, first: Any, second: Any, text: str):
+        self.first_key = first_key
+        self.second_key = second_key
+        self.first = first
+        self.second = second
+        self.text = text
+        self.tokens = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {self.first_key: self.first, self.second_key: self.second}
+
+    @classmethod
+    def from_dict(cls, entry: Dict[str, Any]) -> 'Turn':
+        """Inverse of as_dict for {'user', 'agent'}, {'input', 'result'} or any two-key entry."""
+        (first_key, first), (second_key, second) = entry.items()
+        return cls(first_key, second_key, first, second,
+                   f"{first_key.capitalize()}: {first}\n{second_key.capitalize()}: {second}")
+
+class _HistoryView(MutableSequence):
+    """
+    Memory.history as a list of {first_key: ..., second_key: ...} dicts, kept compatible with the
+    plain list it used to be: append() adds a turn, and any other change rebuilds the memory.
+    """
+    __slots__ = ('_memory',)
+
+    def __init__(self, memory: 'Memory'):
+        self._memory = memory
+
+    def __getitem__(self, index):
+        turns = self._memory._turns
+        if isinstance(index, slice):
+            return [turn.as_dict() for turn in list(turns)[index]]
+        return turns[index].as_dict()
+
+    def __len__(self) -> int:
+        return len(self._memory._turns)
+
+    def _rebuild(self, change: Callable[[List[Dict[str, Any]]], None]) -> None:
+        entries = list(self)
+        change(entries)
+        self._memory.history = entries
+
+    def __setitem__(self, index, value) -> None:
+        self._rebuild(lambda entries: entries.__setitem__(index, value))
+
+    def __delitem__(self, index) -> None:
+        self._rebuild(lambda entries: entries.__delitem__(index))
+
+    def insert(self, index: int, value: Dict[str, Any]) -> None:
+        if index >= len(self):
+            self.append(value)
+        else:
+            self._rebuild(lambda entries: entries.insert(index, value))
+
+    def append(self, value: Dict[str, Any]) -> None:
+        self._memory._add(Turn.from_dict(value))
+
+    def __eq__(self, other) -> bool:
+        return list(self) == (list(other) if isinstance(other, _HistoryView) else other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
 
 class Memory:
     """
     Simple memory buffer for storing user/agent interactions and results.
     Provides unified add_interaction method for all types of memory updates.
+    Turns live in a bounded deque and the context string is maintained incrementally, so adding
+    a turn and reading the context never re-render the whole transcript.
+
+    Optionally, token_budget caps the context size: the newest turns are kept until the budget
+    (counted with tokenizer) is reached. When a summarizer LLM is given, turns that fall out of
+    the window are folded into a rolling summary in a background thread and prepended to the context.
+    Turns a failed summarization could not fold in are retried with the next compaction; at most
+    max_pending of them are kept (the oldest are dropped), so a failing summarizer cannot make the
+    backlog or the summary prompt grow without bound.
     """
-    def __init__(self, max_turns: int = 10):
-        self.history: List[Dict[str, Any]] = []
-        self.max_turns = max_turns
+    # get_context only reads RAM, so async planners call it on the event loop
+    blocking_context = False
+
+    def __init__(self, max_turns: int = 10, token_budget: int = None, tokenizer: Callable[[str], int] = None,
+                 summarizer: Any = None, summary_prompt: str = SUMMARY_PROMPT, max_pending: int = 50):
+        self._turns = deque(maxlen=max(0, max_turns))
+        self._context = ''
+        self.token_budget = token_budget
+        self.tokenizer = tokenizer or TokenCounterTool().tokenizer
+        self.summarizer = summarizer
+        self.summary_prompt = summary_prompt
+        self.summary = ''
+        self._tokens = 0
+        self._pending: List[Turn] = []
+        self.max_pending = max(1, max_pending)
+        self.dropped_turns = 0
+        self._compaction = None
+        self._compacting = False
+        # Bumped by reset(), so a compaction started before it does not bring back the old summary
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Identifies this conversation to providers that keep per-conversation server state
+        self.session_key = uuid.uuid4().hex
+
+    @property
+    def max_turns(self) -> int:
+        return self._turns.maxlen
+
+    @max_turns.setter
+    def max_turns(self, value: int) -> None:
+        turns = list(self._turns)
+        self._turns = deque(maxlen=max(0, value))
+        self._context = ''
+        self._tokens = 0
+        for turn in turns:
+            self._append(turn)
+
+    @property
+    def history(self) -> MutableSequence:
+        """The turns in the window as dicts. A live view: appending to it adds a turn, and
+        assigning a list of dicts (or editing the view) replaces the turns."""
+        return _HistoryView(self)
+
+    @history.setter
+    def history(self, entries: List[Dict[str, Any]]) -> None:
+        turns = [Turn.from_dict(entry) for entry in entries]
+        self._turns.clear()
+        self._context = ''
+        self._tokens = 0
+        # Only the newest max_turns are kept; replaced turns are not summarized
+        for turn in turns[-self._turns.maxlen:] if self._turns.maxlen else ():
+            if self.token_budget is not None:
+                turn.tokens = self.tokenizer(turn.text)
+            self._context = f"{self._context}\n{turn.text}" if self._turns else turn.text
+            self._turns.append(turn)
+            self._tokens += turn.tokens
+        while self.token_budget is not None and self._turns and self._tokens > self.token_budget:
+            self._popleft()
 
     def add_interaction(self, user: str = None, agent: str = None, input_data: Any = None, result: Any = None) -> None:
         try:
             if user is not None and agent is not None:
-                self.history.append({"user": user, "agent": agent})
+                turn = Turn('user', 'agent', user, agent, f"User: {user}\nAgent: {agent}")
             elif input_data is not None and result is not None:
-                self.history.append({'input': input_data, 'result': result})
+                turn = Turn('input', 'result', input_data, result, f"Input: {input_data}\nResult: {result}")
             else:
                 logging.warning(f"Malformed memory entry: user={user}, agent={agent}, input_data={input_data}, result={result}")
                 return
-            if len(self.history) > self.max_turns:
-                self.history.pop(0)
+            self._add(turn)
         except Exception as e:
             logging.exception(f"Error adding interaction to memory: {e}")
 
-    def get_context(self) -> str:
-        lines = []
-        for h in self.history:
+    def _add(self, turn: Turn) -> None:
+        self._append(turn)
+
+    def _append(self, turn: Turn) -> None:
+        if self.token_budget is not None:
+            turn.tokens = self.tokenizer(turn.text)
+        evicted = []
+        if self._turns.maxlen and len(self._turns) == self._turns.maxlen:
+            evicted.append(self._popleft())
+        if self._turns.maxlen:
+            self._context = f"{self._context}\n{turn.text}" if self._turns else turn.text
+            self._turns.append(turn)
+            self._tokens += turn.tokens
+        else:
+            evicted.append(turn)
+        if self.token_budget is not None:
+            while self._turns and self._tokens > self.token_budget:
+                evicted.append(self._popleft())
+        if evicted and self.summarizer is not None:
+            self._schedule_compaction(evicted)
+
+    def _popleft(self) -> Turn:
+        evicted = self._turns.popleft()
+        self._tokens -= evicted.tokens
+        # Drop the evicted turn and its separating newline from the front of the context
+        self._context = self._context[len(evicted.text) + 1:]
+        return evicted
+
+    def _schedule_compaction(self, turns: List[Turn]) -> None:
+        with self._lock:
+            self._pending.extend(turns)
+            if not self._compacting:
+                self._compacting = True
+                self._compaction = _get_compaction_pool().submit(self._compact)
+
+    def _compact(self) -> None:
+        from agent_builder.llm_providers.cached_llm import is_error_response
+        from agent_builder.llm_providers.rate_limit import BULK, request_priority
+        # Summaries are background work: let rate-limited providers serve live turns first
+        request_priority.set(BULK)
+        while True:
+            with self._lock:
+                turns, self._pending = self._pending, []
+                if not turns:
+                    self._compacting = False
+                    return
+                generation, summary = self._generation, self.summary
+            prompt = self.summary_prompt.format(summary=summary or "(none)", turns="\n".join(t.text for t in turns))
             try:
-                if isinstance(h, dict) and "user" in h and "agent" in h:
-                    lines.append(f"User: {h['user']}\nAgent: {h['agent']}")
-                elif isinstance(h, dict) and "input" in h and "result" in h:
-                    lines.append(f"Input: {h['input']}\nResult: {h['result']}")
-                else:
-                    logging.warning(f"Malformed memory entry skipped: {h}")
-                    continue
-            except Exception as e:
-                logging.exception(f"Error processing memory entry: {h}")
-        return "\n".join(lines)
+                reply = self.summarizer.generate(prompt)
+                summary = reply.get('content') if isinstance(reply, dict) else reply
+                if not summary or is_error_response(summary):
+                    raise RuntimeError(f"summarizer returned {summary!r}")
+                with self._lock:
+                    # Summarizes a conversation that has been reset since: drop it
+                    if generation == self._generation:
+                        self.summary = str(summary).strip()
+            except Exception:
+                logging.exception("Memory summarization failed; keeping turns for the next compaction")
+                with self._lock:
+                    if generation != self._generation:
+                        turns = []
+                    self._pending = turns + self._pending
+                    dropped = len(self._pending) - self.max_pending
+                    if dropped > 0:
+                        del self._pending[:dropped]
+                        self.dropped_turns += dropped
+                    self._compacting = False
+                if dropped > 0:
+                    logging.warning(f"Dropped the {dropped} oldest turns awaiting summarization")
+                return
+
+    def wait_for_compaction(self, timeout: float = None) -> None:
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.result(timeout=timeout)
+
+    def get_context(self) -> str:
+        if self.summary:
+            if self._context:
+                return f"Summary of earlier conversation: {self.summary}\n{self._context}"
+            return f"Summary of earlier conversation: {self.summary}"
+        return self._context
 
     def reset(self) -> None:
-        self.history = []
+        self._turns.clear()
+        self._context = ''
+        self._tokens = 0
+        with self._lock:
+            self._pending = []
+            self.summary = ''
+            self._generation += 1
 
     def get_history(self) -> List[Dict[str, Any]]:
-        return self.history 
\ No newline at end of file
+        return [turn.as_dict() for turn in self._turns]
@@ -1,11 +1,173 @@
-from typing import Any, Dict
-from ..llm_providers.ollama_llm import OllamaLLM
-from ..llm_providers.openai_llm import OpenAILLM
-from ..llm_providers.anthropic_llm import AnthropicLLM
-from ..llm_providers.anaconda_llm import AnacondaLLM
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator
+from .. import metrics
+from ..llm_providers.registry import describe_llm, get_llm
+from ..llm_providers.sessions import SessionPrompt
+from .executor import ToolRegistry, register_default_tools
 from .memory import Memory
+from .router import Router
+from .batch import bounded_map, abounded_map
+from ..utils import run_sync
+import json
 import os
 import logging
+import re
+import time
+from contextlib import contextmanager
+
+# Renders the input the way Memory records a turn, so each prompt extends the previous one and
+# providers can reuse the server-side state of the conversation so far (see SessionPrompt)
+CONVERSATION_TEMPLATE = "{memory}\nInput: {input}\nResult: "
+
+def reuses_prefix(prompt_template: str) -> bool:
+    """
+    Whether prompts rendered from prompt_template extend each other turn after turn: the template
+    ends with CONVERSATION_TEMPLATE, after fixed text only (e.g. instructions). Other templates,
+    including the provider planners' defaults ("User: {input}\n", "{input}"), re-render the
+    conversation differently each turn, so providers cannot reuse its prefix: pass
+    prompt_template=CONVERSATION_TEMPLATE to a provider planner to enable reuse.
+    """
+    if not prompt_template.endswith(CONVERSATION_TEMPLATE):
+        return False
+    return '{' not in prompt_template[:-len(CONVERSATION_TEMPLATE)]
+
+# A multi-action plan as the LLM writes it, optionally inside a ```json fence
+_PLAN_PREFIXES = ('{"actions"', '```json{"actions"', '```{"actions"')
+
+def _parse_actions(text: str) -> Any:
+    """
+    Parse a multi-action plan:
+      {"actions": [{"id": "a", "tool": "echo", "input": "hi"},
+                   {"id": "b", "tool": "token_counter", "input": "{a}", "depends_on": ["a"]}]}
+    into {'type': 'plan', 'actions': [...]}; returns None if text is not one. An action without a
+    tool is an llm_response with the given content.
+    """
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.strip('`').strip()
+        if text.startswith('json'):
+            text = text[4:].lstrip()
+    if not text.startswith('{'):
+        return None
+    try:
+        parsed = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(parsed, dict) or not isinstance(parsed.get('actions'), list):
+        return None
+    actions = []
+    for index, item in enumerate(parsed['actions']):
+        if not isinstance(item, dict):
+            return None
+        action = {'id': str(item.get('id', index + 1)), 'depends_on': item.get('depends_on') or []}
+        if item.get('tool'):
+            action.update(type='tool', tool=str(item['tool']).strip().lower(),
+                          input_text=item.get('input_text', item.get('input', '')), context=item.get('context'))
+        else:
+            action.update(type='llm_response', content=item.get('content', ''))
+        actions.append(action)
+    return {'type': 'plan', 'actions': actions}
+
+class _ToolPrefixFilter:
+    """
+    Holds back streamed text while it could still turn out to be a 'tool: input' call or a JSON
+    multi-action plan, so tool invocations are not passed on to the caller as model text.
+    """
+    def __init__(self, tool_names):
+        self.tool_names = tool_names
+        self.buffer = ''
+        self.deciding = True
+        self.is_tool = False
+
+    def feed(self, delta: str) -> str:
+        if not self.deciding:
+            return delta
+        if self.is_tool:
+            return ''
+        self.buffer += delta
+        compact = re.sub(r'\s+', '', self.buffer)
+        if compact[:1] in ('{', '`'):
+            # Possibly a multi-action JSON plan: hold back until that is decided
+            if any(compact.startswith(prefix) for prefix in _PLAN_PREFIXES):
+                self.is_tool = True
+                return ''
+            if any(prefix.startswith(compact) for prefix in _PLAN_PREFIXES):
+                return ''
+        elif ':' in self.buffer:
+            name = self.buffer.split(':', 1)[0].strip().lower()
+            if name in self.tool_names:
+                self.is_tool = True
+                return ''
+        else:
+            head = self.buffer.strip().lower()
+            if any(name.startswith(head) for name in self.tool_names):
+                return ''
+        self.deciding = False
+        return self.buffer
+
+    def flush(self) -> str:
+        if self.deciding and not self.is_tool:
+            self.deciding = False
+            return self.buffer
+        return ''
+
+class PlanStream:
+    """
+    Text deltas produced while planning. Iterate it with for (plan_stream) or async for
+    (aplan_stream); once exhausted, .plan holds the action dict plan()/aplan() would have returned.
+    """
+    def __init__(self, planner: 'Planner', source: Any, input_data: str, plan: Dict[str, Any] = None):
+        self.planner = planner
+        self.source = source
+        self.input_data = input_data
+        self.text = ''
+        self.plan = plan
+
+    def __iter__(self):
+        if self.plan is not None:
+            # Routed without an LLM call: nothing to stream
+            return
+        prefix_filter = _ToolPrefixFilter(self.planner.tool_names)
+        try:
+            for delta in self.source:
+                self.text += delta
+                out = prefix_filter.feed(delta)
+                if out:
+                    yield out
+            out = prefix_filter.flush()
+            if out:
+                yield out
+            self.plan = self.planner._parse_plan(self.text)
+            if prefix_filter.is_tool and self.plan['type'] == 'llm_response':
+                # Held back as a likely plan but not valid JSON: it was text after all
+                yield self.text
+        except Exception as e:
+            yield from self._fail(e)
+
+    async def __aiter__(self):
+        if self.plan is not None:
+            return
+        prefix_filter = _ToolPrefixFilter(self.planner.tool_names)
+        try:
+            async for delta in self.source:
+                self.text += delta
+                out = prefix_filter.feed(delta)
+                if out:
+                    yield out
+            out = prefix_filter.flush()
+            if out:
+                yield out
+            self.plan = self.planner._parse_plan(self.text)
+            if prefix_filter.is_tool and self.plan['type'] == 'llm_response':
+                # Held back as a likely plan but not valid JSON: it was text after all
+                yield self.text
+        except Exception as e:
+            for out in self._fail(e):
+                yield out
+
+    def _fail(self, e: Exception):
+        logging.exception(f"Error in planning: {self.input_data}")
+        self.plan = {'type': 'llm_response', 'content': f'Planning error: {str(e)}', 'raw': None}
+        yield self.plan['content']
 
 class Planner:
     """
@@ -13,51 +175,219 @@ class Planner:
     Returns actions as dicts:
       - {'type': 'llm_response', 'content': ..., 'raw': ...} for LLM completions
       - {'type': 'tool', 'tool': ..., 'input_text': ..., 'context': ...} for tool actions
+      - {'type': 'plan', 'actions': [...]} when the LLM answers with a JSON multi-action plan
+        (see _parse_actions); the Executor runs independent actions concurrently
+    plan_stream/aplan_stream return a PlanStream yielding text deltas as the LLM produces them.
+    Inputs that are tool commands ('echo: hi', or a pattern a tool declares) are resolved by a
+    Router without calling the LLM; route_inputs=False sends everything to the LLM. The tools come
+    from the Executor's ToolRegistry once the planner is part of an Agent (see use_tools), or from
+    an explicitly passed router.
     """
-    def __init__(self, llm: Any, prompt_template: str = "{input}"):
+    def __init__(self, llm: Any, prompt_template: str = "{input}", router: Router = None,
+                 route_inputs: bool = True):
         self.llm = llm
         self.prompt_template = prompt_template
+        self.router = router
+        self.route_inputs = route_inputs
+        self._router_given = router is not None
+
+    def use_tools(self, tool_registry: ToolRegistry) -> None:
+        """Route to and recognise the tools in tool_registry (called by Agent with its Executor's)."""
+        if not self._router_given and (self.router is None or self.router.tool_registry is not tool_registry):
+            self.router = Router(tool_registry)
+
+    def _get_router(self) -> Router:
+        if self.router is None:
+            self.router = _default_router()
+        return self.router
+
+    @property
+    def tool_names(self):
+        return self._get_router().tool_names
+
+    def _route(self, input_data: Any) -> Any:
+        if not self.route_inputs:
+            return None
+        action = self._get_router().route(input_data)
+        if action is not None:
+            metrics.ROUTED_INPUTS.inc(tool=action['tool'])
+        return action
+
+    def _render_prompt(self, input_data: str, memory: Memory) -> str:
+        # Memories that select context by relevance (RecallMemory) get the input as the query
+        if getattr(memory, 'uses_query', False):
+            context = memory.get_context(query=input_data)
+        else:
+            context = memory.get_context()
+        prompt = self.prompt_template.format(input=input_data, memory=context)
+        # Tagged with the conversation so providers can reuse the server-side state of its prefix,
+        # when the template makes each prompt extend the previous one (see reuses_prefix)
+        session = getattr(memory, 'session_key', None)
+        if session is not None and reuses_prefix(self.prompt_template):
+            return SessionPrompt(prompt, session)
+        return prompt
+
+    async def _arender_prompt(self, input_data: str, memory: Memory) -> str:
+        # Memories whose get_context does I/O (SQLiteMemory, or any memory not saying otherwise
+        # with blocking_context = False) are read in a worker thread, off the event loop
+        if getattr(memory, 'blocking_context', True):
+            return await run_sync(self._render_prompt, input_data, memory)
+        return self._render_prompt(input_data, memory)
+
+    def _parse_plan(self, plan_text: Any) -> Dict[str, Any]:
+        text = plan_text['content'] if isinstance(plan_text, dict) and 'content' in plan_text else plan_text
+        if isinstance(text, str) and text.lstrip()[:1] in ('{', '`'):
+            plan = _parse_actions(text)
+            if plan is not None:
+                return plan
+        # If the LLM returns a tool call (e.g., 'tool: input'), treat as tool action
+        action = self._get_router().match_tool_call(plan_text)
+        if action is not None:
+            return action
+        # If plan_text is a dict with content/raw, pass both
+        if isinstance(plan_text, dict) and 'content' in plan_text and 'raw' in plan_text:
+            return {'type': 'llm_response', 'content': plan_text['content'], 'raw': plan_text['raw']}
+        # Otherwise, treat as normal LLM response
+        return {'type': 'llm_response', 'content': str(plan_text).strip(), 'raw': None}
+
+    @contextmanager
+    def _timed_llm_call(self, llm: Any = None):
+        provider, model = describe_llm(llm or self.llm)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            # Errors that escape the LLM (CommandLLM failures, SDK bugs); providers count their own
+            metrics.LLM_ERRORS.inc(provider=provider, model=model, type=type(e).__name__)
+            raise
+        finally:
+            metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, provider=provider, model=model)
 
     def plan(self, input_data: str, memory: Memory) -> Dict[str, Any]:
         try:
-            prompt = self.prompt_template.format(input=input_data, memory=memory.get_context())
-            plan_text = self.llm.generate(prompt)
-            # If the LLM returns a tool call (e.g., 'tool: input'), treat as tool action
-            if isinstance(plan_text, str) and ':' in plan_text:
-                tool, tool_input = plan_text.split(':', 1)
-                tool = tool.strip().lower()
-                if tool in ['echo', 'format_response', 'token_counter']:
-                    return {'type': 'tool', 'tool': tool, 'input_text': tool_input.strip(), 'context': None}
-            # If plan_text is a dict with content/raw, pass both
-            if isinstance(plan_text, dict) and 'content' in plan_text and 'raw' in plan_text:
-                return {'type': 'llm_response', 'content': plan_text['content'], 'raw': plan_text['raw']}
-            # Otherwise, treat as normal LLM response
-            return {'type': 'llm_response', 'content': str(plan_text).strip(), 'raw': None}
+            action = self._route(input_data)
+            if action is not None:
+                return action
+            prompt = self._render_prompt(input_data, memory)
+            plan_text = self._call_llm(prompt, input_data)
+            return self._parse_plan(plan_text)
+        except Exception as e:
+            logging.exception(f"Error in planning: {input_data}")
+            return {'type': 'llm_response', 'content': f'Planning error: {str(e)}', 'raw': None}
+
+    async def aplan(self, input_data: str, memory: Memory) -> Dict[str, Any]:
+        try:
+            action = self._route(input_data)
+            if action is not None:
+                return action
+            prompt = await self._arender_prompt(input_data, memory)
+            plan_text = await self._acall_llm(prompt, input_data)
+            return self._parse_plan(plan_text)
         except Exception as e:
             logging.exception(f"Error in planning: {input_data}")
             return {'type': 'llm_response', 'content': f'Planning error: {str(e)}', 'raw': None}
 
+    def plan_batch(self, inputs: Iterable[str], memory: Memory = None, concurrency: int = 8,
+                   ordered: bool = True) -> Iterator[Any]:
+        """
+        Plan many independent inputs with at most `concurrency` LLM calls in flight. memory, if
+        given, is only read (all inputs see the same context). Yields plans in input order, or
+        (index, plan) pairs as they complete when ordered=False.
+        """
+        memory = memory or Memory(max_turns=0)
+        return bounded_map(lambda input_data: self.plan(input_data, memory), inputs, concurrency=concurrency, ordered=ordered)
+
+    def aplan_batch(self, inputs: Iterable[str], memory: Memory = None, concurrency: int = 8,
+                    ordered: bool = True) -> AsyncIterator[Any]:
+        memory = memory or Memory(max_turns=0)
+        return abounded_map(lambda input_data: self.aplan(input_data, memory), inputs, concurrency=concurrency, ordered=ordered)
+
+    def _call_llm(self, prompt: str, input_data: str) -> Any:
+        # Subclasses choosing the LLM per input (RoutingPlanner) override the _call/_stream hooks
+        with self._timed_llm_call():
+            return self.llm.generate(prompt)
+
+    async def _acall_llm(self, prompt: str, input_data: str) -> Any:
+        # Providers without a native async path are run in a worker thread
+        with self._timed_llm_call():
+            if hasattr(self.llm, 'agenerate'):
+                return await self.llm.agenerate(prompt)
+            return await run_sync(self.llm.generate, prompt)
+
+    def _stream_llm(self, prompt: str, input_data: str = None):
+        if hasattr(self.llm, 'stream'):
+            yield from self.llm.stream(prompt)
+            return
+        # Non-streaming providers produce a single delta
+        plan_text = self.llm.generate(prompt)
+        yield plan_text['content'] if isinstance(plan_text, dict) else str(plan_text)
+
+    async def _astream_llm(self, prompt: str, input_data: str = None):
+        if hasattr(self.llm, 'astream'):
+            async for delta in self.llm.astream(prompt):
+                yield delta
+            return
+        if hasattr(self.llm, 'agenerate'):
+            plan_text = await self.llm.agenerate(prompt)
+        else:
+            plan_text = await run_sync(self.llm.generate, prompt)
+        yield plan_text['content'] if isinstance(plan_text, dict) else str(plan_text)
+
+    def plan_stream(self, input_data: str, memory: Memory) -> PlanStream:
+        action = self._route(input_data)
+        if action is not None:
+            return PlanStream(self, None, input_data, plan=action)
+        prompt = self._render_prompt(input_data, memory)
+        return PlanStream(self, self._stream_llm(prompt, input_data), input_data)
+
+    def aplan_stream(self, input_data: str, memory: Memory) -> PlanStream:
+        action = self._route(input_data)
+        if action is not None:
+            return PlanStream(self, None, input_data, plan=action)
+        return PlanStream(self, self._astream_rendered(input_data, memory), input_data)
+
+    async def _astream_rendered(self, input_data: str, memory: Memory):
+        prompt = await self._arender_prompt(input_data, memory)
+        async for delta in self._astream_llm(prompt, input_data):
+            yield delta
+
+_standalone_router = None
+
+def _default_router() -> Router:
+    # For planners used outside an Agent: the tools every Executor registers
+    global _standalone_router
+    if _standalone_router is None:
+        _standalone_router = Router(register_default_tools(ToolRegistry()))
+    return _standalone_router
+
+def _with_cache(llm: Any, cache: 'ResponseCache' = None) -> Any:
+    # Planners share a ResponseCache by passing the same instance
+    if cache is None:
+        return llm
+    from ..llm_providers.cached_llm import CachedLLM
+    return CachedLLM(llm, cache=cache)
+
 class OllamaPlanner(Planner):
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, cache: 'ResponseCache' = None, prompt_template: str = "User: {input}\n"):
         # Use environment variable or fallback to 'llama2'
         model = model or os.getenv("OLLAMA_DEFAULT_MODEL", "llama2")
-        super().__init__(OllamaLLM(model=model), prompt_template="User: {input}\n")
+        super().__init__(_with_cache(get_llm('ollama', model=model), cache), prompt_template=prompt_template)
 
 class OpenAIPlanner(Planner):
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, cache: 'ResponseCache' = None, prompt_template: str = "User: {input}\n"):
         # Use environment variable or fallback to 'gpt-3.5-turbo'
         model = model or os.getenv("OPENAI_DEFAULT_MODEL", "gpt-3.5-turbo")
-        super().__init__(OpenAILLM(model=model), prompt_template="User: {input}\n")
+        super().__init__(_with_cache(get_llm('openai', model=model), cache), prompt_template=prompt_template)
 
 class AnthropicPlanner(Planner):
-    def __init__(self, model: str = None):
+    def __init__(self, model: str = None, cache: 'ResponseCache' = None, prompt_template: str = "User: {input}\n"):
         # Use environment variable or fallback to 'claude-3-opus-20240229'
         model = model or os.getenv("ANTHROPIC_DEFAULT_MODEL", "claude-3-opus-20240229")
-        super().__init__(AnthropicLLM(model=model), prompt_template="User: {input}\n")
+        super().__init__(_with_cache(get_llm('anthropic', model=model), cache), prompt_template=prompt_template)
 
 # Note: If the selected model is not available or accessible, the LLM provider should raise a clear error during generation.
 # Consider adding try/except blocks in the LLM provider's generate method for robust error handling.
 
 class AnacondaPlanner(Planner):
-    def __init__(self, model: str = None):
-        super().__init__(AnacondaLLM(model=model), prompt_template="{input}") 
\ No newline at end of file
+    def __init__(self, model: str = None, cache: 'ResponseCache' = None, prompt_template: str = "{input}"):
+        super().__init__(_with_cache(get_llm('anaconda', model=model), cache), prompt_template=prompt_template) 
\ No newline at end of file
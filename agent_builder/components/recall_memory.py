@@ -0,0 +1,213 @@
+import logging
+import re
+import threading
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Sequence, Tuple
+from .memory import Memory, Turn
+
+_np = None
+
+def _numpy():
+    global _np
+    if _np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("RecallMemory needs NumPy: pip install agent_builder[recall]") from None
+        _np = numpy
+    return _np
+
+_WORD = re.compile(r"\w+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be but by do for from has have he her his i if in is it its me my no not of on or our "
+    "she so that the their them they this to was we were what when which who will with you your".split())
+
+@lru_cache(maxsize=65536)
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode())
+    # Low bits pick the bucket, the top bit the sign, so colliding features tend to cancel
+    return h % dim, (1.0 if h & 0x80000000 else -1.0)
+
+class HashingEmbedder:
+    """
+    Offline embedder: hashes words and word pairs (minus stop words) into a dim-sized vector.
+    Deterministic and dependency-free beyond NumPy; it matches shared vocabulary rather than
+    meaning, so use OllamaEmbedder (or any object with embed(texts)) for semantic recall.
+    """
+    def __init__(self, dim: int = 256, ngrams: int = 2):
+        self.dim = dim
+        self.ngrams = ngrams
+
+    def _features(self, text: str) -> List[str]:
+        words = [w for w in _WORD.findall(text.lower()) if w not in _STOP_WORDS]
+        features = list(words)
+        for n in range(2, self.ngrams + 1):
+            features.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return features
+
+    def embed(self, texts: Sequence[str]) -> Any:
+        np = _numpy()
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                column, sign = _bucket(feature, self.dim)
+                vectors[row, column] += sign
+        return vectors
+
+class OllamaEmbedder:
+    """Embeddings from an Ollama server's /api/embed (e.g. ollama pull nomic-embed-text)."""
+    def __init__(self, model: str = "nomic-embed-text", base_url: str = None, timeout: float = 30):
+        from agent_builder.llm_providers.ollama_llm import OllamaLLM
+        self.llm = OllamaLLM(model=model, base_url=base_url, timeout=timeout, raise_errors=True)
+
+    def embed(self, texts: Sequence[str]) -> Any:
+        np = _numpy()
+        return np.asarray(self.llm.embed(texts), dtype=np.float32)
+
+class VectorIndex:
+    """
+    Unit vectors in one contiguous float32 matrix that grows by doubling. search() scores every
+    row with a single matrix-vector product and selects the top k with argpartition, so it stays
+    exact and allocation-light as the index grows.
+    """
+    def __init__(self, capacity: int = 1024):
+        self._capacity = max(1, capacity)
+        self._matrix = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def dim(self) -> int:
+        return None if self._matrix is None else self._matrix.shape[1]
+
+    @staticmethod
+    def _normalize(vectors: Any) -> Any:
+        np = _numpy()
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def add(self, vectors: Any) -> None:
+        np = _numpy()
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        count, dim = vectors.shape
+        if self._matrix is None:
+            self._matrix = np.empty((max(self._capacity, count), dim), dtype=np.float32)
+        elif dim != self.dim:
+            raise ValueError(f"Expected {self.dim}-dimensional vectors, got {dim}")
+        if self._size + count > len(self._matrix):
+            grown = np.empty((max(2 * len(self._matrix), self._size + count), dim), dtype=np.float32)
+            grown[:self._size] = self._matrix[:self._size]
+            self._matrix = grown
+        self._matrix[self._size:self._size + count] = self._normalize(vectors)
+        self._size += count
+
+    def search(self, query: Any, k: int, limit: int = None) -> List[Tuple[int, float]]:
+        """(row, cosine similarity) of the k rows most similar to query, best first; only rows < limit count."""
+        np = _numpy()
+        size = self._size if limit is None else max(0, min(limit, self._size))
+        if not size or k <= 0:
+            return []
+        scores = self._matrix[:size] @ self._normalize(np.asarray(query, dtype=np.float32))
+        if k < size:
+            rows = np.argpartition(scores, size - k)[size - k:]
+        else:
+            rows = np.arange(size)
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return [(int(row), float(scores[row])) for row in rows]
+
+    def clear(self) -> None:
+        self._matrix = None
+        self._size = 0
+
+def _embedding_text(turn: Turn) -> str:
+    # The values only: "User:"/"Agent:" labels would make every turn look alike
+    return f"{turn.first}\n{turn.second}"
+
+class RecallMemory(Memory):
+    """
+    Memory that also recalls relevant older turns. Like Memory it keeps the newest max_turns
+    turns verbatim; in addition every turn is archived and embedded into a VectorIndex, and
+    get_context(query) puts the top_k archived turns outside that window whose cosine similarity
+    to the query is at least min_score ahead of the recent turns (in conversation order).
+    Planner passes the user input as the query.
+
+    Turns are embedded lazily, batched with the next query, so each turn costs one embedder
+    call and add_interaction does no embedding work. If the embedder fails, the context falls back
+    to the recent turns. Async planners read the context in a worker thread. Search is exact and
+    linear in the archive, which keeps it near a millisecond up to about 10k archived turns.
+    Needs NumPy (pip install agent_builder[recall]).
+
+        memory = RecallMemory(OllamaEmbedder(), max_turns=6, top_k=4)
+    """
+    uses_query = True
+    # get_context embeds the query, over the network with OllamaEmbedder
+    blocking_context = True
+
+    def __init__(self, embedder: Any = None, top_k: int = 3, min_score: float = 0.2, max_turns: int = 10,
+                 **memory_options):
+        _numpy()
+        super().__init__(max_turns=max_turns, **memory_options)
+        self.embedder = embedder or HashingEmbedder()
+        self.top_k = top_k
+        self.min_score = min_score
+        self.index = VectorIndex()
+        self._archive: List[Turn] = []
+        self._recall_lock = threading.Lock()
+        # Bumped by reset(), so a search that started before it does not index stale turns
+        self._generation = 0
+
+    def _add(self, turn: Turn) -> None:
+        super()._add(turn)
+        with self._recall_lock:
+            self._archive.append(turn)
+
+    def _search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        with self._recall_lock:
+            generation, start = self._generation, len(self.index)
+            pending = self._archive[start:]
+        # The embedder may be a network call: add_interaction must not wait for it
+        vectors = self.embedder.embed([_embedding_text(turn) for turn in pending] + [query])
+        with self._recall_lock:
+            if generation == self._generation:
+                # A concurrent search may have indexed some of these turns meanwhile
+                indexed = len(self.index) - start
+                if indexed < len(pending):
+                    self.index.add(vectors[indexed:len(pending)])
+            # The recent window is already in the context verbatim
+            searchable = len(self.index) - len(self._turns)
+        hits = self.index.search(vectors[len(pending)], k, limit=searchable)
+        return [(row, score) for row, score in hits if score >= self.min_score]
+
+    def recall(self, query: str, k: int = None) -> List[Tuple[Dict[str, Any], float]]:
+        """The archived turns most relevant to query, as (history entry, similarity), best first."""
+        hits = self._search(query, self.top_k if k is None else k)
+        return [(self._archive[row].as_dict(), score) for row, score in hits]
+
+    def get_context(self, query: str = None) -> str:
+        context = super().get_context()
+        if query is None or not self.top_k:
+            return context
+        try:
+            hits = self._search(str(query), self.top_k)
+        except Exception:
+            logging.exception("Memory recall failed; using the recent conversation only")
+            return context
+        if not hits:
+            return context
+        recalled = "\n".join(self._archive[row].text for row, _ in sorted(hits))
+        if context:
+            return f"Relevant earlier conversation:\n{recalled}\n{context}"
+        return f"Relevant earlier conversation:\n{recalled}"
+
+    def reset(self) -> None:
+        super().reset()
+        with self._recall_lock:
+            self._archive = []
+            self.index.clear()
+            self._generation += 1
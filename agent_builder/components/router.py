@@ -0,0 +1,105 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+# First word of an input; selects the candidate rules with one dict lookup
+_HEAD = re.compile(r'\s*([A-Za-z_][\w-]*)')
+# A literal word at the start of a pattern
+_PATTERN_KEYWORD = re.compile(r'\^?([A-Za-z_][\w-]*)')
+# What may follow that word for it to be the input's whole first word: a required separator
+# (whitespace, \s or ':', possibly after optional whitespace), a word boundary, or the end
+_KEYWORD_END = re.compile(r'(?:(?:[ \t]|\\s)[*?])*(?:(?:\$|\\Z)?\Z|\\b|(?:[ \t]|\\s|:)(?![*?]|\{0))')
+
+def _leading_keyword(pattern: str) -> Optional[str]:
+    r"""The word every input matched by pattern starts with, or None if the pattern can match
+    inputs whose first word is longer ('say(.*)', 'hello\w* .+', 'say\s*(.*)')."""
+    if '|' in pattern:
+        return None
+    match = _PATTERN_KEYWORD.match(pattern)
+    if match is None or not _KEYWORD_END.match(pattern, match.end()):
+        return None
+    return match.group(1).lower()
+
+class Router:
+    """
+    Rule-based pre-router: resolves inputs that are deterministic tool commands to tool actions,
+    so they go straight to the Executor without an LLM call. Rules come from the ToolRegistry:
+      - '<tool>: <input>' for every registered tool (tool names are case-insensitive)
+      - regexes a tool lists in a route_patterns attribute, or added with add_rule(); a pattern
+        must match the whole (stripped) input and may capture the tool input in a group named
+        'input' (default: the whole input)
+    Rules are indexed by the literal word they start with, so an input costs one head match and a
+    dict lookup plus the few rules for that word. Tools with routable = False are only reached
+    when the LLM calls them. Rules are recompiled when the registry changes.
+    """
+    def __init__(self, tool_registry: Any):
+        self.tool_registry = tool_registry
+        self._custom: List[Tuple[str, str, int]] = []
+        self._version = None
+        self._names: Dict[str, str] = {}
+        self._by_keyword: Dict[str, List[Tuple[str, Pattern]]] = {}
+        self._anywhere: List[Tuple[str, Pattern]] = []
+        self._lock = threading.Lock()
+
+    def add_rule(self, tool: str, pattern: str, flags: int = re.IGNORECASE) -> None:
+        with self._lock:
+            self._custom.append((tool, pattern, flags))
+            self._version = None
+
+    def _compile(self) -> None:
+        version = self.tool_registry.version
+        if version == self._version:
+            return
+        with self._lock:
+            tools = dict(self.tool_registry.tools)
+            rules = []
+            for name, tool in tools.items():
+                if getattr(tool, 'routable', True):
+                    rules.append((name, re.escape(name) + r'\s*:\s*(?P<input>.*)', re.IGNORECASE))
+                    rules.extend((name, pattern, re.IGNORECASE) for pattern in getattr(tool, 'route_patterns', ()))
+            rules.extend(self._custom)
+            by_keyword, anywhere = {}, []
+            for name, pattern, flags in rules:
+                compiled = re.compile(pattern, flags | re.DOTALL)
+                keyword = _leading_keyword(pattern)
+                if keyword is None:
+                    anywhere.append((name, compiled))
+                else:
+                    by_keyword.setdefault(keyword, []).append((name, compiled))
+            self._names = {name.lower(): name for name in tools}
+            self._by_keyword, self._anywhere = by_keyword, anywhere
+            self._version = version
+
+    @property
+    def tool_names(self) -> List[str]:
+        self._compile()
+        return list(self._names)
+
+    def route(self, text: Any) -> Optional[Dict[str, Any]]:
+        """The tool action for a command input, or None if the input needs the LLM."""
+        if not isinstance(text, str):
+            return None
+        self._compile()
+        head = _HEAD.match(text)
+        candidates = self._by_keyword.get(head.group(1).lower(), ()) if head else ()
+        stripped = None
+        for tool, compiled in (*candidates, *self._anywhere):
+            if stripped is None:
+                stripped = text.strip()
+            match = compiled.fullmatch(stripped)
+            if match:
+                input_text = match.groupdict().get('input')
+                return {'type': 'tool', 'tool': tool,
+                        'input_text': stripped if input_text is None else input_text.strip(), 'context': None}
+        return None
+
+    def match_tool_call(self, text: Any) -> Optional[Dict[str, Any]]:
+        """The tool action for LLM output of the form '<tool>: <input>' naming any registered tool."""
+        if not isinstance(text, str) or ':' not in text:
+            return None
+        self._compile()
+        tool, tool_input = text.split(':', 1)
+        name = self._names.get(tool.strip().lower())
+        if name is None:
+            return None
+        return {'type': 'tool', 'tool': name, 'input_text': tool_input.strip(), 'context': None}
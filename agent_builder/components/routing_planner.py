@@ -0,0 +1,245 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+from .. import metrics
+from ..llm_providers.cached_llm import is_error_response
+from ..llm_providers.registry import describe_llm, get_llm
+from ..tools.token_counter_tool import TokenCounterTool
+from ..utils import run_sync
+from .planner import Planner
+from .router import Router
+
+# A stream that ended before its first delta
+_END = object()
+
+
+class ModelTier:
+    """
+    One provider/model pair a RoutingPlanner can send a prompt to: an LLM instance, or a
+    provider name and model for get_llm. The tier takes prompts of at most max_tokens tokens
+    (None: any size) for which when(input_data), if given, is true.
+    """
+    def __init__(self, llm: Any = None, provider: str = None, model: str = None, max_tokens: int = None,
+                 when: Callable[[str], bool] = None, name: str = None):
+        if llm is None:
+            if provider is None:
+                raise ValueError("ModelTier needs an llm or a provider")
+            llm = get_llm(provider, model=model)
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.when = when
+        provider_name, model_name = describe_llm(llm)
+        self.name = name or (f"{provider_name}:{model_name}" if model_name else provider_name)
+
+    def accepts(self, input_data: str, tokens: int) -> bool:
+        if self.max_tokens is not None and tokens > self.max_tokens:
+            return False
+        return self.when is None or bool(self.when(input_data))
+
+    def __repr__(self):
+        return f"ModelTier({self.name!r}, max_tokens={self.max_tokens})"
+
+
+class RoutingPlanner(Planner):
+    """
+    Planner that sends each prompt to the smallest model able to handle it, so short, simple turns
+    do not pay the latency of the largest model. tiers are ordered from smallest to largest. A
+    prompt goes to the first tier that accepts it (see ModelTier), or the last tier. The prompt is
+    measured with a TokenCounterTool, for the first tier's provider and model by default.
+    classifier(input_data, tokens), if given, is asked first. It returns a tier name or index, or
+    None to apply the tier rules. Tier names must be distinct.
+
+    When a tier raises or answers with an error, the prompt goes to the next larger tier
+    (fallback=False returns the error instead). A stream falls back only before its first delta.
+    Call latency is recorded per tier in agent_llm_tier_seconds{tier,outcome}, and stats()
+    reports each tier's calls, errors and latency percentiles.
+
+        planner = RoutingPlanner([
+            ModelTier(provider="ollama", model="llama3.2:1b", max_tokens=512),
+            ModelTier(provider="anthropic", model="claude-sonnet-4"),
+        ], prompt_template=CONVERSATION_TEMPLATE)
+    """
+    def __init__(self, tiers: Sequence[Union[ModelTier, Any]], prompt_template: str = "{input}", router: Router = None,
+                 route_inputs: bool = True, classifier: Callable[[str, int], Optional[Union[str, int]]] = None,
+                 token_counter: TokenCounterTool = None, fallback: bool = True, window: int = 500):
+        if not tiers:
+            raise ValueError("RoutingPlanner needs at least one tier")
+        # Bare LLMs become tiers that take any prompt
+        self.tiers: List[ModelTier] = [tier if isinstance(tier, ModelTier) else ModelTier(tier) for tier in tiers]
+        names = [tier.name for tier in self.tiers]
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            # Stats, metrics and the classifier address tiers by name
+            raise ValueError(f"Duplicate tier names {duplicates}: give the tiers distinct names (ModelTier(name=...))")
+        # self.llm is the largest model: what a plain Planner with these tiers would have used
+        super().__init__(self.tiers[-1].llm, prompt_template=prompt_template, router=router, route_inputs=route_inputs)
+        self.classifier = classifier
+        if token_counter is None:
+            provider, model = describe_llm(self.tiers[0].llm)
+            token_counter = TokenCounterTool(provider=provider, model=model, interactive=False)
+        self.token_counter = token_counter
+        self.fallback = fallback
+        self._latencies = {tier.name: deque(maxlen=window) for tier in self.tiers}
+        self._counts = {tier.name: {"calls": 0, "errors": 0} for tier in self.tiers}
+        self._lock = threading.Lock()
+
+    def _tier_index(self, choice: Union[str, int]) -> int:
+        if isinstance(choice, int):
+            return max(0, min(choice, len(self.tiers) - 1))
+        for index, tier in enumerate(self.tiers):
+            if tier.name == choice:
+                return index
+        raise ValueError(f"Classifier chose unknown tier {choice!r}")
+
+    def select(self, input_data: str, prompt: str) -> int:
+        """Index of the tier a prompt goes to first."""
+        tokens = self.token_counter.tokenizer(str(prompt))
+        if self.classifier is not None:
+            choice = self.classifier(input_data, tokens)
+            if choice is not None:
+                return self._tier_index(choice)
+        for index, tier in enumerate(self.tiers):
+            if tier.accepts(input_data, tokens):
+                return index
+        return len(self.tiers) - 1
+
+    def _record(self, tier: ModelTier, started: float, ok: bool) -> None:
+        elapsed = time.perf_counter() - started
+        metrics.LLM_TIER_SECONDS.observe(elapsed, tier=tier.name, outcome="ok" if ok else "error")
+        with self._lock:
+            counts = self._counts[tier.name]
+            counts["calls"] += 1
+            if ok:
+                self._latencies[tier.name].append(elapsed)
+            else:
+                counts["errors"] += 1
+
+    def _falls_back(self, tier: ModelTier, index: int, error: Any) -> bool:
+        if not self.fallback or index == len(self.tiers) - 1:
+            return False
+        logging.warning(f"Tier {tier.name} failed ({error}); falling back to {self.tiers[index + 1].name}")
+        return True
+
+    def _call_llm(self, prompt: str, input_data: str) -> Any:
+        for index in range(self.select(input_data, prompt), len(self.tiers)):
+            tier = self.tiers[index]
+            started = time.perf_counter()
+            try:
+                with self._timed_llm_call(tier.llm):
+                    value = tier.llm.generate(prompt)
+            except Exception as e:
+                self._record(tier, started, ok=False)
+                if self._falls_back(tier, index, e):
+                    continue
+                raise
+            failed = is_error_response(value)
+            self._record(tier, started, ok=not failed)
+            if failed and self._falls_back(tier, index, value):
+                continue
+            return value
+
+    async def _acall_llm(self, prompt: str, input_data: str) -> Any:
+        for index in range(self.select(input_data, prompt), len(self.tiers)):
+            tier = self.tiers[index]
+            started = time.perf_counter()
+            try:
+                with self._timed_llm_call(tier.llm):
+                    if hasattr(tier.llm, 'agenerate'):
+                        value = await tier.llm.agenerate(prompt)
+                    else:
+                        value = await run_sync(tier.llm.generate, prompt)
+            except Exception as e:
+                self._record(tier, started, ok=False)
+                if self._falls_back(tier, index, e):
+                    continue
+                raise
+            failed = is_error_response(value)
+            self._record(tier, started, ok=not failed)
+            if failed and self._falls_back(tier, index, value):
+                continue
+            return value
+
+    def _stream_llm(self, prompt: str, input_data: str = None):
+        for index in range(self.select(input_data, prompt), len(self.tiers)):
+            tier = self.tiers[index]
+            started = time.perf_counter()
+            try:
+                if hasattr(tier.llm, 'stream'):
+                    deltas = iter(tier.llm.stream(prompt))
+                else:
+                    value = tier.llm.generate(prompt)
+                    deltas = iter([value['content'] if isinstance(value, dict) else str(value)])
+                first = next(deltas, _END)
+            except Exception as e:
+                self._record(tier, started, ok=False)
+                if self._falls_back(tier, index, e):
+                    continue
+                raise
+            # Providers stream a failure as a single error message
+            failed = first is not _END and is_error_response(first)
+            if failed and self._falls_back(tier, index, first):
+                self._record(tier, started, ok=False)
+                continue
+            try:
+                if first is not _END:
+                    yield first
+                    yield from deltas
+            except Exception:
+                self._record(tier, started, ok=False)
+                raise
+            self._record(tier, started, ok=not failed)
+            return
+
+    async def _astream_llm(self, prompt: str, input_data: str = None):
+        for index in range(self.select(input_data, prompt), len(self.tiers)):
+            tier = self.tiers[index]
+            started = time.perf_counter()
+            deltas = None
+            try:
+                if hasattr(tier.llm, 'astream'):
+                    deltas = tier.llm.astream(prompt)
+                    try:
+                        first = await deltas.__anext__()
+                    except StopAsyncIteration:
+                        first = _END
+                else:
+                    if hasattr(tier.llm, 'agenerate'):
+                        value = await tier.llm.agenerate(prompt)
+                    else:
+                        value = await run_sync(tier.llm.generate, prompt)
+                    first = value['content'] if isinstance(value, dict) else str(value)
+            except Exception as e:
+                self._record(tier, started, ok=False)
+                if self._falls_back(tier, index, e):
+                    continue
+                raise
+            failed = first is not _END and is_error_response(first)
+            if failed and self._falls_back(tier, index, first):
+                self._record(tier, started, ok=False)
+                if deltas is not None:
+                    await deltas.aclose()
+                continue
+            try:
+                if first is not _END:
+                    yield first
+                    if deltas is not None:
+                        async for delta in deltas:
+                            yield delta
+            except Exception:
+                self._record(tier, started, ok=False)
+                raise
+            self._record(tier, started, ok=not failed)
+            return
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per tier: calls, errors, and p50/p95 latency in seconds of recent successful calls."""
+        with self._lock:
+            snapshot = {name: (dict(counts), sorted(self._latencies[name])) for name, counts in self._counts.items()}
+        stats = {}
+        for name, (counts, samples) in snapshot.items():
+            for label, q in (("p50", 0.5), ("p95", 0.95)):
+                counts[label] = samples[min(len(samples) - 1, int(q * len(samples)))] if samples else None
+            stats[name] = counts
+        return stats
@@ -0,0 +1,282 @@
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS memory_turns ("
+    " id INTEGER PRIMARY KEY,"
+    " session_id TEXT NOT NULL,"
+    " first_key TEXT NOT NULL,"
+    " second_key TEXT NOT NULL,"
+    " first TEXT,"
+    " second TEXT,"
+    " text TEXT NOT NULL,"
+    " created_at REAL NOT NULL)",
+    # Last-N reads walk this index backwards from the session's newest turn
+    "CREATE INDEX IF NOT EXISTS memory_turns_session ON memory_turns (session_id, id)",
+)
+_INSERT = ("INSERT INTO memory_turns (session_id, first_key, second_key, first, second, text, created_at)"
+           " VALUES (?, ?, ?, ?, ?, ?, ?)")
+_LAST_N = ("SELECT first_key, second_key, first, second, text FROM memory_turns"
+           " WHERE session_id = ? ORDER BY id DESC LIMIT ?")
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+def _decode(value: Optional[str]) -> Any:
+    try:
+        return json.loads(value) if value is not None else None
+    except ValueError:
+        return value
+
+class MemoryWriteError(RuntimeError):
+    """Queued memory writes that could not be committed."""
+
+class SQLiteMemoryStore:
+    """
+    One SQLite database of conversation turns shared by every session in the process.
+    Writes are append-only inserts queued by add() and committed by a single writer thread: it
+    drains up to batch_size queued rows per transaction, so turns from concurrent sessions share a
+    commit (waiting flush_interval seconds first lets more accumulate). In WAL mode readers (this
+    process's threads or other worker processes) never block on the writer. Each thread reads
+    through its own connection.
+
+    A transaction that fails is retried write_retries times. If it still fails, its turns are
+    lost: the next read of each affected session, and the next flush(), raise MemoryWriteError.
+    A read waits at most read_timeout seconds for the session's queued writes; past that it logs
+    a warning and returns the turns committed so far.
+    """
+    def __init__(self, path: str, wal: bool = True, batch_size: int = 256, flush_interval: float = 0.0,
+                 busy_timeout: float = 5.0, write_retries: int = 3, read_timeout: float = 10.0):
+        self.path = path
+        self.wal = wal
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.busy_timeout = busy_timeout
+        self.write_retries = max(0, write_retries)
+        self.read_timeout = read_timeout
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+        conn.close()
+        self._local = threading.local()
+        self._queue: List[Tuple[int, str, tuple]] = []
+        self._tickets = 0
+        # Tickets up to _processed have been written, or have failed and been recorded as failed
+        self._processed = 0
+        self._session_errors: Dict[str, Exception] = {}
+        self._flush_error: Optional[Exception] = None
+        self.failed_writes = 0
+        # Last queued ticket per session: reads wait for it so a session sees its own writes
+        self._session_tickets: Dict[str, int] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self.transactions = 0
+        self._writer = threading.Thread(target=self._run, name="sqlite-memory-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        if self.wal:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable at checkpoints rather than every commit; safe against corruption in WAL mode
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def _enqueue(self, session_id: str, kind: str, args: tuple) -> int:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"SQLiteMemoryStore for {self.path} is closed")
+            self._tickets += 1
+            self._queue.append((self._tickets, kind, args))
+            self._session_tickets[session_id] = self._tickets
+            self._cond.notify_all()
+            return self._tickets
+
+    def add(self, session_id: str, first_key: str, second_key: str, first: Any, second: Any, text: str) -> None:
+        self._enqueue(session_id, 'insert', (session_id, first_key, second_key, _encode(first), _encode(second),
+                                             text, time.time()))
+
+    def clear(self, session_id: str) -> None:
+        self._enqueue(session_id, 'clear', (session_id,))
+
+    def _run(self) -> None:
+        conn = self._connect()
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    break
+            if self.flush_interval:
+                time.sleep(self.flush_interval)
+            with self._cond:
+                batch = self._queue[:self.batch_size]
+                del self._queue[:len(batch)]
+            error = None
+            for attempt in range(self.write_retries + 1):
+                if attempt:
+                    # Usually a lock held by another process past busy_timeout
+                    time.sleep(min(1.0, 0.05 * 2 ** attempt))
+                try:
+                    self._write(conn, batch)
+                except Exception as e:
+                    error = e
+                    logging.warning(f"Writing {len(batch)} memory operations to {self.path} failed "
+                                    f"(attempt {attempt + 1}): {e}")
+                else:
+                    error = None
+                    break
+            with self._cond:
+                if error is not None:
+                    logging.error(f"Lost {len(batch)} memory operations for {self.path}: {error}")
+                    self.failed_writes += len(batch)
+                    self._flush_error = error
+                    for _, _, args in batch:
+                        self._session_errors[args[0]] = error
+                self._processed = batch[-1][0]
+                self._cond.notify_all()
+        conn.close()
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Tuple[int, str, tuple]]) -> None:
+        with conn:
+            inserts = []
+            for _, kind, args in batch:
+                if kind == 'insert':
+                    inserts.append(args)
+                    continue
+                if inserts:
+                    conn.executemany(_INSERT, inserts)
+                    inserts = []
+                conn.execute("DELETE FROM memory_turns WHERE session_id = ?", args)
+            if inserts:
+                conn.executemany(_INSERT, inserts)
+        self.transactions += 1
+
+    def _wait_for(self, ticket: int, timeout: float = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._processed >= ticket, timeout)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Wait until everything queued so far is written. Raises MemoryWriteError if a write
+        failed since the last flush()."""
+        with self._cond:
+            ticket = self._tickets
+        done = self._wait_for(ticket, timeout)
+        with self._cond:
+            error, self._flush_error = self._flush_error, None
+        if error is not None:
+            raise MemoryWriteError(f"Memory writes to {self.path} were lost: {error}") from error
+        return done
+
+    def last_turns(self, session_id: str, limit: int) -> List[Tuple[str, str, Any, Any, str]]:
+        """The session's newest limit turns, oldest first, including its own queued writes."""
+        with self._cond:
+            ticket = self._session_tickets.get(session_id, 0)
+        if not self._wait_for(ticket, self.read_timeout):
+            logging.warning(f"Memory writes to {self.path} have not been committed after {self.read_timeout}s; "
+                            f"reading session {session_id} without its newest turns")
+        with self._cond:
+            error = self._session_errors.pop(session_id, None)
+        if error is not None:
+            raise MemoryWriteError(f"Turns of session {session_id} could not be written to {self.path}: {error}") from error
+        rows = self._reader().execute(_LAST_N, (session_id, limit)).fetchall()
+        rows.reverse()
+        return [(first_key, second_key, _decode(first), _decode(second), text)
+                for first_key, second_key, first, second, text in rows]
+
+    def sessions(self) -> List[str]:
+        self.flush()
+        return [row[0] for row in self._reader().execute("SELECT DISTINCT session_id FROM memory_turns")]
+
+    def close(self) -> None:
+        """Commit what is queued and stop the writer thread."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._writer.join()
+
+_stores: Dict[str, SQLiteMemoryStore] = {}
+_stores_lock = threading.Lock()
+
+def get_memory_store(path: str, **kwargs) -> SQLiteMemoryStore:
+    """Process-wide store for a database file; the first caller's options win."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None or store._closed:
+            store = _stores[key] = SQLiteMemoryStore(path, **kwargs)
+        return store
+
+@atexit.register
+def _close_stores() -> None:
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.close()
+
+class SQLiteMemory:
+    """
+    Durable Memory for one conversation, stored in SQLite under session_id. Same interface as
+    Memory (add_interaction, get_context, get_history, reset), but nothing is held in RAM between
+    calls: add_interaction queues an append-only insert on the shared store, and get_context /
+    get_history read the newest max_turns turns through the (session_id, id) index. Any number
+    of sessions, and several worker processes, can share one database file.
+
+        memory = SQLiteMemory("agent_memory.db", session_id=user_id)
+    """
+    def __init__(self, path: str = "agent_memory.db", session_id: str = "default", max_turns: int = 10,
+                 store: SQLiteMemoryStore = None, **store_options):
+        self.store = store or get_memory_store(path, **store_options)
+        self.session_id = str(session_id)
+        self.max_turns = max(0, max_turns)
+
+    @property
+    def session_key(self) -> str:
+        return f"sqlite:{self.store.path}:{self.session_id}"
+
+    def add_interaction(self, user: str = None, agent: str = None, input_data: Any = None, result: Any = None) -> None:
+        try:
+            if user is not None and agent is not None:
+                self.store.add(self.session_id, 'user', 'agent', user, agent, f"User: {user}\nAgent: {agent}")
+            elif input_data is not None and result is not None:
+                self.store.add(self.session_id, 'input', 'result', input_data, result,
+                               f"Input: {input_data}\nResult: {result}")
+            else:
+                logging.warning(f"Malformed memory entry: user={user}, agent={agent}, input_data={input_data}, result={result}")
+        except Exception as e:
+            logging.exception(f"Error adding interaction to memory: {e}")
+
+    def _turns(self) -> List[Tuple[str, str, Any, Any, str]]:
+        if not self.max_turns:
+            return []
+        return self.store.last_turns(self.session_id, self.max_turns)
+
+    def get_context(self) -> str:
+        return "\n".join(turn[4] for turn in self._turns())
+
+    @property
+    def history(self) -> List[Dict[str, Any]]:
+        return [{first_key: first, second_key: second} for first_key, second_key, first, second, _ in self._turns()]
+
+    def get_history(self) -> List[Dict[str, Any]]:
+        return self.history
+
+    def reset(self) -> None:
+        self.store.clear(self.session_id)
@@ -1,29 +1,31 @@
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_ollama import ChatOllama
 from agent_builder.tools.token_counter_tool import TokenCounterTool
 from agent_builder.tools.format_response_tool import FormatResponseTool
+from agent_builder.llm_providers.raw_response import RawResponse
+from agent_builder.utils import run_sync
 
 class LangChainLLMWrapper:
-    def __init__(self, provider="openai", model=None, api_key=None, base_url=None):
+    def __init__(self, provider="openai", model=None, api_key=None, base_url=None, confirm_tokens=True):
+        self.provider = provider
+        # Only the integration package for the selected provider is imported
         if provider == "openai":
+            from langchain_openai import ChatOpenAI
             self.llm = ChatOpenAI(model=model or "gpt-3.5-turbo", api_key=api_key, base_url=base_url)
         elif provider == "anthropic":
+            from langchain_anthropic import ChatAnthropic
             self.llm = ChatAnthropic(model=model or "claude-3-opus-20240229", api_key=api_key, base_url=base_url)
         elif provider == "ollama":
+            from langchain_ollama import ChatOllama
             self.llm = ChatOllama(model=model or "llama2", base_url=base_url)
         else:
             raise ValueError(f"Unsupported provider: {provider}")
-        self.token_counter = TokenCounterTool()
+        self.token_counter = TokenCounterTool(provider=provider, model=model, interactive=confirm_tokens)
         self.formatter = FormatResponseTool()
-    def generate(self, prompt):
-        if not self.token_counter.run(prompt):
-            return {"content": "Aborted by user due to token count.", "raw": None}
-        raw_response = self.llm.invoke(prompt)
+
+    def _wrap(self, raw_response):
         content = getattr(raw_response, "content", str(raw_response))
-        # Convert to dict if possible for FormatResponseTool
+        # Converted to a dict for FormatResponseTool only if the raw response is displayed
         if hasattr(raw_response, '__dict__'):
-            raw = raw_response.__dict__
+            raw = RawResponse(raw_response, lambda response: dict(vars(response)))
         else:
             raw = {"content": content}
         return {"content": content, "raw": raw}
@@ -34,4 +36,35 @@ class LangChainLLMWrapper:
         #     "response_metadata": getattr(raw_response, "response_metadata", {}),
         #     "type": getattr(raw_response, "type", None),
         # }
-        # return self.formatter.run(response_dict) 
\ No newline at end of file
+        # return self.formatter.run(response_dict)
+
+    def generate(self, prompt):
+        if not self.token_counter.run(prompt):
+            return {"content": "Aborted by user due to token count.", "raw": None}
+        raw_response = self.llm.invoke(prompt)
+        return self._wrap(raw_response)
+
+    async def agenerate(self, prompt):
+        # The confirmation prompt blocks on input(), so keep it off the event loop
+        if not await run_sync(self.token_counter.run, prompt):
+            return {"content": "Aborted by user due to token count.", "raw": None}
+        raw_response = await self.llm.ainvoke(prompt)
+        return self._wrap(raw_response)
+
+    def stream(self, prompt):
+        if not self.token_counter.run(prompt):
+            yield "Aborted by user due to token count."
+            return
+        for chunk in self.llm.stream(prompt):
+            content = getattr(chunk, "content", str(chunk))
+            if isinstance(content, str) and content:
+                yield content
+
+    async def astream(self, prompt):
+        if not await run_sync(self.token_counter.run, prompt):
+            yield "Aborted by user due to token count."
+            return
+        async for chunk in self.llm.astream(prompt):
+            content = getattr(chunk, "content", str(chunk))
+            if isinstance(content, str) and content:
+                yield content
@@ -1,32 +1,77 @@
-import os
-from .anaconda_llm import AnacondaLLM
-from .anthropic_llm import AnthropicLLM
-from .openai_llm import OpenAILLM
-from .ollama_llm import OllamaLLM
+from .registry import (
+    register_provider, get_provider_class, create_provider, available_providers,
+    get_llm, clear_llms, cached_list_models,
+)
+from .command_llm import CommandLLM
+from .errors import (
+    LLMError, LLMTimeoutError, LLMConnectionError, LLMRateLimitError, LLMServerError,
+    LLMRequestError, LLMAbortedError, CircuitOpenError, AllProvidersFailedError,
+)
+from .raw_response import RawResponse
+from .resilience import CircuitBreaker, RetryPolicy, get_circuit_breaker, reset_circuit_breakers
+from .sessions import SessionPrompt
 
-class CommandLLM:
-    """
-    Generic LLM class that selects the provider based on the environment variable LLM_PROVIDER.
-    Supported providers: 'anaconda', 'anthropic', 'openai', 'ollama'.
-    Reads url, port, and models from environment variables as per each provider's convention.
-    """
-    def __init__(self, model=None, timeout=60):
-        provider = os.getenv("LLM_PROVIDER", "openai").lower()
-        self.provider = provider
-        self.llm = None
-        if provider == "anaconda":
-            self.llm = AnacondaLLM(model=model, timeout=timeout)
-        elif provider == "anthropic":
-            self.llm = AnthropicLLM(model=model, timeout=timeout)
-        elif provider == "openai":
-            self.llm = OpenAILLM(model=model, timeout=timeout)
-        elif provider == "ollama":
-            self.llm = OllamaLLM(model=model, timeout=timeout)
-        else:
-            raise ValueError(f"Unknown LLM_PROVIDER: {provider}")
+# Provider classes and the cache are resolved on attribute access (PEP 562) so that
+# `from agent_builder.llm_providers import CommandLLM` does not import every provider SDK.
+_LAZY = {
+    'AnacondaLLM': 'anaconda',
+    'AnthropicLLM': 'anthropic',
+    'OpenAILLM': 'openai',
+    'OllamaLLM': 'ollama',
+}
 
-    def generate(self, prompt):
-        return self.llm.generate(prompt)
 
-    def list_models(self):
-        return self.llm.list_models() 
\ No newline at end of file
+def __getattr__(name):
+    if name in _LAZY:
+        return get_provider_class(_LAZY[name])
+    if name in ('CachedLLM', 'ResponseCache'):
+        from . import cached_llm
+        return getattr(cached_llm, name)
+    if name == 'HedgedLLM':
+        from .hedging import HedgedLLM
+        return HedgedLLM
+    if name in ('CoalescingLLM', 'SingleFlight'):
+        from . import coalescing
+        return getattr(coalescing, name)
+    if name in ('ModelResidency', 'get_residency'):
+        from . import residency
+        return getattr(residency, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+__all__ = [
+    'AllProvidersFailedError',
+    'AnacondaLLM',
+    'AnthropicLLM',
+    'CachedLLM',
+    'CircuitBreaker',
+    'CircuitOpenError',
+    'CoalescingLLM',
+    'CommandLLM',
+    'HedgedLLM',
+    'LLMAbortedError',
+    'LLMConnectionError',
+    'LLMError',
+    'LLMRateLimitError',
+    'LLMRequestError',
+    'LLMServerError',
+    'LLMTimeoutError',
+    'ModelResidency',
+    'OllamaLLM',
+    'OpenAILLM',
+    'RawResponse',
+    'ResponseCache',
+    'RetryPolicy',
+    'SessionPrompt',
+    'SingleFlight',
+    'available_providers',
+    'cached_list_models',
+    'clear_llms',
+    'create_provider',
+    'get_circuit_breaker',
+    'get_llm',
+    'get_provider_class',
+    'get_residency',
+    'register_provider',
+    'reset_circuit_breakers',
+]
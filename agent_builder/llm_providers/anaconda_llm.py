@@ -1,26 +1,69 @@
+import json
 import requests
+import httpx
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from agent_builder import metrics
+from agent_builder.utils import load_env
+from .errors import LLMError, to_llm_error
+from .http_pool import HealthCheck, get_pool
+from .registry import cached_list_models
+from .sessions import SlotTable
 
 class AnacondaLLM:
-    def __init__(self, model=None, api_key=None, base_url=None, timeout=60):
+    """
+    Client for a llama.cpp server's /completion endpoint (Anaconda AI Navigator). Requests set
+    cache_prompt, so the server only evaluates the part of a prompt after the prefix it already
+    has in the slot's KV cache. With slots (or ANACONDA_SLOTS) set to the server's --parallel
+    count, prompts tagged with a session (see SessionPrompt) are pinned to one slot per session,
+    so each conversation finds its own prefix cached there.
+    """
+    def __init__(self, model=None, api_key=None, base_url=None, timeout=60, pool_maxsize=10, gzip=True, pool=None, health_check=None, raise_errors=False,
+                 slots=None):
+        load_env()
         self.base_url = base_url or os.getenv("ANACONDA_BASE_URL", "http://127.0.0.1:8080")
         self.api_key = api_key or os.getenv("ANACONDA_API_KEY")
         self.timeout = timeout
-        # Health check before proceeding
-        health_url = f"{self.base_url}/health"
-        try:
-            health_response = requests.get(health_url, timeout=self.timeout)
-            if health_response.status_code != 200:
-                raise RuntimeError(f"Anaconda LLM health check failed: {health_response.status_code} {health_response.text}")
-        except Exception as e:
-            raise RuntimeError(f"Anaconda LLM health check failed: {e}")
-        self.model = model or self.get_first_model()
+        self.raise_errors = raise_errors
+        # Keep-alive connection pool shared by every AnacondaLLM pointing at this server
+        self.pool = pool or get_pool(self.base_url, pool_maxsize=pool_maxsize, gzip=gzip)
+        self.session = self.pool.session
+        # Construction stays offline: health_check="eager" probes the server now (raising on
+        # failure), "background" probes it on a daemon thread, None leaves it to check_health()
+        self.health = HealthCheck(self.pool, f"{self.base_url}/health", "Anaconda LLM", timeout=self.timeout)
+        if health_check == "eager":
+            self.health.check()
+        elif health_check == "background":
+            self.health.check_in_background()
+        # Resolved from the server's model list on first use
+        self._model = model
+        self.slots = SlotTable(int(os.getenv("ANACONDA_SLOTS", "0")) if slots is None else slots)
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self.get_first_model()
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+
+    def _error(self, message, e=None):
+        # raise_errors=True raises a typed LLMError (what CommandLLM retries and fails over on)
+        # instead of returning the message in place of the model's reply
+        error = e if isinstance(e, LLMError) else to_llm_error(e, "Anaconda", message)
+        metrics.LLM_ERRORS.inc(provider="anaconda", model=self._model, type=type(error).__name__)
+        if self.raise_errors:
+            if error is e:
+                raise error
+            raise error from e
+        return message
+
+    def check_health(self):
+        self.health.check()
 
     def get_first_model(self):
-        models = self.list_models()
+        models = cached_list_models(self)
         if models:
             return models[0]
         return "meta-llama/Llama-3-8b-Instruct"
@@ -29,7 +72,7 @@ class AnacondaLLM:
         url = f"{self.base_url}/models"
         headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
         try:
-            response = requests.get(url, headers=headers, timeout=self.timeout)
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
             response.raise_for_status()
             data = response.json()
             models = []
@@ -52,31 +95,112 @@ class AnacondaLLM:
             print("Could not list models from Anaconda AI Navigator:", e)
         return []
 
-    def generate(self, prompt):
-        url = f"{self.base_url}/completion"
+    def _headers(self):
         headers = {
             "Content-Type": "application/json",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) PowerShell/7.2.0",
-            "Connection": "close"
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) PowerShell/7.2.0"
         }
         if self.api_key:
             headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _payload(self, prompt, stream=False):
         payload = {
-            "prompt": prompt
+            "prompt": prompt,
+            "cache_prompt": True
         }
+        slot = self.slots.slot(getattr(prompt, "session", None))
+        if slot is not None:
+            payload["id_slot"] = slot
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    def _record_usage(self, data):
+        # llama.cpp reports tokens_evaluated (prompt) and tokens_predicted (completion)
+        metrics.record_usage("anaconda", self._model, data.get("tokens_evaluated"), data.get("tokens_predicted"))
+
+    def _parse_completion(self, data):
+        self._record_usage(data)
+        if "content" in data:
+            return data["content"].strip()
+        elif "text" in data:
+            return data["text"].strip()
+        elif "choices" in data and data["choices"]:
+            return data["choices"][0].get("text", "").strip()
+        else:
+            return str(data)
+
+    def _parse_event(self, line):
+        # llama.cpp streams server-sent events: 'data: {"content": ..., "stop": ...}'
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        if not line or not line.startswith("data:"):
+            return None
+        return json.loads(line[len("data:"):].strip())
+
+    def generate(self, prompt):
+        url = f"{self.base_url}/completion"
+        payload = self._payload(prompt)
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=self.timeout)
+            response = self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
             response.raise_for_status()
-            data = response.json()
-            if "content" in data:
-                return data["content"].strip()
-            elif "text" in data:
-                return data["text"].strip()
-            elif "choices" in data and data["choices"]:
-                return data["choices"][0].get("text", "").strip()
-            else:
-                return str(data)
-        except requests.exceptions.Timeout:
-            return "The request to Anaconda timed out. Please try again."
+            return self._parse_completion(response.json())
+        except requests.exceptions.Timeout as e:
+            return self._error("The request to Anaconda timed out. Please try again.", e)
+        except requests.exceptions.RequestException as e:
+            return self._error(f"An error occurred with Anaconda: {e}", e)
+
+    async def agenerate(self, prompt):
+        url = f"{self.base_url}/completion"
+        payload = self._payload(prompt)
+        try:
+            client = self.pool.async_client()
+            response = await client.post(url, headers=self._headers(), json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            return self._parse_completion(response.json())
+        except httpx.TimeoutException as e:
+            return self._error("The request to Anaconda timed out. Please try again.", e)
+        except httpx.HTTPError as e:
+            return self._error(f"An error occurred with Anaconda: {e}", e)
+
+    def stream(self, prompt):
+        url = f"{self.base_url}/completion"
+        payload = self._payload(prompt, stream=True)
+        try:
+            with self.session.post(url, headers=self._headers(), json=payload, timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    data = self._parse_event(line)
+                    if data is None:
+                        continue
+                    if data.get("content"):
+                        yield data["content"]
+                    if data.get("stop"):
+                        self._record_usage(data)
+                        break
+        except requests.exceptions.Timeout as e:
+            yield self._error("The request to Anaconda timed out. Please try again.", e)
         except requests.exceptions.RequestException as e:
-            return f"An error occurred with Anaconda: {e}"
\ No newline at end of file
+            yield self._error(f"An error occurred with Anaconda: {e}", e)
+
+    async def astream(self, prompt):
+        url = f"{self.base_url}/completion"
+        payload = self._payload(prompt, stream=True)
+        try:
+            client = self.pool.async_client()
+            async with client.stream("POST", url, headers=self._headers(), json=payload, timeout=self.timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    data = self._parse_event(line)
+                    if data is None:
+                        continue
+                    if data.get("content"):
+                        yield data["content"]
+                    if data.get("stop"):
+                        self._record_usage(data)
+                        break
+        except httpx.TimeoutException as e:
+            yield self._error("The request to Anaconda timed out. Please try again.", e)
+        except httpx.HTTPError as e:
+            yield self._error(f"An error occurred with Anaconda: {e}", e)
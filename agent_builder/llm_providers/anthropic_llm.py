@@ -1,21 +1,58 @@
 import anthropic
 from anthropic import APITimeoutError
+import asyncio
 import os
-from dotenv import load_dotenv
+import weakref
 from agent_builder.tools.token_counter_tool import TokenCounterTool
+from agent_builder import metrics
+from agent_builder.utils import load_env, run_sync
+from .errors import LLMAbortedError, LLMError, to_llm_error
+from .sessions import PromptSessions
 
-load_dotenv()
+def _sdk_base_url(base_url):
+    # The SDK adds /v1 to its paths, so a base URL given as ".../v1" (as documented) is trimmed
+    base_url = base_url.rstrip("/")
+    return base_url[:-len("/v1")] if base_url.endswith("/v1") else base_url
+
+# Past this many content blocks a conversation starts over as one block (one cache miss)
+_MAX_BLOCKS = 32
 
 class AnthropicLLM:
-    def __init__(self, model=None, api_key=None, base_url=None, timeout=60):
+    """
+    Anthropic Messages API client. A prompt tagged with a session (see SessionPrompt) is sent as
+    content blocks: the blocks sent for the session's previous turn, unchanged, then the text
+    appended since, with a cache breakpoint on the last block. The conversation so far is then
+    read from Anthropic's prompt cache instead of being processed again (prompt_caching=False
+    sends the prompt as a single text).
+    """
+    def __init__(self, model=None, api_key=None, base_url=None, timeout=60, confirm_tokens=True, raise_errors=False,
+                 prompt_caching=True, max_sessions=1024):
+        load_env()
         self.base_url = base_url or os.getenv("ANTHROPIC_BASE_URL", "https://api.anthropic.com/v1")
         self.api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
         if not self.api_key:
             raise RuntimeError("ANTHROPIC_API_KEY is not set.")
-        self.client = anthropic.Anthropic(api_key=self.api_key, timeout=timeout)
+        # Passed to the SDK so that instances for different base URLs (see get_llm) talk to different servers
+        self.client = anthropic.Anthropic(api_key=self.api_key, base_url=_sdk_base_url(self.base_url), timeout=timeout)
+        # One async client per event loop: its pooled connections belong to the loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
         self.model = model or self.get_first_model()
         self.timeout = timeout
-        self.token_counter = TokenCounterTool()
+        self.raise_errors = raise_errors
+        # confirm_tokens=False skips the interactive token-count confirmation (batch jobs, servers)
+        self.token_counter = TokenCounterTool(provider="anthropic", model=self.model, interactive=confirm_tokens)
+        self.prompt_caching = prompt_caching
+        self.sessions = PromptSessions(max_sessions=max_sessions)
+
+    @property
+    def async_client(self):
+        # Created on first use so purely synchronous callers never pay for it
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = anthropic.AsyncAnthropic(
+                api_key=self.api_key, base_url=_sdk_base_url(self.base_url), timeout=self.timeout)
+        return client
 
     def get_first_model(self):
         models = self.list_models()
@@ -32,22 +69,110 @@ class AnthropicLLM:
             "claude-sonnet-4"
         ]
 
+    def _error_message(self, e):
+        if isinstance(e, APITimeoutError):
+            return "The request to Anthropic timed out. Please try again."
+        if isinstance(e, anthropic.APIStatusError) and e.status_code == 404:
+            return f"Model '{self.model}' is not available to your Anthropic account. Please choose another model."
+        return f"An error occurred with Anthropic: {e}"
+
+    def _error(self, message, e=None):
+        # raise_errors=True raises a typed LLMError (what CommandLLM retries and fails over on)
+        # instead of returning the message in place of the model's reply
+        error = e if isinstance(e, LLMError) else to_llm_error(e, "Anthropic", message)
+        metrics.LLM_ERRORS.inc(provider="anthropic", model=self.model, type=type(error).__name__)
+        if self.raise_errors:
+            if error is e:
+                raise error
+            raise error from e
+        return message
+
+    def _aborted(self):
+        return self._error("Aborted by user due to token count.", LLMAbortedError("Aborted by user due to token count.", provider="Anthropic"))
+
+    def _messages(self, prompt):
+        """The messages for prompt, and the content blocks to remember for its session (or None)."""
+        if not self.prompt_caching or getattr(prompt, "session", None) is None:
+            return [{"role": "user", "content": prompt}], None
+        _, rest, blocks = self.sessions.split(prompt)
+        blocks = blocks + (rest,) if blocks and len(blocks) < _MAX_BLOCKS else (prompt.lstrip(),)
+        metrics.PREFIX_REUSE.inc(provider="anthropic", result="continued" if len(blocks) > 1 else "full")
+        content = [{"type": "text", "text": block} for block in blocks]
+        content[-1]["cache_control"] = {"type": "ephemeral"}
+        return [{"role": "user", "content": content}], blocks
+
+    def _remember(self, prompt, blocks):
+        if blocks is not None:
+            self.sessions.update(prompt, blocks)
+
+    def _parse_response(self, response):
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.record_usage("anthropic", self.model, getattr(usage, "input_tokens", None), getattr(usage, "output_tokens", None))
+        return response.content[0].text.strip()
+
     def generate(self, prompt):
         if not self.token_counter.run(prompt):
-            return "Aborted by user due to token count."
+            return self._aborted()
         try:
             print(f"DEBUG: Using model: {self.model}, API key starts with: {self.api_key[:6]}")
+            messages, blocks = self._messages(prompt)
             response = self.client.messages.create(
                 model=self.model,
                 max_tokens=512,
-                messages=[{"role": "user", "content": prompt}]
+                messages=messages
             )
-            return response.content[0].text.strip()
-        except anthropic.APIStatusError as e:
-            if e.status_code == 404:
-                return f"Model '{self.model}' is not available to your Anthropic account. Please choose another model."
-            return f"An error occurred with Anthropic: {e}"
-        except APITimeoutError:
-            return "The request to Anthropic timed out. Please try again."
+            self._remember(prompt, blocks)
+            return self._parse_response(response)
+        except Exception as e:
+            return self._error(self._error_message(e), e)
+
+    async def agenerate(self, prompt):
+        # The confirmation prompt blocks on input(), so keep it off the event loop
+        if not await run_sync(self.token_counter.run, prompt):
+            return self._aborted()
+        try:
+            messages, blocks = self._messages(prompt)
+            response = await self.async_client.messages.create(
+                model=self.model,
+                max_tokens=512,
+                messages=messages
+            )
+            self._remember(prompt, blocks)
+            return self._parse_response(response)
+        except Exception as e:
+            return self._error(self._error_message(e), e)
+
+    def stream(self, prompt):
+        if not self.token_counter.run(prompt):
+            yield self._aborted()
+            return
+        try:
+            messages, blocks = self._messages(prompt)
+            with self.client.messages.stream(
+                model=self.model,
+                max_tokens=512,
+                messages=messages
+            ) as response:
+                for text in response.text_stream:
+                    yield text
+            self._remember(prompt, blocks)
+        except Exception as e:
+            yield self._error(self._error_message(e), e)
+
+    async def astream(self, prompt):
+        if not await run_sync(self.token_counter.run, prompt):
+            yield self._aborted()
+            return
+        try:
+            messages, blocks = self._messages(prompt)
+            async with self.async_client.messages.stream(
+                model=self.model,
+                max_tokens=512,
+                messages=messages
+            ) as response:
+                async for text in response.text_stream:
+                    yield text
+            self._remember(prompt, blocks)
         except Exception as e:
-            return f"An error occurred with Anthropic: {e}" 
\ No newline at end of file
+            yield self._error(self._error_message(e), e)
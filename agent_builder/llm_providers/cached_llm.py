@@ -0,0 +1,295 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import Any, Dict, Optional, Tuple
+from agent_builder import metrics
+from agent_builder.utils import run_sync
+from .registry import describe_llm
+
+# Provider replies that describe a failure rather than an answer; these are never cached
+_ERROR_MARKERS = (
+    "An error occurred with",
+    "timed out. Please try again",
+    "Aborted by user due to token count",
+    "is not available to your Anthropic account",
+)
+
+
+def is_error_response(value: Any) -> bool:
+    content = value.get("content") if isinstance(value, dict) else value
+    return isinstance(content, str) and any(marker in content for marker in _ERROR_MARKERS)
+
+
+def _plain(value: Any) -> Any:
+    # Raw responses (RawResponse) are stored as plain dicts
+    if isinstance(value, Mapping):
+        return dict(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_value(value: Any) -> bytes:
+    """Cached replies are stored as JSON, never pickled: loading a cache file runs no code."""
+    return json.dumps(value, default=_plain, separators=(",", ":")).encode("utf-8")
+
+
+class LRUCache:
+    """
+    In-memory LRU tier. Evicts least recently used entries once either max_entries or
+    max_bytes (measured on the JSON-encoded value) is exceeded.
+    """
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            blob = self.entries.get(key)
+            if blob is not None:
+                self.entries.move_to_end(key)
+            return blob
+
+    def set(self, key: str, blob: bytes) -> None:
+        if len(blob) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self.entries[key] = blob
+            self.total_bytes += len(blob)
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+
+class SQLiteCache:
+    """
+    Optional on-disk tier. Entries expire ttl seconds after being written (None keeps them forever).
+    Expired rows are deleted by set(), at most once every purge_interval seconds, so the file
+    does not grow without bound.
+    """
+    def __init__(self, path: str, ttl: Optional[float] = None, purge_interval: float = 60.0):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value FROM responses WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, blob: bytes) -> None:
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, sqlite3.Binary(blob), expires_at),
+            )
+            if self.ttl is not None and now >= self._next_purge:
+                self._purge(now)
+
+    def _purge(self, now: float) -> int:
+        self._next_purge = now + self.purge_interval
+        cursor = self.conn.execute("DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+        return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        with self.lock, self.conn:
+            return self._purge(time.time())
+
+    def clear(self) -> None:
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    """
+    Two-tier response cache keyed by (provider, model, rendered prompt, generation params).
+    Lookups try the in-memory LRU tier first, then the optional SQLite tier (promoting hits).
+    """
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 disk_path: Optional[str] = None, ttl: Optional[float] = None):
+        self.memory = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self.disk = SQLiteCache(disk_path, ttl=ttl) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def make_key(provider: str, model: Optional[str], prompt: str, params: Optional[Dict[str, Any]] = None) -> str:
+        material = json.dumps([provider, model, prompt, params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        blob = self.memory.get(key)
+        from_disk = False
+        if blob is None and self.disk is not None:
+            blob = self.disk.get(key)
+            if blob is not None:
+                try:
+                    value = json.loads(blob)
+                except ValueError:
+                    # Written by an older version (pickled) or corrupted: treat as a miss
+                    blob = None
+                else:
+                    from_disk = True
+                    self.memory.set(key, blob)
+        with self.lock:
+            if blob is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                if from_disk:
+                    self.disk_hits += 1
+        if blob is None:
+            metrics.CACHE_LOOKUPS.inc(result="miss")
+            return False, None
+        metrics.CACHE_LOOKUPS.inc(result="disk_hit" if from_disk else "hit")
+        return True, value if from_disk else json.loads(blob)
+
+    def set(self, key: str, value: Any) -> None:
+        try:
+            blob = encode_value(value)
+        except (TypeError, ValueError):
+            logging.warning(f"Response for cache key {key} is not JSON serializable; not cached.")
+            return
+        self.memory.set(key, blob)
+        if self.disk is not None:
+            self.disk.set(key, blob)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.memory.entries),
+                "bytes": self.memory.total_bytes,
+            }
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+class CachedLLM:
+    """
+    Wraps any LLM (a provider, CommandLLM, LangChainLLMWrapper, ...) and serves repeated prompts
+    from a ResponseCache without calling the wrapped LLM. Failed replies are never cached.
+    params should hold any generation settings that change the output (temperature, max tokens, ...).
+    """
+    def __init__(self, llm: Any, cache: ResponseCache = None, params: Dict[str, Any] = None):
+        self.llm = llm
+        self.cache = cache or ResponseCache()
+        self.params = params or {}
+
+    # Read from the wrapped LLM on each use: its model can change after wrapping (CommandLLM,
+    # a model switch), and reading it can be lazy
+    @property
+    def provider(self) -> str:
+        return describe_llm(self.llm)[0]
+
+    @property
+    def model(self) -> Optional[str]:
+        return describe_llm(self.llm)[1]
+
+    def _key(self, prompt: str, mode: str = "generate") -> str:
+        params = dict(self.params, _mode=mode) if mode != "generate" else self.params
+        provider, model = describe_llm(self.llm)
+        return self.cache.make_key(provider, model, prompt, params)
+
+    def generate(self, prompt):
+        key = self._key(prompt)
+        found, value = self.cache.get(key)
+        if found:
+            return value
+        value = self.llm.generate(prompt)
+        if not is_error_response(value):
+            self.cache.set(key, value)
+        return value
+
+    async def agenerate(self, prompt):
+        key = self._key(prompt)
+        found, value = self.cache.get(key)
+        if found:
+            return value
+        if hasattr(self.llm, "agenerate"):
+            value = await self.llm.agenerate(prompt)
+        else:
+            value = await run_sync(self.llm.generate, prompt)
+        if not is_error_response(value):
+            self.cache.set(key, value)
+        return value
+
+    def stream(self, prompt):
+        # Streamed replies are stored as plain text, separately from generate() results
+        key = self._key(prompt, mode="stream")
+        found, value = self.cache.get(key)
+        if found:
+            yield value
+            return
+        deltas = []
+        if hasattr(self.llm, "stream"):
+            for delta in self.llm.stream(prompt):
+                deltas.append(delta)
+                yield delta
+        else:
+            value = self.llm.generate(prompt)
+            deltas.append(value["content"] if isinstance(value, dict) else str(value))
+            yield deltas[0]
+        text = "".join(deltas)
+        if not is_error_response(text):
+            self.cache.set(key, text)
+
+    async def astream(self, prompt):
+        key = self._key(prompt, mode="stream")
+        found, value = self.cache.get(key)
+        if found:
+            yield value
+            return
+        deltas = []
+        if hasattr(self.llm, "astream"):
+            async for delta in self.llm.astream(prompt):
+                deltas.append(delta)
+                yield delta
+        else:
+            value = await self.agenerate(prompt)
+            deltas.append(value["content"] if isinstance(value, dict) else str(value))
+            yield deltas[0]
+        text = "".join(deltas)
+        if not is_error_response(text):
+            self.cache.set(key, text)
+
+    def list_models(self):
+        return self.llm.list_models()
@@ -0,0 +1,215 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from agent_builder import metrics
+from agent_builder.utils import run_sync
+from .registry import describe_llm
+
+# Outcome of a flight whose leader was cancelled: its followers start over
+_ABANDONED = object()
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error', 'waiters', 'loop')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        # (loop, future) of asyncio followers; None once the flight has finished
+        self.waiters: Optional[List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]]] = []
+        # The leader's event loop, when the leader is a task
+        self.loop = None
+
+    def result(self) -> Any:
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls by key. The first caller for a key (the leader) makes the call;
+    callers arriving with the same key while it is in flight wait for it and receive the same
+    result, or the same exception. Threads and asyncio tasks (on any event loop) can wait on
+    each other's calls. Nothing is kept after a call completes, so a later call always goes
+    upstream: this removes duplicate load without serving stale results. If a leader task is
+    cancelled, its followers elect a new leader.
+    """
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.shared = 0
+
+    def _join(self, key: Hashable) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.calls += 1
+            return flight, True
+
+    def _finish(self, key: Hashable, flight: _Flight, value: Any = None, error: Any = None) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.value, flight.error = value, error
+            waiters, flight.waiters = flight.waiters, None
+            flight.done.set()
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, future)
+            except RuntimeError:
+                # The follower's loop has closed
+                pass
+
+    def _shared(self, flight: _Flight) -> Any:
+        with self._lock:
+            self.shared += 1
+        return flight.result()
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                try:
+                    value = fn()
+                except Exception as e:
+                    self._finish(key, flight, error=e)
+                    raise
+                except BaseException:
+                    self._finish(key, flight, error=_ABANDONED)
+                    raise
+                self._finish(key, flight, value=value)
+                return value
+            if flight.loop is not None and flight.loop is _running_loop():
+                # The leader is a task on the loop this thread is running: blocking would stall it
+                return fn()
+            flight.done.wait()
+            if flight.error is not _ABANDONED:
+                return self._shared(flight)
+
+    async def ado(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        while True:
+            flight, leader = self._join(key)
+            if leader:
+                flight.loop = asyncio.get_running_loop()
+                try:
+                    value = await fn()
+                except Exception as e:
+                    self._finish(key, flight, error=e)
+                    raise
+                except BaseException:
+                    self._finish(key, flight, error=_ABANDONED)
+                    raise
+                self._finish(key, flight, value=value)
+                return value
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                future = None
+                if flight.waiters is not None:
+                    future = loop.create_future()
+                    flight.waiters.append((loop, future))
+            if future is not None:
+                await future
+            if flight.error is not _ABANDONED:
+                return self._shared(flight)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls, shared = self.calls, self.shared
+        return {"calls": calls, "shared": shared, "share_rate": shared / (calls + shared) if calls + shared else 0.0}
+
+
+class CoalescingLLM:
+    """
+    Wraps any LLM so that concurrent generate()/agenerate() calls with the same prompt share one
+    upstream call (see SingleFlight): a burst of identical greetings, probes or retries costs one
+    request. Every caller receives the same reply object. key(prompt) can narrow or widen what
+    counts as identical; pass one SingleFlight to several wrappers to coalesce across them.
+    Streams are passed through: each stream() call is its own upstream request.
+    """
+    def __init__(self, llm: Any, flights: SingleFlight = None, key: Callable[[str], Hashable] = None):
+        self.llm = llm
+        self.flights = flights or SingleFlight()
+        self.key = key
+
+    # Read from the wrapped LLM on each use, as CachedLLM does: its model can change after
+    # wrapping, and reading it can be lazy
+    @property
+    def provider(self) -> str:
+        return describe_llm(self.llm)[0]
+
+    @property
+    def model(self) -> Optional[str]:
+        return describe_llm(self.llm)[1]
+
+    def _key(self, prompt: str, mode: str) -> Hashable:
+        provider, model = describe_llm(self.llm)
+        return (provider, model, mode, self.key(prompt) if self.key else str(prompt))
+
+    def _count(self, ran: List[bool]) -> None:
+        if not ran:
+            metrics.LLM_COALESCED.inc(provider=self.provider)
+
+    def generate(self, prompt):
+        ran = []
+
+        def call():
+            ran.append(True)
+            return self.llm.generate(prompt)
+        value = self.flights.do(self._key(prompt, "generate"), call)
+        self._count(ran)
+        return value
+
+    async def agenerate(self, prompt):
+        ran = []
+
+        async def call():
+            ran.append(True)
+            if hasattr(self.llm, "agenerate"):
+                return await self.llm.agenerate(prompt)
+            return await run_sync(self.llm.generate, prompt)
+        # Same key as generate(): sync and async callers share flights
+        value = await self.flights.ado(self._key(prompt, "generate"), call)
+        self._count(ran)
+        return value
+
+    def stream(self, prompt):
+        if hasattr(self.llm, "stream"):
+            yield from self.llm.stream(prompt)
+        else:
+            value = self.generate(prompt)
+            yield value["content"] if isinstance(value, dict) else str(value)
+
+    async def astream(self, prompt):
+        if hasattr(self.llm, "astream"):
+            async for delta in self.llm.astream(prompt):
+                yield delta
+        else:
+            value = await self.agenerate(prompt)
+            yield value["content"] if isinstance(value, dict) else str(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.flights.stats()
+
+    def list_models(self):
+        return self.llm.list_models()
@@ -0,0 +1,179 @@
+import logging
+import os
+import time
+from typing import Any, Iterator, List, Sequence, Tuple, Union
+from .errors import AllProvidersFailedError, CircuitOpenError, LLMAbortedError, LLMError, LLMRequestError, to_llm_error
+from .rate_limit import RateLimitedLLM
+from .registry import cached_list_models, get_llm, get_provider_class
+from .resilience import RetryPolicy, get_circuit_breaker
+
+class CommandLLM:
+    """
+    Generic LLM class that selects the provider based on the environment variable LLM_PROVIDER.
+    Supported providers: 'anaconda', 'anthropic', 'openai', 'ollama' (plus any added with register_provider).
+    Reads url, port, and models from environment variables as per each provider's convention.
+
+    CommandLLM is also a routing layer: given an ordered list of providers (the providers argument
+    or a comma-separated LLM_PROVIDER such as "ollama,openai") it retries transient failures with
+    jittered exponential backoff, skips backends whose circuit breaker is open, and fails over to
+    the next provider. Failures are raised as typed LLMErrors instead of being returned as text;
+    AllProvidersFailedError carries the error from every provider tried. model applies to the
+    first provider; entries may be (provider, model) pairs to pin the others.
+    Setting <PROVIDER>_RPM / <PROVIDER>_TPM (e.g. OPENAI_TPM=90000) puts that provider behind the
+    shared client-side rate limiter for its API key.
+    """
+    def __init__(self, model=None, timeout=60, confirm_tokens=True,
+                 providers: Sequence[Union[str, Tuple[str, str]]] = None, retry: RetryPolicy = None,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        if providers is None:
+            providers = [p.strip() for p in os.getenv("LLM_PROVIDER", "openai").split(",") if p.strip()]
+        self.routes: List[Tuple[str, Any]] = []
+        for index, entry in enumerate(providers):
+            name, route_model = (entry, model if index == 0 else None) if isinstance(entry, str) else entry
+            name = name.lower()
+            try:
+                get_provider_class(name)
+            except ValueError:
+                raise ValueError(f"Unknown LLM_PROVIDER: {name}")
+            self.routes.append((name, route_model))
+        if not self.routes:
+            raise ValueError("CommandLLM needs at least one provider")
+        self.provider = self.routes[0][0]
+        self.timeout = timeout
+        self.confirm_tokens = confirm_tokens
+        self.retry = retry or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._llms = {}
+
+    @property
+    def llm(self):
+        """The primary provider instance."""
+        return self._get(*self.routes[0])
+
+    def _get(self, name, model):
+        llm = self._llms.get((name, model))
+        if llm is None:
+            # Shared with every other CommandLLM routing to the same provider and model
+            llm = get_llm(name, model=model, timeout=self.timeout, confirm_tokens=self.confirm_tokens, raise_errors=True)
+            rpm, tpm = os.getenv(f"{name.upper()}_RPM"), os.getenv(f"{name.upper()}_TPM")
+            if rpm or tpm:
+                llm = RateLimitedLLM(llm, rpm=float(rpm) if rpm else None, tpm=float(tpm) if tpm else None)
+            self._llms[(name, model)] = llm
+        return llm
+
+    def _candidates(self, errors: List[LLMError]) -> Iterator[Tuple[str, Any, Any]]:
+        """Yield (name, llm, breaker) for each provider that can take a request right now."""
+        for name, model in self.routes:
+            try:
+                llm = self._get(name, model)
+            except Exception as e:
+                # e.g. a missing API key: not retryable, move on to the next provider
+                errors.append(LLMRequestError(str(e), provider=name))
+                continue
+            breaker = get_circuit_breaker(name, getattr(llm, "base_url", None),
+                                          failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout)
+            if not breaker.allow():
+                errors.append(CircuitOpenError(f"circuit open for {name}", provider=name))
+                continue
+            yield name, llm, breaker
+
+    def _failed(self, name, breaker, e, errors) -> LLMError:
+        error = to_llm_error(e, name)
+        if isinstance(error, LLMAbortedError):
+            breaker.release()
+            raise error
+        if error.retryable:
+            breaker.record_failure()
+        else:
+            breaker.release()
+        errors.append(error)
+        return error
+
+    def generate(self, prompt):
+        errors: List[LLMError] = []
+        for name, llm, breaker in self._candidates(errors):
+            delays = self.retry.delays()
+            while True:
+                try:
+                    result = llm.generate(prompt)
+                    breaker.record_success()
+                    return result
+                except Exception as e:
+                    error = self._failed(name, breaker, e, errors)
+                delay = next(delays, None)
+                if not error.retryable or delay is None or not breaker.allow():
+                    break
+                logging.info(f"Retrying {name} in {delay:.2f}s after: {error}")
+                time.sleep(delay)
+        raise AllProvidersFailedError(errors)
+
+    async def agenerate(self, prompt):
+        import asyncio
+        errors: List[LLMError] = []
+        for name, llm, breaker in self._candidates(errors):
+            delays = self.retry.delays()
+            while True:
+                try:
+                    result = await llm.agenerate(prompt)
+                    breaker.record_success()
+                    return result
+                except Exception as e:
+                    error = self._failed(name, breaker, e, errors)
+                delay = next(delays, None)
+                if not error.retryable or delay is None or not breaker.allow():
+                    break
+                logging.info(f"Retrying {name} in {delay:.2f}s after: {error}")
+                await asyncio.sleep(delay)
+        raise AllProvidersFailedError(errors)
+
+    def stream(self, prompt):
+        # Retries and failover only happen before the first delta; once text has been
+        # yielded, a failure is raised to the caller
+        errors: List[LLMError] = []
+        for name, llm, breaker in self._candidates(errors):
+            delays = self.retry.delays()
+            while True:
+                started = False
+                try:
+                    for delta in llm.stream(prompt):
+                        started = True
+                        yield delta
+                    breaker.record_success()
+                    return
+                except Exception as e:
+                    error = self._failed(name, breaker, e, errors)
+                    if started:
+                        raise error
+                delay = next(delays, None)
+                if not error.retryable or delay is None or not breaker.allow():
+                    break
+                time.sleep(delay)
+        raise AllProvidersFailedError(errors)
+
+    async def astream(self, prompt):
+        import asyncio
+        errors: List[LLMError] = []
+        for name, llm, breaker in self._candidates(errors):
+            delays = self.retry.delays()
+            while True:
+                started = False
+                try:
+                    async for delta in llm.astream(prompt):
+                        started = True
+                        yield delta
+                    breaker.record_success()
+                    return
+                except Exception as e:
+                    error = self._failed(name, breaker, e, errors)
+                    if started:
+                        raise error
+                delay = next(delays, None)
+                if not error.retryable or delay is None or not breaker.allow():
+                    break
+                await asyncio.sleep(delay)
+        raise AllProvidersFailedError(errors)
+
+    def list_models(self):
+        llm = self.llm
+        return cached_list_models(llm.llm if isinstance(llm, RateLimitedLLM) else llm)
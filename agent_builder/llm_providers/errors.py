@@ -0,0 +1,83 @@
+from typing import List, Optional
+
+
+class LLMError(RuntimeError):
+    """
+    Base class for provider failures raised when a provider is created with raise_errors=True.
+    retryable marks transient failures (timeouts, dropped connections, 429s, 5xx responses)
+    that are worth retrying or failing over on.
+    """
+    retryable = False
+
+    def __init__(self, message: str, provider: str = None, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.provider = provider
+        self.status_code = status_code
+
+
+class LLMTimeoutError(LLMError):
+    retryable = True
+
+
+class LLMConnectionError(LLMError):
+    retryable = True
+
+
+class LLMRateLimitError(LLMError):
+    retryable = True
+
+
+class LLMServerError(LLMError):
+    retryable = True
+
+
+class LLMRequestError(LLMError):
+    """The provider rejected the request (bad model name, missing key, 4xx)."""
+
+
+class LLMAbortedError(LLMError):
+    """The user declined the token-count confirmation; never retried or failed over."""
+
+
+class CircuitOpenError(LLMError):
+    """The provider's circuit breaker is open, so the request was not sent."""
+
+
+class AllProvidersFailedError(LLMError):
+    def __init__(self, errors: List[LLMError]):
+        summary = "; ".join(f"{e.provider}: {e}" for e in errors) or "no providers configured"
+        super().__init__(f"All LLM providers failed ({summary})")
+        self.errors = errors
+
+
+def _class_names(e: BaseException) -> List[str]:
+    return [cls.__name__ for cls in type(e).__mro__]
+
+
+def to_llm_error(e: BaseException, provider: str, message: str = None) -> LLMError:
+    """
+    Map an SDK or HTTP client exception (requests, httpx, openai, anthropic) to a typed LLMError.
+    Exceptions are matched by class name and status code so that no SDK has to be imported here.
+    """
+    if isinstance(e, LLMError):
+        return e
+    message = message or f"An error occurred with {provider}: {e}"
+    names = _class_names(e)
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    if not isinstance(status, int):
+        status = None
+    if any("Timeout" in name for name in names) or isinstance(e, TimeoutError):
+        cls = LLMTimeoutError
+    elif status == 429:
+        cls = LLMRateLimitError
+    elif status is not None and status >= 500:
+        cls = LLMServerError
+    elif status is not None:
+        cls = LLMRequestError
+    elif any("Connect" in name for name in names) or isinstance(e, ConnectionError):
+        cls = LLMConnectionError
+    else:
+        cls = LLMError
+    return cls(message, provider=provider, status_code=status)
@@ -0,0 +1,315 @@
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from agent_builder import metrics
+from agent_builder.utils import run_sync
+from .cached_llm import is_error_response
+from .registry import describe_llm
+
+# A stream that ended before its first delta
+_END = object()
+
+
+class HedgedLLM:
+    """
+    Wraps equivalent backends (replicas of one model, or interchangeable providers) to cut tail
+    latency. A request goes to the first backend. If no answer arrives within the hedge delay, the
+    same request also goes to the next backend. The first good answer wins, and the other request
+    is cancelled. A streamed request counts as answered at its first delta.
+
+    The hedge delay is `delay` seconds when given. Otherwise it is the `quantile` of recent
+    successful latencies, clamped to [min_delay, max_delay], or initial_delay until min_samples
+    calls have finished. budget caps the extra load: each request earns `budget` hedge credits
+    (up to `burst`) and each hedge spends one. With budget=0.1, at most about 10% of requests are
+    sent twice. A backend that fails is replaced by the next one right away, without spending
+    budget. stats() reports the hedge rate and how often the hedge won.
+
+    Async losers are cancelled, which closes their connection. A synchronous loser cannot be
+    interrupted: it finishes on the hedging thread pool and its reply is dropped.
+
+        llm = HedgedLLM([OllamaLLM(base_url=url_a), OllamaLLM(base_url=url_b)], budget=0.05)
+    """
+    def __init__(self, llms: Sequence[Any], delay: float = None, quantile: float = 0.95, initial_delay: float = 1.0,
+                 min_delay: float = 0.01, max_delay: float = None, window: int = 200, min_samples: int = 20,
+                 budget: float = 0.1, burst: float = 5.0, max_hedges: int = 1, max_workers: int = 32):
+        if not llms:
+            raise ValueError("HedgedLLM needs at least one backend")
+        self.llms = list(llms)
+        self.delay = delay
+        self.quantile = quantile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.budget = budget
+        self.burst = burst
+        self.max_hedges = max_hedges
+        self.max_workers = max_workers
+        self._latencies = deque(maxlen=window)
+        self._credits = burst
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self._pool = None
+        self._lock = threading.Lock()
+
+    # Read from the first backend on each use, as CachedLLM does: its model can change after
+    # wrapping, and reading it can be lazy
+    @property
+    def provider(self) -> str:
+        return describe_llm(self.llms[0])[0]
+
+    @property
+    def model(self) -> Optional[str]:
+        return describe_llm(self.llms[0])[1]
+
+    def hedge_delay(self) -> float:
+        if self.delay is not None:
+            return self.delay
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            return self.initial_delay
+        value = samples[min(len(samples) - 1, max(0, math.ceil(self.quantile * len(samples)) - 1))]
+        value = max(self.min_delay, value)
+        return value if self.max_delay is None else min(self.max_delay, value)
+
+    def _admit(self) -> None:
+        with self._lock:
+            self.requests += 1
+            self._credits = min(self.burst, self._credits + self.budget)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._credits >= 1:
+                self._credits -= 1
+                self.hedges += 1
+                outcome = "fired"
+            else:
+                self.budget_denied += 1
+                outcome = "denied"
+        metrics.LLM_HEDGES.inc(provider=self.provider, outcome=outcome)
+        return outcome == "fired"
+
+    def _won(self, elapsed: float, hedge: bool) -> None:
+        with self._lock:
+            self._latencies.append(elapsed)
+            if hedge:
+                self.hedge_wins += 1
+        if hedge:
+            metrics.LLM_HEDGES.inc(provider=self.provider, outcome="won")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests, hedges, wins, denied = self.requests, self.hedges, self.hedge_wins, self.budget_denied
+        return {
+            "requests": requests,
+            "hedges": hedges,
+            "hedge_rate": hedges / requests if requests else 0.0,
+            "hedge_wins": wins,
+            "win_rate": wins / hedges if hedges else 0.0,
+            "budget_denied": denied,
+            "delay": self.hedge_delay(),
+        }
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="hedged-llm")
+            return self._pool
+
+    @staticmethod
+    def _failed(value: Any) -> bool:
+        if isinstance(value, tuple):
+            value = value[1]
+        return is_error_response(value)
+
+    def _race(self, call: Callable[[int], Any], abandon: Callable[[Any], None]) -> Any:
+        """Run call(index) on the pool for the first backend, hedging and failing over as needed."""
+        self._admit()
+        pool = self._get_pool()
+        delay = self.hedge_delay()
+        started = time.monotonic()
+        pending: Dict[Any, int] = {}
+        failures: List[Tuple[bool, Any]] = []
+        state = {"next": 0, "hedges": 0, "hedging": len(self.llms) > 1 and self.max_hedges > 0, "hedged": set()}
+
+        def launch() -> None:
+            index = state["next"]
+            state["next"] += 1
+            begun = time.monotonic()
+            context = contextvars.copy_context()
+            pending[pool.submit(context.run, lambda: (call(index), time.monotonic() - begun))] = index
+
+        launch()
+        while pending:
+            timeout = None
+            if state["hedging"] and state["next"] < len(self.llms):
+                timeout = max(0.0, started + delay * (state["hedges"] + 1) - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                if self._spend():
+                    state["hedges"] += 1
+                    state["hedged"].add(state["next"])
+                    launch()
+                    state["hedging"] = state["hedges"] < self.max_hedges
+                else:
+                    state["hedging"] = False
+                continue
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    value, elapsed = future.result()
+                except Exception as e:
+                    failures.append((True, e))
+                else:
+                    if not self._failed(value):
+                        for loser in pending:
+                            loser.cancel()
+                            loser.add_done_callback(lambda f: self._abandon(f, abandon))
+                        self._won(elapsed, index in state["hedged"])
+                        return value
+                    abandon(value)
+                    failures.append((False, value))
+            if not pending and state["next"] < len(self.llms):
+                launch()
+        raised, first = failures[0]
+        if raised:
+            raise first
+        return first
+
+    @staticmethod
+    def _abandon(future: Any, abandon: Callable[[Any], None]) -> None:
+        # A loser that was still running: release what its reply holds (e.g. an open stream)
+        if not future.cancelled() and future.exception() is None:
+            abandon(future.result()[0])
+
+    async def _arace(self, call: Callable[[int], Any], abandon: Callable[[Any], Any]) -> Any:
+        self._admit()
+        delay = self.hedge_delay()
+        started = time.monotonic()
+        pending: Dict[asyncio.Task, int] = {}
+        failures: List[Tuple[bool, Any]] = []
+        state = {"next": 0, "hedges": 0, "hedging": len(self.llms) > 1 and self.max_hedges > 0, "hedged": set()}
+
+        async def timed(index: int) -> Tuple[Any, float]:
+            begun = time.monotonic()
+            return await call(index), time.monotonic() - begun
+
+        def launch() -> None:
+            index = state["next"]
+            state["next"] += 1
+            pending[asyncio.ensure_future(timed(index))] = index
+
+        launch()
+        try:
+            while pending:
+                timeout = None
+                if state["hedging"] and state["next"] < len(self.llms):
+                    timeout = max(0.0, started + delay * (state["hedges"] + 1) - time.monotonic())
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if self._spend():
+                        state["hedges"] += 1
+                        state["hedged"].add(state["next"])
+                        launch()
+                        state["hedging"] = state["hedges"] < self.max_hedges
+                    else:
+                        state["hedging"] = False
+                    continue
+                for task in done:
+                    index = pending.pop(task)
+                    try:
+                        value, elapsed = task.result()
+                    except Exception as e:
+                        failures.append((True, e))
+                    else:
+                        if not self._failed(value):
+                            self._won(elapsed, index in state["hedged"])
+                            return value
+                        await abandon(value)
+                        failures.append((False, value))
+                if not pending and state["next"] < len(self.llms):
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                try:
+                    result = await task
+                except BaseException:
+                    continue
+                await abandon(result[0])
+        raised, first = failures[0]
+        if raised:
+            raise first
+        return first
+
+    def generate(self, prompt):
+        return self._race(lambda index: self.llms[index].generate(prompt), lambda value: None)
+
+    async def agenerate(self, prompt):
+        async def call(index):
+            llm = self.llms[index]
+            if hasattr(llm, "agenerate"):
+                return await llm.agenerate(prompt)
+            return await run_sync(llm.generate, prompt)
+
+        async def abandon(value):
+            pass
+        return await self._arace(call, abandon)
+
+    def _first_delta(self, index: int, prompt: str) -> Tuple[Any, Any]:
+        llm = self.llms[index]
+        if hasattr(llm, "stream"):
+            deltas = iter(llm.stream(prompt))
+        else:
+            value = llm.generate(prompt)
+            deltas = iter([value["content"] if isinstance(value, dict) else str(value)])
+        return deltas, next(deltas, _END)
+
+    def stream(self, prompt):
+        def abandon(value):
+            close = getattr(value[0], "close", None)
+            if close is not None:
+                close()
+        deltas, first = self._race(lambda index: self._first_delta(index, prompt), abandon)
+        if first is _END:
+            return
+        yield first
+        yield from deltas
+
+    async def _afirst_delta(self, index: int, prompt: str) -> Tuple[Any, Any]:
+        llm = self.llms[index]
+        if hasattr(llm, "astream"):
+            deltas = llm.astream(prompt)
+            try:
+                return deltas, await deltas.__anext__()
+            except StopAsyncIteration:
+                return deltas, _END
+        if hasattr(llm, "agenerate"):
+            value = await llm.agenerate(prompt)
+        else:
+            value = await run_sync(llm.generate, prompt)
+        return None, value["content"] if isinstance(value, dict) else str(value)
+
+    async def astream(self, prompt):
+        async def abandon(value):
+            if value[0] is not None:
+                await value[0].aclose()
+        deltas, first = await self._arace(lambda index: self._afirst_delta(index, prompt), abandon)
+        if first is _END:
+            return
+        yield first
+        if deltas is not None:
+            async for delta in deltas:
+                yield delta
+
+    def list_models(self):
+        return self.llms[0].list_models()
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+import requests
+import httpx
+from requests.adapters import HTTPAdapter
+
+
+class HTTPPool:
+    """
+    Keep-alive connection pool shared by the REST-based providers (Ollama, Anaconda).
+    Holds one pooled requests.Session for synchronous calls and one httpx.AsyncClient per
+    event loop for asynchronous calls, so repeated completions reuse open TCP/TLS connections.
+    """
+    def __init__(self, pool_maxsize: int = 10, gzip: bool = True):
+        self.pool_maxsize = pool_maxsize
+        self.gzip = gzip
+        self.headers = {
+            "Connection": "keep-alive",
+            "Accept-Encoding": "gzip, deflate" if gzip else "identity",
+        }
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(self.headers)
+        # httpx clients are bound to the loop that opened their connections
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            limits = httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize)
+            client = httpx.AsyncClient(limits=limits, headers=self.headers)
+            self._async_clients[loop] = client
+        return client
+
+    def close(self) -> None:
+        self.session.close()
+        self._async_clients = weakref.WeakKeyDictionary()
+
+
+class HealthCheck:
+    """
+    Health probe for a REST provider, run on demand instead of in the provider constructor.
+    A successful result is remembered for ttl seconds; check_in_background() runs the probe on
+    a daemon thread so a misconfigured server is reported without delaying startup.
+    """
+    def __init__(self, pool: HTTPPool, url: str, name: str, timeout: float = 60, ttl: float = 30):
+        self.pool = pool
+        self.url = url
+        self.name = name
+        self.timeout = timeout
+        self.ttl = ttl
+        self.healthy = None
+        self.error = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def check(self) -> None:
+        """Probe the server, raising RuntimeError when it is unreachable or unhealthy."""
+        with self._lock:
+            if self.healthy and time.monotonic() - self._checked_at < self.ttl:
+                return
+            try:
+                response = self.pool.session.get(self.url, timeout=self.timeout)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{self.name} health check failed: {response.status_code} {response.text}")
+            except Exception as e:
+                self.healthy, self.error = False, e if isinstance(e, RuntimeError) else RuntimeError(f"{self.name} health check failed: {e}")
+                raise self.error
+            self.healthy, self.error = True, None
+            self._checked_at = time.monotonic()
+
+    def check_in_background(self) -> threading.Thread:
+        def run():
+            try:
+                self.check()
+            except RuntimeError as e:
+                logging.warning(str(e))
+        thread = threading.Thread(target=run, name=f"{self.name}-health-check", daemon=True)
+        thread.start()
+        return thread
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(base_url: str, pool_maxsize: int = 10, gzip: bool = True) -> HTTPPool:
+    """Return the process-wide pool for base_url, creating it on first use."""
+    key = (base_url.rstrip("/"), pool_maxsize, gzip)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = HTTPPool(pool_maxsize=pool_maxsize, gzip=gzip)
+        return pool
@@ -1,47 +1,214 @@
+import json
 import requests
+import httpx
 import os
+from array import array
+from agent_builder import metrics
+from agent_builder.utils import load_env
+from .errors import LLMError, to_llm_error
+from .http_pool import HealthCheck, get_pool
+from .registry import cached_list_models
+from .residency import find_residency, parse_keep_alive
+from .sessions import PromptSessions, SessionPrompt
 
 class OllamaLLM:
-    def __init__(self, model=None, base_url=None, timeout=60):
+    """
+    Ollama /api/generate client. For prompts tagged with a session (see SessionPrompt), the
+    context returned for the session's previous turn is sent back with only the text appended
+    since, so the server does not re-process the conversation so far (reuse_context=False
+    always sends the whole prompt). That context already covers the previous reply, so the
+    reply is not sent again: only text after the previous prompt and reply is. Contexts of the
+    max_sessions most recent sessions are kept.
+
+    keep_alive (default: OLLAMA_KEEP_ALIVE) is sent with every request: how long the server keeps
+    the model loaded afterwards. With a ModelResidency (passed as residency, or the server's from
+    get_residency), pinned models are sent with its keep_alive and requests for a model that is
+    not loaded are warned about or routed to a loaded one.
+    """
+    def __init__(self, model=None, base_url=None, timeout=60, pool_maxsize=10, gzip=True, pool=None, health_check=None, raise_errors=False,
+                 reuse_context=True, max_sessions=256, keep_alive=None, residency=None):
+        load_env()
         self.base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")
         self.timeout = timeout
-        # Health check before proceeding
-        try:
-            health_response = requests.get(self.base_url, timeout=self.timeout)
-            if health_response.status_code != 200:
-                raise RuntimeError(f"Ollama health check failed: {health_response.status_code} {health_response.text}")
-        except Exception as e:
-            raise RuntimeError(f"Ollama health check failed: {e}")
+        self.raise_errors = raise_errors
+        # Keep-alive connection pool shared by every OllamaLLM pointing at this server
+        self.pool = pool or get_pool(self.base_url, pool_maxsize=pool_maxsize, gzip=gzip)
+        self.session = self.pool.session
+        # Construction stays offline: health_check="eager" probes the server now (raising on
+        # failure), "background" probes it on a daemon thread, None leaves it to check_health()
+        self.health = HealthCheck(self.pool, self.base_url, "Ollama", timeout=self.timeout)
+        if health_check == "eager":
+            self.health.check()
+        elif health_check == "background":
+            self.health.check_in_background()
         self.model = model or "llama2"
+        self.reuse_context = reuse_context
+        self.sessions = PromptSessions(max_sessions=max_sessions)
+        self.keep_alive = parse_keep_alive(keep_alive if keep_alive is not None else os.getenv("OLLAMA_KEEP_ALIVE"))
+        self.residency = residency
+
+    def _error(self, message, e=None):
+        # raise_errors=True raises a typed LLMError (what CommandLLM retries and fails over on)
+        # instead of returning the message in place of the model's reply
+        error = e if isinstance(e, LLMError) else to_llm_error(e, "Ollama", message)
+        metrics.LLM_ERRORS.inc(provider="ollama", model=self.model, type=type(error).__name__)
+        if self.raise_errors:
+            if error is e:
+                raise error
+            raise error from e
+        return message
+
+    def check_health(self):
+        self.health.check()
 
     def get_first_model(self):
-        models = self.list_models()
+        models = cached_list_models(self)
         if models:
             return models[0]
         return "llama2"  # fallback
 
-    def generate(self, prompt):
-        url = f"{self.base_url}/api/generate"
+    def _residency(self):
+        return self.residency if self.residency is not None else find_residency(self.base_url)
+
+    def _model(self):
+        residency = self._residency()
+        return residency.resolve(self.model) if residency is not None else self.model
+
+    async def _amodel(self):
+        residency = self._residency()
+        return await residency.aresolve(self.model) if residency is not None else self.model
+
+    def _payload(self, prompt, model, stream=False):
         payload = {
-            "model": self.model,
+            "model": model,
             "prompt": prompt,
-            "stream": False
+            "stream": stream
         }
+        residency = self._residency()
+        pinned = residency.keep_alive_for(model) if residency is not None else None
+        keep_alive = pinned if pinned is not None else self.keep_alive
+        if keep_alive is not None:
+            payload["keep_alive"] = keep_alive
+        # A context only continues the model that produced it
+        if self.reuse_context and model == self.model and getattr(prompt, "session", None) is not None:
+            _, rest, context = self.sessions.split(prompt)
+            if context:
+                payload["prompt"] = rest
+                payload["context"] = context.tolist()
+            metrics.PREFIX_REUSE.inc(provider="ollama", result="continued" if context else "full")
+        return payload
+
+    def _remember(self, prompt, data, model, reply):
+        # The returned context covers the prompt and the reply: the next turn continues after both.
+        # Memory records the reply stripped, which is how the next prompt renders it.
+        if self.reuse_context and model == self.model and data.get("context"):
+            covered = SessionPrompt(f"{prompt}{reply.strip()}", getattr(prompt, "session", None))
+            self.sessions.update(covered, array("i", data["context"]))
+
+    def _record_usage(self, data):
+        metrics.record_usage("ollama", self.model, data.get("prompt_eval_count"), data.get("eval_count"))
+
+    def _done(self, prompt, data, model, reply):
+        self._record_usage(data)
+        self._remember(prompt, data, model, reply)
+        residency = self._residency()
+        if residency is not None:
+            residency.mark_loaded(model)
+
+    def _completion(self, prompt, data, model):
+        self._done(prompt, data, model, data["response"])
+        return data["response"]
+
+    def generate(self, prompt):
+        url = f"{self.base_url}/api/generate"
+        model = self._model()
         try:
-            response = requests.post(url, json=payload, timeout=self.timeout)
+            response = self.session.post(url, json=self._payload(prompt, model), timeout=self.timeout)
             response.raise_for_status()
-            return response.json()["response"]
-        except requests.exceptions.Timeout:
-            return "The request to Ollama timed out. Please try again."
+            return self._completion(prompt, response.json(), model)
+        except requests.exceptions.Timeout as e:
+            return self._error("The request to Ollama timed out. Please try again.", e)
         except requests.exceptions.RequestException as e:
-            return f"An error occurred with Ollama: {e}"
+            return self._error(f"An error occurred with Ollama: {e}", e)
+
+    async def agenerate(self, prompt):
+        url = f"{self.base_url}/api/generate"
+        model = await self._amodel()
+        try:
+            client = self.pool.async_client()
+            response = await client.post(url, json=self._payload(prompt, model), timeout=self.timeout)
+            response.raise_for_status()
+            return self._completion(prompt, response.json(), model)
+        except httpx.TimeoutException as e:
+            return self._error("The request to Ollama timed out. Please try again.", e)
+        except httpx.HTTPError as e:
+            return self._error(f"An error occurred with Ollama: {e}", e)
+
+    def stream(self, prompt):
+        url = f"{self.base_url}/api/generate"
+        model = self._model()
+        deltas = []
+        try:
+            with self.session.post(url, json=self._payload(prompt, model, stream=True), timeout=self.timeout, stream=True) as response:
+                response.raise_for_status()
+                # Ollama streams one JSON object per line
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        deltas.append(data["response"])
+                        yield data["response"]
+                    if data.get("done"):
+                        self._done(prompt, data, model, "".join(deltas))
+                        break
+        except requests.exceptions.Timeout as e:
+            yield self._error("The request to Ollama timed out. Please try again.", e)
+        except requests.exceptions.RequestException as e:
+            yield self._error(f"An error occurred with Ollama: {e}", e)
+
+    async def astream(self, prompt):
+        url = f"{self.base_url}/api/generate"
+        model = await self._amodel()
+        deltas = []
+        try:
+            client = self.pool.async_client()
+            async with client.stream("POST", url, json=self._payload(prompt, model, stream=True), timeout=self.timeout) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("response"):
+                        deltas.append(data["response"])
+                        yield data["response"]
+                    if data.get("done"):
+                        self._done(prompt, data, model, "".join(deltas))
+                        break
+        except httpx.TimeoutException as e:
+            yield self._error("The request to Ollama timed out. Please try again.", e)
+        except httpx.HTTPError as e:
+            yield self._error(f"An error occurred with Ollama: {e}", e)
+
+    def embed(self, texts, model=None):
+        """Embedding vectors for texts from /api/embed. Raises a typed LLMError on failure."""
+        url = f"{self.base_url}/api/embed"
+        model = model or self.model
+        try:
+            response = self.session.post(url, json={"model": model, "input": list(texts)}, timeout=self.timeout)
+            response.raise_for_status()
+            return response.json()["embeddings"]
+        except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+            error = to_llm_error(e, "Ollama", f"Ollama embeddings failed: {e}")
+            metrics.LLM_ERRORS.inc(provider="ollama", model=model, type=type(error).__name__)
+            raise error from e
 
     def list_models(self):
         running_models = set()
         try:
-            # Get running models
-            url = f"{self.base_url}/api/running"
-            response = requests.get(url, timeout=self.timeout)
+            # Get the models loaded in memory
+            url = f"{self.base_url}/api/ps"
+            response = self.session.get(url, timeout=self.timeout)
             if response.status_code == 200:
                 data = response.json()
                 running_models = {model['name'] for model in data.get('models', [])}
@@ -53,7 +220,7 @@ class OllamaLLM:
         try:
             # Get all pulled models
             url = f"{self.base_url}/api/tags"
-            response = requests.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout)
             response.raise_for_status()
             data = response.json()
             all_pulled_models = [model['name'] for model in data.get('models', [])]
@@ -1,25 +1,63 @@
-from openai import OpenAI, APITimeoutError
+from openai import OpenAI, AsyncOpenAI, APITimeoutError
+import asyncio
 import os
-from dotenv import load_dotenv
+import weakref
 from agent_builder.tools.token_counter_tool import TokenCounterTool
 from agent_builder.tools.format_response_tool import FormatResponseTool
-
-load_dotenv()
+from agent_builder import metrics
+from agent_builder.utils import load_env, run_sync
+from .errors import LLMAbortedError, LLMError, to_llm_error
+from .raw_response import RawResponse
+from .registry import cached_list_models
 
 class OpenAILLM:
-    def __init__(self, model=None, api_key=None, base_url=None, timeout=60):
+    def __init__(self, model=None, api_key=None, base_url=None, timeout=60, confirm_tokens=True, raise_errors=False):
+        load_env()
         self.base_url = base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise RuntimeError("OPENAI_API_KEY is not set.")
-        self.client = OpenAI(api_key=self.api_key, timeout=timeout)
-        self.model = model or self.get_first_model()
+        self.client = OpenAI(api_key=self.api_key, base_url=self.base_url, timeout=timeout)
+        # One async client per event loop: its pooled connections belong to the loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
+        # Resolved from the account's model list on first use, so construction stays offline
+        self._model = model
         self.timeout = timeout
-        self.token_counter = TokenCounterTool()
+        self.raise_errors = raise_errors
+        # confirm_tokens=False skips the interactive token-count confirmation (batch jobs, servers)
+        self.confirm_tokens = confirm_tokens
+        self._token_counter = None
         self.formatter = FormatResponseTool()
 
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self.get_first_model()
+        return self._model
+
+    @model.setter
+    def model(self, value):
+        self._model = value
+        self._token_counter = None
+
+    @property
+    def token_counter(self):
+        # Built on first use because the tokenizer depends on the (lazily resolved) model
+        if self._token_counter is None:
+            self._token_counter = TokenCounterTool(provider="openai", model=self.model, interactive=self.confirm_tokens)
+        return self._token_counter
+
+    @property
+    def async_client(self):
+        # Created on first use so purely synchronous callers never pay for it
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout)
+        return client
+
     def get_first_model(self):
-        models = self.list_models()
+        models = cached_list_models(self)
         if models:
             return models[0]
         return "gpt-3.5-turbo"  # fallback
@@ -36,24 +74,96 @@ class OpenAILLM:
             print("Could not list OpenAI models:", e)
         return models
 
+    def _error(self, message, e=None):
+        # raise_errors=True raises a typed LLMError (what CommandLLM retries and fails over on)
+        # instead of returning the message in place of the model's reply
+        error = e if isinstance(e, LLMError) else to_llm_error(e, "OpenAI", message)
+        metrics.LLM_ERRORS.inc(provider="openai", model=self._model, type=type(error).__name__)
+        if self.raise_errors:
+            if error is e:
+                raise error
+            raise error from e
+        return message
+
+    def _aborted(self):
+        return self._error("Aborted by user due to token count.", LLMAbortedError("Aborted by user due to token count.", provider="OpenAI"))
+
+    def _parse_response(self, response):
+        # Read what the planner needs straight off the SDK object; the full dict for formatting
+        # is only built if the raw response is displayed
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            metrics.record_usage("openai", self.model, getattr(usage, "prompt_tokens", None),
+                                 getattr(usage, "completion_tokens", None))
+        choices = getattr(response, "choices", None)
+        message = getattr(choices[0], "message", None) if choices else None
+        if message is not None:
+            content = getattr(message, "content", "")
+        else:
+            content = str(response)
+        return {"content": content, "raw": RawResponse(response)}
+
     def generate(self, prompt):
         if not self.token_counter.run(prompt):
-            return {"content": "Aborted by user due to token count.", "raw": None}
+            return {"content": self._aborted(), "raw": None}
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}]
             )
-            # Convert OpenAI response to dict for formatting
-            response_dict = response.model_dump() if hasattr(response, 'model_dump') else response.__dict__
-            # Extract the main content for the planner
-            choices = response_dict.get("choices")
-            if choices and isinstance(choices, list) and "message" in choices[0]:
-                content = choices[0]["message"].get("content", "")
-            else:
-                content = str(response)
-            return {"content": content, "raw": response_dict}
-        except APITimeoutError:
-            return {"content": "The request to OpenAI timed out. Please try again.", "raw": None}
+            return self._parse_response(response)
+        except APITimeoutError as e:
+            return {"content": self._error("The request to OpenAI timed out. Please try again.", e), "raw": None}
+        except Exception as e:
+            return {"content": self._error(f"An error occurred with OpenAI: {e}", e), "raw": None}
+
+    async def agenerate(self, prompt):
+        # The confirmation prompt blocks on input(), so keep it off the event loop
+        if not await run_sync(self.token_counter.run, prompt):
+            return {"content": self._aborted(), "raw": None}
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}]
+            )
+            return self._parse_response(response)
+        except APITimeoutError as e:
+            return {"content": self._error("The request to OpenAI timed out. Please try again.", e), "raw": None}
+        except Exception as e:
+            return {"content": self._error(f"An error occurred with OpenAI: {e}", e), "raw": None}
+
+    def stream(self, prompt):
+        if not self.token_counter.run(prompt):
+            yield self._aborted()
+            return
+        try:
+            chunks = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True
+            )
+            for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except APITimeoutError as e:
+            yield self._error("The request to OpenAI timed out. Please try again.", e)
+        except Exception as e:
+            yield self._error(f"An error occurred with OpenAI: {e}", e)
+
+    async def astream(self, prompt):
+        if not await run_sync(self.token_counter.run, prompt):
+            yield self._aborted()
+            return
+        try:
+            chunks = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                stream=True
+            )
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except APITimeoutError as e:
+            yield self._error("The request to OpenAI timed out. Please try again.", e)
         except Exception as e:
-            return {"content": f"An error occurred with OpenAI: {e}", "raw": None} 
\ No newline at end of file
+            yield self._error(f"An error occurred with OpenAI: {e}", e)
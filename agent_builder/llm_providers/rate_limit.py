@@ -0,0 +1,258 @@
+"""
+Client-side rate limiting for provider quotas.
+
+A RateLimiter holds a requests-per-minute and a tokens-per-minute token bucket for one provider
+and API key, and admits callers through a priority queue: the highest-priority waiter (lowest
+number) is always served next, so interactive turns overtake queued bulk work. RateLimitedLLM
+puts a shared limiter in front of any LLM and charges each call its prompt token count.
+"""
+import contextvars
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+from agent_builder.utils import run_sync
+
+INTERACTIVE = 0
+BULK = 10
+
+# Priority of LLM calls made from the current thread/task; Agent.act_many runs at BULK
+request_priority: contextvars.ContextVar = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(value: int) -> Iterator[None]:
+    token = request_priority.set(value)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class TokenBucket:
+    """Refills continuously at rate_per_minute up to capacity (one minute's worth by default)."""
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount can be taken (amounts above capacity wait for a full bucket)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate) if self.rate else (0.0 if missing <= 0 else float("inf"))
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "event", "loop")
+
+    def __init__(self, priority: int, seq: int, tokens: int, loop: Any = None):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            import asyncio
+            self.event = asyncio.Event()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self.event.set)
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits with a priority admission queue. Works
+    across threads and event loops: acquire() blocks, aacquire() awaits.
+    """
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self._queue = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.waited = 0.0
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.wait_time(1, now)
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def _try_admit(self, waiter: _Waiter) -> Optional[float]:
+        """Admit waiter if it is first in line and the buckets allow it; else return how long to wait
+        (None: not first in line, wait to be woken)."""
+        with self._lock:
+            if self._queue[0] is not waiter:
+                waiter.event.clear()
+                return None
+            wait = self._wait_time(waiter.tokens, time.monotonic())
+            if wait > 0:
+                waiter.event.clear()
+                return wait
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(waiter.tokens)
+            heapq.heappop(self._queue)
+            self.admitted += 1
+            if self._queue:
+                self._queue[0].wake()
+            return 0.0
+
+    def _enqueue(self, tokens: int, loop: Any = None) -> _Waiter:
+        waiter = _Waiter(request_priority.get(), next(self._seq), tokens, loop)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                if self._queue:
+                    self._queue[0].wake()
+
+    def acquire(self, tokens: int = 0) -> float:
+        """Block until a request costing tokens may be sent; returns the time spent waiting."""
+        if self.requests is None and self.tokens is None:
+            return 0.0
+        start = time.monotonic()
+        waiter = self._enqueue(tokens)
+        try:
+            while True:
+                wait = self._try_admit(waiter)
+                if wait == 0.0:
+                    break
+                waiter.event.wait(wait)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        waited = time.monotonic() - start
+        self.waited += waited
+        return waited
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        import asyncio
+        if self.requests is None and self.tokens is None:
+            return 0.0
+        start = time.monotonic()
+        waiter = self._enqueue(tokens, asyncio.get_running_loop())
+        try:
+            while True:
+                wait = self._try_admit(waiter)
+                if wait == 0.0:
+                    break
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        waited = time.monotonic() - start
+        self.waited += waited
+        return waited
+
+    def queued(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+
+_limiters: Dict[Tuple, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, api_key: str = None, rpm: float = None, tpm: float = None) -> RateLimiter:
+    """Process-wide limiter for a provider and API key; the first caller's limits win."""
+    key_id = hashlib.sha256(api_key.encode()).hexdigest()[:16] if api_key else None
+    key = (provider.lower(), key_id)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(rpm=rpm, tpm=tpm)
+        return limiter
+
+
+def _provider_name(llm: Any) -> str:
+    name = getattr(llm, "provider", None) or type(llm).__name__
+    name = str(name).lower()
+    return name[:-3] if name.endswith("llm") and len(name) > 3 else name
+
+
+class RateLimitedLLM:
+    """
+    Wraps any LLM so every call first passes the shared RateLimiter for its provider and API key.
+    Each call is charged its prompt tokens (counted with the provider's TokenCounterTool) plus
+    completion_tokens, the expected reply size that providers also count against the TPM quota.
+    """
+    def __init__(self, llm: Any, rpm: float = None, tpm: float = None, completion_tokens: int = 0,
+                 limiter: RateLimiter = None):
+        from agent_builder.tools.token_counter_tool import TokenCounterTool
+        self.llm = llm
+        self.provider = _provider_name(llm)
+        self.model = getattr(llm, "model", None)
+        self.base_url = getattr(llm, "base_url", None)
+        self.limiter = limiter or get_rate_limiter(self.provider, getattr(llm, "api_key", None), rpm=rpm, tpm=tpm)
+        self.completion_tokens = completion_tokens
+        counter = getattr(llm, "token_counter", None)
+        if counter is None:
+            counter = TokenCounterTool(provider=self.provider, model=self.model, interactive=False)
+        self.token_counter = counter
+
+    def _cost(self, prompt: str) -> int:
+        if self.limiter.tokens is None:
+            return 0
+        return self.token_counter.tokenizer(prompt) + self.completion_tokens
+
+    def generate(self, prompt):
+        self.limiter.acquire(self._cost(prompt))
+        return self.llm.generate(prompt)
+
+    async def agenerate(self, prompt):
+        await self.limiter.aacquire(self._cost(prompt))
+        if hasattr(self.llm, "agenerate"):
+            return await self.llm.agenerate(prompt)
+        return await run_sync(self.llm.generate, prompt)
+
+    def stream(self, prompt):
+        self.limiter.acquire(self._cost(prompt))
+        if hasattr(self.llm, "stream"):
+            yield from self.llm.stream(prompt)
+        else:
+            value = self.llm.generate(prompt)
+            yield value["content"] if isinstance(value, dict) else str(value)
+
+    async def astream(self, prompt):
+        await self.limiter.aacquire(self._cost(prompt))
+        if hasattr(self.llm, "astream"):
+            async for delta in self.llm.astream(prompt):
+                yield delta
+        else:
+            value = await run_sync(self.llm.generate, prompt)
+            yield value["content"] if isinstance(value, dict) else str(value)
+
+    def list_models(self):
+        return self.llm.list_models()
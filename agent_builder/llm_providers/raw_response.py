@@ -0,0 +1,54 @@
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator
+
+
+def _to_dict(response: Any) -> Dict[str, Any]:
+    if hasattr(response, 'model_dump'):
+        return response.model_dump()
+    if isinstance(response, Mapping):
+        return dict(response)
+    if hasattr(response, '__dict__'):
+        return dict(vars(response))
+    return {"content": str(response)}
+
+
+class RawResponse(Mapping):
+    """
+    Read-only dict view of a provider's raw response object. The conversion (model_dump() for
+    SDK models, a copy of __dict__ otherwise) runs on first access, so a turn whose raw response
+    is never displayed never pays for it. The response cache stores it as a plain JSON object,
+    and it pickles as a plain dict, so neither depends on SDK classes.
+    """
+    __slots__ = ('_source', '_convert', '_data')
+
+    def __init__(self, source: Any, convert: Callable[[Any], Dict[str, Any]] = _to_dict):
+        self._source = source
+        self._convert = convert
+        self._data = None
+
+    @property
+    def materialized(self) -> bool:
+        return self._data is not None
+
+    def materialize(self) -> Dict[str, Any]:
+        if self._data is None:
+            self._data = self._convert(self._source)
+            self._source = None
+        return self._data
+
+    def __getitem__(self, key: str) -> Any:
+        return self.materialize()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.materialize())
+
+    def __len__(self) -> int:
+        return len(self.materialize())
+
+    def __reduce__(self):
+        return (dict, (self.materialize(),))
+
+    def __repr__(self) -> str:
+        if self._data is None:
+            return f"RawResponse(<lazy {type(self._source).__name__}>)"
+        return f"RawResponse({self._data!r})"
@@ -0,0 +1,122 @@
+import importlib
+import inspect
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Provider name -> (module, class). Modules are imported on first use, so an application only
+# pays for the SDKs of the providers it actually uses.
+_PROVIDERS: Dict[str, Union[Tuple[str, str], type]] = {
+    "anaconda": ("agent_builder.llm_providers.anaconda_llm", "AnacondaLLM"),
+    "anthropic": ("agent_builder.llm_providers.anthropic_llm", "AnthropicLLM"),
+    "openai": ("agent_builder.llm_providers.openai_llm", "OpenAILLM"),
+    "ollama": ("agent_builder.llm_providers.ollama_llm", "OllamaLLM"),
+}
+_lock = threading.Lock()
+
+# Shared provider instances, keyed by (provider, base_url, model, options)
+_instances: Dict[Tuple, Any] = {}
+_instances_lock = threading.Lock()
+# Per-key locks held while an instance is being created
+_creating: Dict[Tuple, threading.Lock] = {}
+
+# list_models() results, keyed by provider class, server and credentials
+MODELS_TTL = 300
+_models: Dict[Tuple, Tuple[float, List[str]]] = {}
+_models_lock = threading.Lock()
+
+
+def register_provider(name: str, provider: Union[Tuple[str, str], type]) -> None:
+    """Register a provider class, or a lazily imported ("module.path", "ClassName") pair, under name."""
+    with _lock:
+        _PROVIDERS[name.lower()] = provider
+
+
+def available_providers():
+    return sorted(_PROVIDERS)
+
+
+def get_provider_class(name: str) -> type:
+    key = name.lower()
+    with _lock:
+        entry = _PROVIDERS.get(key)
+    if entry is None:
+        raise ValueError(f"Unknown LLM provider: {name}")
+    if isinstance(entry, tuple):
+        module_name, class_name = entry
+        entry = getattr(importlib.import_module(module_name), class_name)
+        with _lock:
+            _PROVIDERS[key] = entry
+    return entry
+
+
+def create_provider(name: str, **kwargs: Any) -> Any:
+    """Instantiate a provider by name. Options the provider does not take (e.g. confirm_tokens
+    for providers that never count tokens) are dropped."""
+    cls = get_provider_class(name)
+    parameters = inspect.signature(cls).parameters
+    if not any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+        kwargs = {k: v for k, v in kwargs.items() if k in parameters}
+    return cls(**kwargs)
+
+
+def describe_llm(llm: Any) -> Tuple[str, Optional[str]]:
+    """Return (provider, model) for a provider, CommandLLM or LangChainLLMWrapper instance."""
+    provider = getattr(llm, "provider", None) or type(llm).__name__
+    model = getattr(llm, "model", None)
+    inner = getattr(llm, "llm", None)
+    if model is None and inner is not None:
+        model = getattr(inner, "model", None) or getattr(inner, "model_name", None)
+    return str(provider), model
+
+
+def get_llm(name: str, model: str = None, base_url: str = None, **kwargs: Any) -> Any:
+    """
+    Return the process-wide provider instance for (name, base_url, model), creating it on first use.
+    Instances are shared by every planner and session asking for the same key, so do not change
+    their settings (such as .model) in place: build a private one with create_provider for that.
+    Per-conversation state they keep (prefix reuse sessions) is keyed by session.
+    """
+    key = (name.lower(), base_url.rstrip("/") if base_url else None, model, tuple(sorted(kwargs.items())))
+    with _instances_lock:
+        llm = _instances.get(key)
+        if llm is not None:
+            return llm
+        key_lock = _creating.setdefault(key, threading.Lock())
+    # Constructors may do network I/O (e.g. looking up a default model): only callers of the
+    # same key wait for it, never the whole registry
+    with key_lock:
+        with _instances_lock:
+            llm = _instances.get(key)
+        if llm is None:
+            created = create_provider(name, model=model, base_url=base_url, **kwargs)
+            with _instances_lock:
+                llm = _instances.setdefault(key, created)
+        with _instances_lock:
+            _creating.pop(key, None)
+        return llm
+
+
+def clear_llms() -> None:
+    """Drop the shared provider instances and cached model lists."""
+    with _instances_lock:
+        _instances.clear()
+    with _models_lock:
+        _models.clear()
+
+
+def cached_list_models(llm: Any, ttl: float = None, refresh: bool = False) -> List[str]:
+    """llm.list_models(), remembered for ttl seconds per provider, server and API key.
+    Empty results (unreachable server, missing key) are not cached."""
+    ttl = MODELS_TTL if ttl is None else ttl
+    key = (type(llm).__name__, getattr(llm, "base_url", None), getattr(llm, "api_key", None))
+    now = time.monotonic()
+    with _models_lock:
+        cached = _models.get(key)
+    if cached is not None and not refresh and now - cached[0] < ttl:
+        return list(cached[1])
+    models = llm.list_models()
+    if models:
+        with _models_lock:
+            _models[key] = (now, list(models))
+    return models
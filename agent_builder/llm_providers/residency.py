@@ -0,0 +1,254 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+import requests
+from agent_builder import metrics
+from agent_builder.utils import load_env, run_sync
+from .http_pool import HTTPPool, get_pool
+
+
+def model_key(name: str) -> str:
+    """Ollama reports loaded models with their tag: 'llama2' is listed as 'llama2:latest'."""
+    return name if ":" in name.rsplit("/", 1)[-1] else f"{name}:latest"
+
+
+def parse_keep_alive(value: Any) -> Any:
+    """keep_alive as Ollama expects it: a duration string ('30m') or a number of seconds (-1: forever)."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lstrip("-").isdigit():
+            return int(value)
+        return value or None
+    return value
+
+
+class ModelResidency:
+    """
+    Keeps an Ollama server's hot models loaded, so that loading a model (often several seconds)
+    stays out of request latency.
+
+    Hot models (`models`, or added later with pin()) are requested with `keep_alive`, -1 by
+    default: the server keeps them loaded instead of unloading them after five idle minutes.
+    preload() loads models ahead of their first request with an empty generate request;
+    preload_in_background() does so on a daemon thread, e.g. at startup. Load state comes from
+    the server's /api/ps, refreshed at most every `ttl` seconds, and from completed requests.
+
+    OllamaLLM calls resolve(model) before each request. A request for a model that is not loaded
+    is logged (on_cold="warn"), or with on_cold="route" sent to the first loaded model in
+    `fallbacks` while the requested model loads in the background.
+
+        residency = get_residency(models=["llama3:8b"], fallbacks=["llama3:8b"], on_cold="route")
+        residency.preload_in_background()
+    """
+    def __init__(self, base_url: str = None, models: Iterable[str] = (), keep_alive: Any = -1,
+                 fallbacks: Iterable[str] = (), on_cold: str = "warn", ttl: float = 10.0, timeout: float = 300,
+                 pool: HTTPPool = None):
+        if on_cold not in ("warn", "route"):
+            raise ValueError(f"on_cold must be 'warn' or 'route', not {on_cold!r}")
+        load_env()
+        self.base_url = (base_url or os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")).rstrip("/")
+        self.pool = pool or get_pool(self.base_url)
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self.fallbacks = list(fallbacks)
+        self.on_cold = on_cold
+        self.ttl = ttl
+        # Loading a large model can take minutes
+        self.timeout = timeout
+        self._hot: Dict[str, str] = {}
+        # model key -> monotonic time the model was last known to be loaded
+        self._seen: Dict[str, float] = {}
+        self._loading: Dict[str, threading.Event] = {}
+        self._warned = set()
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        for model in models:
+            self.pin(model)
+
+    def pin(self, model: str) -> None:
+        """Make model hot: preload() loads it and every request for it carries keep_alive."""
+        with self._lock:
+            self._hot[model_key(model)] = model
+
+    def unpin(self, model: str) -> None:
+        """Stop pinning model. Its next request sets the server's default keep_alive."""
+        with self._lock:
+            self._hot.pop(model_key(model), None)
+
+    def hot(self) -> List[str]:
+        with self._lock:
+            return list(self._hot.values())
+
+    def keep_alive_for(self, model: str) -> Any:
+        """keep_alive for a request to model, or None to leave it to the server."""
+        with self._lock:
+            return self.keep_alive if model_key(model) in self._hot else None
+
+    def refresh(self) -> Optional[List[str]]:
+        """Read the loaded models from /api/ps; None (and the previous state kept) on failure."""
+        with self._refresh_lock:
+            try:
+                response = self.pool.session.get(f"{self.base_url}/api/ps", timeout=min(self.timeout, 10))
+                response.raise_for_status()
+                loaded = [model_key(entry["name"]) for entry in response.json().get("models", [])]
+            except (requests.exceptions.RequestException, KeyError, TypeError, ValueError) as e:
+                logging.debug(f"Could not read loaded models from Ollama: {e}")
+                loaded = None
+            now = time.monotonic()
+            with self._lock:
+                self._refreshed_at = now
+                if loaded is not None:
+                    self._seen = {key: now for key in loaded}
+            return loaded
+
+    def _fresh(self, key: str) -> bool:
+        with self._lock:
+            seen = self._seen.get(key)
+            return seen is not None and time.monotonic() - seen < self.ttl
+
+    def _stale(self) -> bool:
+        with self._lock:
+            return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.ttl
+
+    def is_loaded(self, model: str) -> bool:
+        key = model_key(model)
+        if self._fresh(key):
+            return True
+        if self._stale():
+            self.refresh()
+        return self._fresh(key)
+
+    def loaded(self) -> List[str]:
+        if self._stale():
+            self.refresh()
+        with self._lock:
+            now = time.monotonic()
+            return [key for key, seen in self._seen.items() if now - seen < self.ttl]
+
+    def mark_loaded(self, model: str) -> None:
+        """Record that the server has just answered a request for model."""
+        key = model_key(model)
+        with self._lock:
+            self._seen[key] = time.monotonic()
+            self._warned.discard(key)
+
+    def _load(self, model: str) -> bool:
+        key = model_key(model)
+        with self._lock:
+            event = self._loading.get(key)
+            leader = event is None
+            if leader:
+                event = self._loading[key] = threading.Event()
+        if not leader:
+            # Another caller is loading it: one load per model
+            event.wait()
+            return self._fresh(key)
+        try:
+            payload = {"model": model}
+            keep_alive = self.keep_alive_for(model)
+            if keep_alive is not None:
+                payload["keep_alive"] = keep_alive
+            # A generate request without a prompt only loads the model
+            response = self.pool.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Could not preload Ollama model {model}: {e}")
+            metrics.MODEL_PRELOADS.inc(model=model, result="failed")
+            return False
+        else:
+            self.mark_loaded(model)
+            metrics.MODEL_PRELOADS.inc(model=model, result="loaded")
+            return True
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+            event.set()
+
+    def preload(self, models: Iterable[str] = None) -> Dict[str, bool]:
+        """Load models (the hot models by default) and wait for them. Returns {model: loaded}."""
+        models = self.hot() if models is None else list(models)
+        return {model: self.is_loaded(model) or self._load(model) for model in models}
+
+    def preload_in_background(self, models: Iterable[str] = None) -> threading.Thread:
+        models = self.hot() if models is None else list(models)
+        thread = threading.Thread(target=self.preload, args=(models,), name="ollama-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def release(self, model: str) -> None:
+        """Unpin model and ask the server to unload it now, freeing its memory for other models."""
+        self.unpin(model)
+        key = model_key(model)
+        try:
+            response = self.pool.session.post(f"{self.base_url}/api/generate", json={"model": model, "keep_alive": 0},
+                                              timeout=min(self.timeout, 10))
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"Could not unload Ollama model {model}: {e}")
+            return
+        with self._lock:
+            self._seen.pop(key, None)
+
+    def resolve(self, model: str) -> str:
+        """The model a request for model should go to (see on_cold)."""
+        if self.is_loaded(model):
+            return model
+        key = model_key(model)
+        if self.on_cold == "route":
+            for fallback in self.fallbacks:
+                if model_key(fallback) != key and self.is_loaded(fallback):
+                    with self._lock:
+                        loading = key in self._loading
+                    if not loading:
+                        self.preload_in_background([model])
+                    metrics.COLD_REQUESTS.inc(model=model, action="routed")
+                    return fallback
+        metrics.COLD_REQUESTS.inc(model=model, action="sent")
+        with self._lock:
+            warn = key not in self._warned
+            self._warned.add(key)
+        if warn:
+            logging.warning(f"Ollama model {model} is not loaded on {self.base_url}: this request waits for it to "
+                            f"load. Preload or pin it with ModelResidency to keep loading out of request latency.")
+        return model
+
+    async def aresolve(self, model: str) -> str:
+        if self._fresh(model_key(model)):
+            return model
+        # Refreshing load state is a blocking HTTP call
+        return await run_sync(self.resolve, model)
+
+
+_managers: Dict[str, ModelResidency] = {}
+_managers_lock = threading.Lock()
+
+
+def _server(base_url: str = None) -> str:
+    load_env()
+    return (base_url or os.getenv("OLLAMA_BASE_URL", "http://127.0.0.1:11434")).rstrip("/")
+
+
+def get_residency(base_url: str = None, **kwargs) -> ModelResidency:
+    """
+    Process-wide residency manager for an Ollama server, created on first use. Every OllamaLLM
+    pointing at the server (without a residency of its own) consults it.
+    """
+    key = _server(base_url)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ModelResidency(base_url=key, **kwargs)
+        return manager
+
+
+def find_residency(base_url: str = None) -> Optional[ModelResidency]:
+    """The manager created by get_residency for the server, if any."""
+    with _managers_lock:
+        return _managers.get(_server(base_url)) if _managers else None
+
+
+def reset_residency() -> None:
+    with _managers_lock:
+        _managers.clear()
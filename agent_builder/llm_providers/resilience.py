@@ -0,0 +1,88 @@
+import random
+import threading
+import time
+from typing import Dict, Iterator, Tuple
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the delay before retry n is drawn uniformly from
+    [0, min(max_delay, base_delay * 2**n)], so clients retrying together spread out.
+    max_attempts counts the first try.
+    """
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 5.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delays(self) -> Iterator[float]:
+        for attempt in range(self.max_attempts - 1):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Per-backend circuit breaker. After failure_threshold consecutive transient failures the
+    circuit opens and requests are refused for reset_timeout seconds; then a single trial
+    request is let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        """End a half-open trial that neither succeeded nor failed transiently."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+_breakers: Dict[Tuple, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(provider: str, base_url: str = None, **kwargs) -> CircuitBreaker:
+    """Process-wide breaker for a backend, shared by every CommandLLM routing to it."""
+    key = (provider.lower(), base_url.rstrip("/") if base_url else None)
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(**kwargs)
+        return breaker
+
+
+def reset_circuit_breakers() -> None:
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,94 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+
+class SessionPrompt(str):
+    """
+    A rendered prompt tagged with the conversation it belongs to. Planner tags prompts with the
+    memory's session_key; everywhere else it is a plain str. Providers that can reuse what the
+    server already processed for a conversation read .session.
+    """
+    def __new__(cls, text: str, session: Optional[str] = None):
+        prompt = super().__new__(cls, text)
+        prompt.session = session
+        return prompt
+
+
+def prompt_session(prompt: Any) -> Optional[str]:
+    return getattr(prompt, 'session', None)
+
+
+class PromptSessions:
+    """
+    The last prompt each session sent to a provider, with the provider state that goes with it
+    (Ollama's context tokens, the content blocks sent to Anthropic). Conversation prompts grow by
+    appending: the next prompt is the previous one plus the latest turn and the new input. split()
+    detects that, so a provider only sends, or only has the server process, the new part. Least
+    recently used sessions are forgotten beyond max_sessions.
+    """
+    def __init__(self, max_sessions: int = 1024):
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def split(self, prompt: str) -> Tuple[str, str, Any]:
+        """
+        (previous, rest, state): when prompt extends its session's previous prompt, that prompt,
+        the appended text and the state stored with it; otherwise ('', prompt, None).
+        """
+        session = prompt_session(prompt)
+        if session is not None:
+            with self._lock:
+                entry = self._entries.get(session)
+                if entry is not None:
+                    self._entries.move_to_end(session)
+            if entry is not None:
+                previous, state = entry
+                # Leading whitespace differs between a first turn (empty memory) and later ones
+                text = prompt.lstrip()
+                if len(text) > len(previous) and text.startswith(previous):
+                    return previous, text[len(previous):], state
+        return '', str(prompt), None
+
+    def update(self, prompt: str, state: Any) -> None:
+        session = prompt_session(prompt)
+        if session is None:
+            return
+        with self._lock:
+            self._entries[session] = (prompt.lstrip(), state)
+            self._entries.move_to_end(session)
+            while len(self._entries) > self.max_sessions:
+                self._entries.popitem(last=False)
+
+    def forget(self, session: str) -> None:
+        with self._lock:
+            self._entries.pop(session, None)
+
+
+class SlotTable:
+    """
+    Pins sessions to a server's numbered slots (llama.cpp keeps one prompt's KV cache per slot).
+    A session keeps its slot while it stays active; a new session takes a free slot, or the slot
+    of the least recently used session.
+    """
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._assigned: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def slot(self, session: Optional[str]) -> Optional[int]:
+        if session is None or self.slots <= 0:
+            return None
+        with self._lock:
+            slot = self._assigned.get(session)
+            if slot is not None:
+                self._assigned.move_to_end(session)
+                return slot
+            if len(self._assigned) < self.slots:
+                used = set(self._assigned.values())
+                slot = next(i for i in range(self.slots) if i not in used)
+            else:
+                _, slot = self._assigned.popitem(last=False)
+            self._assigned[session] = slot
+            return slot
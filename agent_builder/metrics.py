@@ -0,0 +1,275 @@
+"""
+Built-in latency and token metrics with a Prometheus text-format exporter.
+
+Agent stages (plan, execute, memory, format), LLM calls per provider/model, token usage, errors
+cache lookups and router hits are recorded into the process-wide REGISTRY. An observation is a perf_counter
+pair plus one short lock, so metrics are on by default; set_enabled(False) turns recording off.
+
+Export with start_http_server(port) (serves /metrics) or write_metrics(path) /
+start_file_exporter(path, interval) for the node-exporter textfile collector.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = True
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not _enabled:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not _enabled:
+            return
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series[2] if series else 0
+
+    def total(self, **labels: str) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return series[1] if series else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        """The registry in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Reset every series (the metrics stay registered)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "agent_stage_seconds", "Time spent in each stage of an agent turn", ("stage",))
+LLM_REQUEST_SECONDS = REGISTRY.histogram(
+    "agent_llm_request_seconds", "LLM call latency as seen by the planner", ("provider", "model"))
+LLM_TOKENS = REGISTRY.counter(
+    "agent_llm_tokens_total", "Tokens reported by providers (direction=in: prompt, out: completion)",
+    ("provider", "model", "direction"))
+LLM_TIER_SECONDS = REGISTRY.histogram(
+    "agent_llm_tier_seconds",
+    "RoutingPlanner LLM call latency per model tier (outcome=error: failed, or fell back to a larger tier)",
+    ("tier", "outcome"))
+LLM_ERRORS = REGISTRY.counter(
+    "agent_llm_errors_total", "Failed LLM calls by error type", ("provider", "model", "type"))
+CACHE_LOOKUPS = REGISTRY.counter(
+    "agent_cache_lookups_total", "Response cache lookups", ("result",))
+ROUTED_INPUTS = REGISTRY.counter(
+    "agent_routed_inputs_total", "Inputs dispatched to a tool by the planner's router without an LLM call",
+    ("tool",))
+PREFIX_REUSE = REGISTRY.counter(
+    "agent_llm_prefix_reuse_total",
+    "Session prompts sent as a continuation of the previous turn (result=continued) or in full (result=full)",
+    ("provider", "result"))
+LLM_HEDGES = REGISTRY.counter(
+    "agent_llm_hedges_total",
+    "HedgedLLM duplicate requests: fired, won (answered first) or denied (hedge budget exhausted)",
+    ("provider", "outcome"))
+LLM_COALESCED = REGISTRY.counter(
+    "agent_llm_coalesced_total", "Calls answered by an identical call already in flight (no upstream request)",
+    ("provider",))
+MODEL_PRELOADS = REGISTRY.counter(
+    "agent_llm_model_preloads_total", "Ollama models loaded ahead of use by ModelResidency (result=loaded or failed)",
+    ("model", "result"))
+COLD_REQUESTS = REGISTRY.counter(
+    "agent_llm_cold_requests_total",
+    "Requests for a model the server had not loaded: sent anyway, waiting for the load (action=sent), "
+    "or routed to a loaded fallback (action=routed)",
+    ("model", "action"))
+HTTP_REQUESTS = REGISTRY.counter(
+    "agent_http_requests_total", "Requests answered by the HTTP server", ("route", "status"))
+
+
+def record_usage(provider: str, model: str, tokens_in: int = None, tokens_out: int = None) -> None:
+    """Count the prompt/completion tokens a provider reported for one call."""
+    if tokens_in:
+        LLM_TOKENS.inc(tokens_in, provider=provider, model=model, direction="in")
+    if tokens_out:
+        LLM_TOKENS.inc(tokens_out, provider=provider, model=model, direction="out")
+
+
+def write_metrics(path: str, registry: MetricsRegistry = REGISTRY) -> None:
+    """Write the registry to path atomically (suitable for a textfile collector)."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+def start_file_exporter(path: str, interval: float = 15.0, registry: MetricsRegistry = REGISTRY) -> threading.Event:
+    """Rewrite path every interval seconds on a daemon thread; set the returned event to stop."""
+    stop = threading.Event()
+
+    def run():
+        while True:
+            write_metrics(path, registry)
+            if stop.wait(interval):
+                return
+    threading.Thread(target=run, name="metrics-file-exporter", daemon=True).start()
+    return stop
+
+
+def start_http_server(port: int = 9464, addr: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY):
+    """Serve the registry at http://addr:port/metrics on a daemon thread; returns the server."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
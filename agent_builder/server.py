@@ -0,0 +1,359 @@
+"""
+HTTP serving entry point: run agents as a multi-session service instead of a REPL.
+
+    agent-builder-serve --provider ollama,openai --port 8080 --workers 16 --max-queue 64 \
+        --memory sqlite:agent_memory.db
+
+Endpoints:
+  POST   /v1/chat              {"message": "...", "session_id": "...", "stream": false}
+                               -> {"session_id": "...", "reply": ...}. With "stream": true the reply
+                               is sent as server-sent events, data: {"delta": "..."} per delta and
+                               data: [DONE] at the end. A missing session_id starts a new session.
+  DELETE /v1/sessions/<id>     forget a session
+  GET    /health               {"status": "ok", "active": n, "queued": n, "sessions": n}
+  GET    /metrics              agent_builder.metrics in the Prometheus text format
+
+Built on asyncio streams (stdlib only). Every session has its own Agent and Memory, and its turns
+run one at a time. At most `workers` turns run at once and at most `max_queue` more may wait;
+further requests get 429 with a Retry-After header until the backlog drains.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from agent_builder import metrics
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import CONVERSATION_TEMPLATE, Planner
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 411: "Length Required",
+            413: "Payload Too Large", 429: "Too Many Requests", 500: "Internal Server Error",
+            504: "Gateway Timeout"}
+
+class _Session:
+    __slots__ = ('agent', 'lock')
+
+    def __init__(self, agent: Agent):
+        self.agent = agent
+        self.lock = asyncio.Lock()
+
+class _HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Dict[str, str] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class AgentServer:
+    """
+    Serves Agent turns over HTTP. planner and executor are shared by all sessions;
+    memory_factory(session_id) creates each session's memory (default: an in-process Memory).
+    Up to max_sessions sessions are kept, evicting the least recently used idle one; use a durable
+    memory such as SQLiteMemory so an evicted session can be picked up again.
+    """
+    def __init__(self, planner: Planner, executor: Executor = None,
+                 memory_factory: Callable[[str], Any] = None, host: str = "127.0.0.1", port: int = 8080,
+                 workers: int = 8, max_queue: int = 64, max_sessions: int = 10000,
+                 turn_timeout: Optional[float] = 120.0, max_body: int = 1024 * 1024):
+        self.planner = planner
+        # An executor the server creates is closed with it; a caller's executor is left to the caller
+        self._owns_executor = executor is None
+        self.executor = executor or Executor()
+        self.memory_factory = memory_factory or (lambda session_id: Memory())
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.max_sessions = max(1, max_sessions)
+        self.turn_timeout = turn_timeout
+        self.max_body = max_body
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._active = 0
+        self._queued = 0
+        self._slots = None
+        self._server = None
+        self._loop = None
+
+    # Sessions and admission
+
+    def _session(self, session_id: str) -> _Session:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            return session
+        session = self._sessions[session_id] = _Session(Agent(self.memory_factory(session_id), self.planner, self.executor))
+        for _ in range(len(self._sessions) - self.max_sessions):
+            oldest_id, oldest = self._sessions.popitem(last=False)
+            if oldest.lock.locked():
+                # Busy: keep it (as most recent) and try the next one
+                self._sessions[oldest_id] = oldest
+        return session
+
+    def _admit(self) -> None:
+        # Checked before _session: a rejected request must not create or evict a session
+        if self._active + self._queued >= self.workers + self.max_queue:
+            raise _HTTPError(429, "Server is at capacity, retry later", {"Retry-After": "1"})
+
+    async def _acquire(self, session: _Session) -> None:
+        self._queued += 1
+        try:
+            await session.lock.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                session.lock.release()
+                raise
+        finally:
+            self._queued -= 1
+        self._active += 1
+
+    def _release(self, session: _Session) -> None:
+        self._active -= 1
+        self._slots.release()
+        session.lock.release()
+
+    # HTTP
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                try:
+                    body = await self._read_body(reader, writer, headers)
+                    await self._dispatch(method, target.split('?', 1)[0], body, writer, keep_alive)
+                except _HTTPError as e:
+                    await self._send_json(writer, e.status, {"error": str(e)}, keep_alive, e.headers, route=target)
+                    if e.status in (411, 413):
+                        break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutting down
+            pass
+        except Exception:
+            logging.exception("Error handling HTTP connection")
+        finally:
+            writer.close()
+
+    async def _read_body(self, reader, writer, headers) -> bytes:
+        if 'transfer-encoding' in headers:
+            raise _HTTPError(411, "Chunked request bodies are not supported; send Content-Length")
+        length = int(headers.get('content-length') or 0)
+        if length > self.max_body:
+            raise _HTTPError(413, f"Request body exceeds {self.max_body} bytes")
+        if not length:
+            return b''
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        return await reader.readexactly(length)
+
+    async def _send_json(self, writer, status: int, obj: Any, keep_alive: bool, headers: Dict[str, str] = None,
+                         route: str = None, content_type: str = "application/json") -> None:
+        body = obj if isinstance(obj, bytes) else json.dumps(obj, default=str).encode()
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+        await writer.drain()
+        if route is not None:
+            metrics.HTTP_REQUESTS.inc(route=route, status=str(status))
+
+    async def _dispatch(self, method: str, path: str, body: bytes, writer, keep_alive: bool) -> None:
+        if path == '/v1/chat':
+            if method != 'POST':
+                raise _HTTPError(405, "Use POST")
+            await self._chat(body, writer, keep_alive)
+        elif path.startswith('/v1/sessions/'):
+            if method != 'DELETE':
+                raise _HTTPError(405, "Use DELETE")
+            session_id = path[len('/v1/sessions/'):]
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                session.agent.memory.reset()
+            await self._send_json(writer, 200, {"session_id": session_id, "deleted": session is not None},
+                                  keep_alive, route='/v1/sessions')
+        elif path == '/health':
+            await self._send_json(writer, 200, {"status": "ok", "active": self._active, "queued": self._queued,
+                                                "sessions": len(self._sessions)}, keep_alive, route=path)
+        elif path == '/metrics':
+            await self._send_json(writer, 200, metrics.REGISTRY.render().encode(), keep_alive, route=path,
+                                  content_type="text/plain; version=0.0.4; charset=utf-8")
+        else:
+            raise _HTTPError(404, f"No route for {path}")
+
+    async def _chat(self, body: bytes, writer, keep_alive: bool) -> None:
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise _HTTPError(400, "Body must be JSON")
+        message = payload.get('message') if isinstance(payload, dict) else None
+        if not isinstance(message, str) or not message:
+            raise _HTTPError(400, "'message' must be a non-empty string")
+        session_id = str(payload.get('session_id') or uuid.uuid4().hex)
+        self._admit()
+        session = self._session(session_id)
+        await self._acquire(session)
+        turn = None
+        try:
+            if payload.get('stream'):
+                await self._stream(session, session_id, message, writer, keep_alive)
+                return
+            turn = asyncio.ensure_future(session.agent.aact(message, format_response=False))
+            try:
+                # Shielded: cancelling would not stop a sync LLM running in a worker thread
+                reply = await asyncio.wait_for(asyncio.shield(turn), self.turn_timeout)
+            except asyncio.TimeoutError:
+                raise _HTTPError(504, f"Turn did not finish within {self.turn_timeout}s")
+            await self._send_json(writer, 200, {"session_id": session_id, "reply": reply}, keep_alive,
+                                  route='/v1/chat')
+        finally:
+            if turn is None or turn.done():
+                self._release(session)
+            else:
+                # Timed out or the client left: the turn still holds its session (the next turn on
+                # it waits) and its worker slot until it has finished writing the session's memory
+                turn.add_done_callback(lambda done: self._finish_abandoned(session, done))
+
+    def _finish_abandoned(self, session: _Session, turn: asyncio.Future) -> None:
+        self._release(session)
+        if not turn.cancelled() and turn.exception() is not None:
+            logging.error(f"Abandoned turn failed: {turn.exception()!r}")
+
+    async def _stream(self, session: _Session, session_id: str, message: str, writer, keep_alive: bool) -> None:
+        head = ["HTTP/1.1 200 OK", "Content-Type: text/event-stream", "Cache-Control: no-cache",
+                "Transfer-Encoding: chunked", f"X-Session-Id: {session_id}",
+                f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+        metrics.HTTP_REQUESTS.inc(route='/v1/chat', status='200')
+
+        async def chunk(data: bytes) -> None:
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            # Waits while the client is slow to read, which pauses generation
+            await writer.drain()
+
+        deltas = session.agent.aact_stream(message)
+        try:
+            async for delta in deltas:
+                await chunk(f"data: {json.dumps({'delta': delta}, default=str)}\n\n".encode())
+        finally:
+            await deltas.aclose()
+        await chunk(b"data: [DONE]\n\n")
+        await chunk(b"")
+
+    # Lifecycle
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logging.info(f"Agent server listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> threading.Thread:
+        """Serve on a daemon thread with its own event loop (returns once listening); see shutdown()."""
+        ready = threading.Event()
+        failure = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start())
+            except BaseException as e:
+                failure.append(e)
+                ready.set()
+                return
+            ready.set()
+            loop.run_forever()
+            self._server.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.close()
+            if self._owns_executor:
+                self.executor.close()
+
+        thread = threading.Thread(target=run, name="agent-server", daemon=True)
+        thread.start()
+        ready.wait()
+        if failure:
+            raise failure[0]
+        return thread
+
+    def shutdown(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+
+def _memory_factory(spec: str, max_turns: int) -> Callable[[str], Any]:
+    if spec == "memory":
+        return lambda session_id: Memory(max_turns=max_turns)
+    if spec.startswith("sqlite:"):
+        from agent_builder.components.sqlite_memory import SQLiteMemory, get_memory_store
+        store = get_memory_store(spec[len("sqlite:"):])
+        return lambda session_id: SQLiteMemory(session_id=session_id, max_turns=max_turns, store=store)
+    raise ValueError(f"Unknown memory backend {spec!r}; expected 'memory' or 'sqlite:PATH'")
+
+def main(argv=None) -> int:
+    from agent_builder.llm_providers.command_llm import CommandLLM
+    from agent_builder.tools.token_counter_tool import set_confirmations
+    parser = argparse.ArgumentParser(prog="agent-builder-serve", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--provider", help="Provider, or comma-separated failover list (default: LLM_PROVIDER)")
+    parser.add_argument("--model", help="Model for the first provider")
+    parser.add_argument("--workers", type=int, default=8, help="Agent turns running at once")
+    parser.add_argument("--max-queue", type=int, default=64, help="Turns allowed to wait; beyond that 429")
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    parser.add_argument("--memory", default="memory", help="'memory' (in process) or 'sqlite:PATH'")
+    parser.add_argument("--max-turns", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds per non-streaming turn")
+    parser.add_argument("--prompt-template", default=CONVERSATION_TEMPLATE)
+    parser.add_argument("--preload", action="append", default=[], metavar="MODEL",
+                        help="Ollama model to load at startup and keep loaded (repeatable)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    # Nobody is at a terminal to confirm token counts
+    set_confirmations(False)
+    providers = [p.strip() for p in args.provider.split(",") if p.strip()] if args.provider else None
+    if args.preload:
+        from agent_builder.llm_providers.residency import get_residency
+        # Loads while the server starts accepting requests; pinned models stay loaded
+        get_residency(models=args.preload).preload_in_background()
+    llm = CommandLLM(model=args.model, providers=providers, confirm_tokens=False)
+    server = AgentServer(Planner(llm, prompt_template=args.prompt_template),
+                         memory_factory=_memory_factory(args.memory, args.max_turns), host=args.host,
+                         port=args.port, workers=args.workers, max_queue=args.max_queue,
+                         max_sessions=args.max_sessions, turn_timeout=args.timeout)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
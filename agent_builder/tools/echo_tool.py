@@ -4,6 +4,9 @@ class EchoTool:
     """
     A simple tool that echoes the input text.
     Implements the unified tool interface: run(input_text: str, context: Any = None) -> str
+    Besides 'echo: text', the router sends echo "text" here without an LLM call.
     """
+    route_patterns = (r'echo\s+"(?P<input>[^"]*)"', r"echo\s+'(?P<input>[^']*)'")
+
     def run(self, input_text: str, context: Any = None) -> str:
         return f"Echo: {input_text}" 
\ No newline at end of file
@@ -1,11 +1,35 @@
 import json
+from collections.abc import Mapping
 from typing import Any
 
+_orjson = None
+
+def _dumps(value: Any) -> str:
+    """json.dumps(value, indent=2, default=str), through orjson when it is installed."""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+            _orjson = orjson
+        except ImportError:
+            _orjson = False
+    if _orjson:
+        try:
+            return _orjson.dumps(value, default=str, option=_orjson.OPT_INDENT_2 | _orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # e.g. integers beyond 64 bits
+            pass
+    return json.dumps(value, indent=2, default=str)
+
 class FormatResponseTool:
     """
     Tool to format LLM responses. Implements the unified tool interface: run(input_text: Any, context: Any = None) -> str.
     Can trim whitespace, add prefixes, or apply markdown formatting. If the response is a dict (parsed JSON), show all relevant fields, including tools, choices, and usage. If the response is an object, show all its attributes.
+    Mappings such as a provider's lazy RawResponse are converted only here. Each field is
+    serialized once, with orjson when installed (pip install agent_builder[fast-json]).
     """
+    FIELDS = ["id", "model", "usage", "content", "additional_kwargs", "response_metadata", "type"]
+
     def run(self, input_text: Any, context: Any = None) -> str:
         response = input_text
         # If response is a string, format as before
@@ -13,38 +37,74 @@ class FormatResponseTool:
             formatted = response.strip()
             return f"Formatted Response:\n```\n{formatted}\n```"
         # If response is a dict (parsed JSON), pretty-print relevant fields
-        if isinstance(response, dict):
+        if isinstance(response, Mapping):
+            if not isinstance(response, dict):
+                response = dict(response)
             output = ["Formatted Response (Full Details):"]
-            found = False
-            for key in ["id", "model", "usage", "tools", "choices", "content", "additional_kwargs", "response_metadata", "type"]:
-                if key in response and response[key]:
-                    output.append(f"{key}: {json.dumps(response[key], indent=2)}")
-                    found = True
+            for key in self.FIELDS:
+                value = response.get(key)
+                if value:
+                    output.append(f"{key}: {_dumps(value)}")
             # Show all tools if present
-            if "tools" in response and response["tools"]:
+            if response.get("tools"):
                 output.append("Tools:")
-                output.append(json.dumps(response["tools"], indent=2))
-                found = True
+                output.append(_dumps(response["tools"]))
             # Show all choices/messages if present
-            if "choices" in response and response["choices"]:
+            if response.get("choices"):
                 output.append("Choices:")
                 for idx, choice in enumerate(response["choices"]):
-                    output.append(f"Choice {idx}: {json.dumps(choice, indent=2)}")
-                found = True
-            if found:
+                    output.append(f"Choice {idx}: {_dumps(choice)}")
+            if len(output) > 1:
                 return "\n".join(output)
             # If nothing found, fall through to show raw dict
         # If response is an object, show all its attributes
         try:
             if hasattr(response, '__dict__'):
-                return f"Formatted Response (Raw Object):\n{json.dumps(vars(response), indent=2, default=str)}"
+                return f"Formatted Response (Raw Object):\n{_dumps(vars(response))}"
             elif hasattr(response, '__slots__'):
                 slot_dict = {slot: getattr(response, slot) for slot in response.__slots__}
-                return f"Formatted Response (Raw Object):\n{json.dumps(slot_dict, indent=2, default=str)}"
+                return f"Formatted Response (Raw Object):\n{_dumps(slot_dict)}"
         except Exception:
             pass
         # Fallback: pretty-print as JSON or str
         try:
-            return f"Formatted Response (Raw):\n{json.dumps(response, indent=2, default=str)}"
+            return f"Formatted Response (Raw):\n{_dumps(response)}"
         except Exception:
-            return f"Formatted Response (Unrecognized type): {str(response)}" 
\ No newline at end of file
+            return f"Formatted Response (Unrecognized type): {str(response)}"
+
+    def defer(self, input_text: Any, context: Any = None) -> 'DeferredFormat':
+        """A value that runs the formatting the first time it is turned into text."""
+        return DeferredFormat(self, input_text, context)
+
+class DeferredFormat:
+    """
+    The formatted form of a response, computed on first str()/format() (e.g. when printed) and
+    then cached. Compares equal to the formatted string.
+    """
+    __slots__ = ('_formatter', '_value', '_context', '_text')
+
+    def __init__(self, formatter: FormatResponseTool, value: Any, context: Any = None):
+        self._formatter = formatter
+        self._value = value
+        self._context = context
+        self._text = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = self._formatter.run(self._value, self._context)
+            self._value = self._context = None
+        return self._text
+
+    def __format__(self, spec: str) -> str:
+        return format(str(self), spec)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, DeferredFormat):
+            other = str(other)
+        return str(self) == other
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __repr__(self) -> str:
+        return f"DeferredFormat({'pending' if self._text is None else repr(self._text)})"
@@ -1,20 +1,65 @@
-from typing import Any, Callable
+import os
+import sys
+from typing import Any, Callable, Iterable, List, Optional
+from agent_builder.tools.tokenizers import get_tokenizer
+
+_confirmations: Optional[bool] = None
+
+def set_confirmations(enabled: Optional[bool]) -> None:
+    """
+    Turn the interactive confirmation prompt on or off for every TokenCounterTool in the process
+    (servers call set_confirmations(False)). None restores the default: prompt only when stdin is
+    a terminal and AGENT_CONFIRM_TOKENS is not "0".
+    """
+    global _confirmations
+    _confirmations = enabled
+
+def confirmations_enabled() -> bool:
+    if _confirmations is not None:
+        return _confirmations
+    if os.getenv("AGENT_CONFIRM_TOKENS", "").strip().lower() in ("0", "false", "no"):
+        return False
+    stdin = sys.stdin
+    return bool(stdin is not None and stdin.isatty())
 
 class TokenCounterTool:
     """
     Tool to calculate token count, print it, and confirm with the user before proceeding.
     Implements the unified tool interface: run(input_text: str, context: Any = None) -> bool.
-    Optionally supports non-interactive mode via the 'interactive' flag in context.
+    Optionally supports non-interactive mode via the 'interactive' flag in context, or for every
+    call with interactive=False (which also skips printing the count). Nothing is printed or asked
+    when confirmations are off process-wide (no terminal on stdin; see set_confirmations), so a
+    provider call never blocks on input() in a server or batch job.
+    Counts come from the tokenizer engine for the given provider/model (see agent_builder.tools.tokenizers)
+    unless a custom tokenizer function is passed.
     """
-    def __init__(self, tokenizer: Callable[[str], int] = None):
+    def __init__(self, tokenizer: Callable[[str], int] = None, provider: str = None, model: str = None,
+                 interactive: bool = True):
+        self.provider = provider
+        self.model = model
+        self.interactive = interactive
+        self._engine = None
         # Optionally accept a tokenizer function for more accurate token counting
         self.tokenizer = tokenizer or self.default_tokenizer
 
+    @property
+    def engine(self):
+        # Resolved on first use: picking a model tokenizer may load vocab files
+        if self._engine is None:
+            self._engine = get_tokenizer(self.provider, self.model)
+        return self._engine
+
     def default_tokenizer(self, text: str) -> int:
-        # Simple whitespace-based token count; replace with model-specific tokenizer as needed
-        return len(text.split())
+        return self.engine.count(text)
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        if self.tokenizer == self.default_tokenizer:
+            return self.engine.count_many(texts)
+        return [self.tokenizer(text) for text in texts]
 
     def run(self, input_text: str, context: Any = None) -> bool:
+        if not self.interactive or not confirmations_enabled():
+            return True
         token_count = self.tokenizer(input_text)
         print(f"Token count: {token_count}")
         interactive = True
@@ -23,4 +68,4 @@ class TokenCounterTool:
         if not interactive:
             return True
         confirm = input("Proceed with LLM call? (y/n): ").strip().lower()
-        return confirm == 'y' 
\ No newline at end of file
+        return confirm == 'y'
@@ -0,0 +1,156 @@
+"""
+Tokenizer engine used by TokenCounterTool.
+
+get_tokenizer(provider, model) picks a tokenizer per model: OpenAI models use their tiktoken
+encoding when tiktoken and its encoding files are available; every other model (and OpenAI when
+offline) uses the bundled byte-level BPE vocabulary, which approximates the sub-word tokenizers of
+Claude and llama-family models far better than whitespace splitting. Custom tokenizers can be
+plugged in per provider with register_tokenizer().
+"""
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from .bpe import BPETokenizer, BUNDLED_VOCAB, PATTERN, load_ranks
+
+# A newline followed by a non-space character always starts a new pre-tokenizer piece (for the
+# bundled pattern and for tiktoken's cl100k/o200k patterns), so counts add up exactly across it.
+_CHUNK_BOUNDARY = re.compile(r"(?<=\n)(?=\S)")
+
+
+class TiktokenTokenizer:
+    """Adapter for a tiktoken.Encoding (native, much faster than the pure-Python engine)."""
+    def __init__(self, encoding: Any):
+        self.encoding = encoding
+        self.name = encoding.name
+
+    def encode(self, text: str) -> List[int]:
+        return self.encoding.encode_ordinary(text)
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode_ordinary(text))
+
+
+class MemoizedTokenizer:
+    """
+    Wraps a tokenizer with line-level memoization. Text is split into chunks at newlines that
+    start a new piece and each chunk's count is kept in an LRU, so prompts that repeat a long
+    prefix (such as the memory context) only pay for the lines that are new.
+    """
+    def __init__(self, tokenizer: Any, max_entries: int = 8192):
+        self.tokenizer = tokenizer
+        self.name = getattr(tokenizer, "name", type(tokenizer).__name__)
+        self.max_entries = max_entries
+        self._counts: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encode(self, text: str) -> List[int]:
+        return self.tokenizer.encode(text)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return sum(self._count_chunk(chunk) for chunk in _CHUNK_BOUNDARY.split(text))
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        return [self.count(text) for text in texts]
+
+    def _count_chunk(self, chunk: str) -> int:
+        with self._lock:
+            n = self._counts.get(chunk)
+            if n is not None:
+                self._counts.move_to_end(chunk)
+                return n
+        n = self.tokenizer.count(chunk)
+        with self._lock:
+            self._counts[chunk] = n
+            if len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return n
+
+
+_bundled = None
+_bundled_lock = threading.Lock()
+_tokenizers: Dict[Tuple[Optional[str], Optional[str]], MemoizedTokenizer] = {}
+_tokenizers_lock = threading.Lock()
+_factories: Dict[str, Callable[[Optional[str]], Any]] = {}
+
+
+def bundled_tokenizer() -> Any:
+    """The bundled BPE vocabulary, run by tiktoken when installed and by BPETokenizer otherwise."""
+    global _bundled
+    with _bundled_lock:
+        if _bundled is None:
+            ranks = load_ranks(BUNDLED_VOCAB)
+            try:
+                import tiktoken
+                encoding = tiktoken.Encoding("agent_bpe_16k", pat_str=PATTERN, mergeable_ranks=ranks, special_tokens={})
+                _bundled = TiktokenTokenizer(encoding)
+            except ImportError:
+                _bundled = BPETokenizer(ranks, name="agent_bpe_16k")
+        return _bundled
+
+
+def _openai_tokenizer(model: Optional[str]) -> Any:
+    try:
+        import tiktoken
+        encoding = tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+        return TiktokenTokenizer(encoding)
+    except ImportError:
+        pass
+    except Exception as e:
+        # Unknown model name, or the encoding file cannot be downloaded (offline)
+        logging.info(f"Falling back to the bundled tokenizer for OpenAI model {model}: {e}")
+    return bundled_tokenizer()
+
+
+_factories["openai"] = _openai_tokenizer
+
+
+def register_tokenizer(provider: str, factory: Callable[[Optional[str]], Any]) -> None:
+    """Use factory(model) -> tokenizer (with count/encode methods) for every model of provider."""
+    with _tokenizers_lock:
+        _factories[provider.lower()] = factory
+        for key in [key for key in _tokenizers if key[0] == provider.lower()]:
+            del _tokenizers[key]
+
+
+def get_tokenizer(provider: str = None, model: str = None) -> MemoizedTokenizer:
+    provider = provider.lower() if provider else None
+    key = (provider, model)
+    with _tokenizers_lock:
+        tokenizer = _tokenizers.get(key)
+        factory = _factories.get(provider)
+    if tokenizer is not None:
+        return tokenizer
+    base = factory(model) if factory else bundled_tokenizer()
+    # Models that resolve to the same base tokenizer share one memo table
+    with _tokenizers_lock:
+        for existing in _tokenizers.values():
+            if existing.tokenizer is base:
+                tokenizer = existing
+                break
+        else:
+            tokenizer = MemoizedTokenizer(base)
+        return _tokenizers.setdefault(key, tokenizer)
+
+
+def count_tokens(text: str, provider: str = None, model: str = None) -> int:
+    return get_tokenizer(provider, model).count(text)
+
+
+def count_many(texts: Iterable[str], provider: str = None, model: str = None) -> List[int]:
+    return get_tokenizer(provider, model).count_many(texts)
+
+
+__all__ = [
+    'BPETokenizer',
+    'MemoizedTokenizer',
+    'TiktokenTokenizer',
+    'bundled_tokenizer',
+    'count_many',
+    'count_tokens',
+    'get_tokenizer',
+    'register_tokenizer',
+]
@@ -0,0 +1,177 @@
+"""
+Pure-Python byte-level BPE tokenizer.
+
+Uses the rank-file format of tiktoken (one "base64(token) rank" pair per line), so the bundled
+vocabulary can also be loaded by tiktoken's native engine when it is installed. The bundled
+vocabulary (data/agent_bpe_16k.tiktoken) was learned from the CPython 3.11 reference topics
+(pydoc_data/topics.py), the standard library's docstrings and a sample of its sources with:
+
+    python -m agent_builder.tools.tokenizers.bpe train <corpus files...> --vocab-size 16384
+"""
+import base64
+import heapq
+import os
+import re
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List
+
+# Pre-tokenizer modelled on cl100k_base, written for the stdlib re module ([^\W\d_] == letters).
+# Every newline followed by a non-space character ends a piece, which MemoizedTokenizer relies on.
+PATTERN = (
+    r"(?i:'s|'t|'re|'ve|'m|'ll|'d)"
+    r"|(?:[^\r\n\w]|_)?[^\W\d_]+"
+    r"|\d{1,3}"
+    r"| ?(?:[^\s\w]|_)+[\r\n]*"
+    r"|\s*[\r\n]+"
+    r"|\s+(?!\S)"
+    r"|\s+"
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+BUNDLED_VOCAB = os.path.join(DATA_DIR, "agent_bpe_16k.tiktoken")
+
+
+def load_ranks(path: str) -> Dict[bytes, int]:
+    ranks = {}
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                token, rank = line.split()
+                ranks[base64.b64decode(token)] = int(rank)
+    return ranks
+
+
+def save_ranks(ranks: Dict[bytes, int], path: str) -> None:
+    with open(path, "wb") as f:
+        for token, rank in sorted(ranks.items(), key=lambda item: item[1]):
+            f.write(base64.b64encode(token) + b" " + str(rank).encode() + b"\n")
+
+
+class BPETokenizer:
+    """
+    Byte-level BPE over regex pre-tokenized pieces. Counts of individual pieces are memoized,
+    so text made of already-seen words is counted with one regex scan and dictionary lookups.
+    """
+    def __init__(self, ranks: Dict[bytes, int], pattern: str = PATTERN, name: str = "bpe", max_cached_pieces: int = 200_000):
+        self.ranks = ranks
+        self.name = name
+        self.pattern = re.compile(pattern)
+        self.max_cached_pieces = max_cached_pieces
+        self._piece_counts: Dict[str, int] = {}
+
+    def _merge(self, piece: bytes) -> List[bytes]:
+        parts = [piece[i:i + 1] for i in range(len(piece))]
+        ranks = self.ranks
+        while len(parts) > 1:
+            best_rank, best_index = None, -1
+            for i in range(len(parts) - 1):
+                rank = ranks.get(parts[i] + parts[i + 1])
+                if rank is not None and (best_rank is None or rank < best_rank):
+                    best_rank, best_index = rank, i
+            if best_rank is None:
+                break
+            parts[best_index:best_index + 2] = [parts[best_index] + parts[best_index + 1]]
+        return parts
+
+    def encode(self, text: str) -> List[int]:
+        tokens = []
+        for piece in self.pattern.findall(text):
+            data = piece.encode("utf-8")
+            rank = self.ranks.get(data)
+            if rank is not None:
+                tokens.append(rank)
+            else:
+                tokens.extend(self.ranks[part] for part in self._merge(data))
+        return tokens
+
+    def count(self, text: str) -> int:
+        cache = self._piece_counts
+        total = 0
+        for piece in self.pattern.findall(text):
+            n = cache.get(piece)
+            if n is None:
+                data = piece.encode("utf-8")
+                n = 1 if data in self.ranks else len(self._merge(data))
+                if len(cache) >= self.max_cached_pieces:
+                    cache.clear()
+                cache[piece] = n
+            total += n
+        return total
+
+
+def train(texts: Iterable[str], vocab_size: int, pattern: str = PATTERN) -> Dict[bytes, int]:
+    """Learn vocab_size - 256 merges from texts (word-frequency BPE with incremental pair counts)."""
+    compiled = re.compile(pattern)
+    words = Counter()
+    for text in texts:
+        words.update(piece.encode("utf-8") for piece in compiled.findall(text))
+    ranks = {bytes([i]): i for i in range(256)}
+    seqs = [[word[i:i + 1] for i in range(len(word))] for word in words]
+    freqs = list(words.values())
+    pair_counts = Counter()
+    where = defaultdict(set)
+    for idx, seq in enumerate(seqs):
+        for pair in zip(seq, seq[1:]):
+            pair_counts[pair] += freqs[idx]
+            where[pair].add(idx)
+    heap = [(-count, pair) for pair, count in pair_counts.items()]
+    heapq.heapify(heap)
+    while len(ranks) < vocab_size and heap:
+        neg_count, pair = heapq.heappop(heap)
+        if pair_counts.get(pair, 0) != -neg_count or neg_count == 0:
+            continue  # stale heap entry
+        merged = pair[0] + pair[1]
+        if merged in ranks:
+            del pair_counts[pair]
+            continue
+        ranks[merged] = len(ranks)
+        changed = set()
+        for idx in list(where.pop(pair, ())):
+            seq, freq = seqs[idx], freqs[idx]
+            for old in zip(seq, seq[1:]):
+                pair_counts[old] -= freq
+                changed.add(old)
+            new_seq, i = [], 0
+            while i < len(seq):
+                if i < len(seq) - 1 and seq[i] == pair[0] and seq[i + 1] == pair[1]:
+                    new_seq.append(merged)
+                    i += 2
+                else:
+                    new_seq.append(seq[i])
+                    i += 1
+            seqs[idx] = new_seq
+            for new in zip(new_seq, new_seq[1:]):
+                pair_counts[new] += freq
+                where[new].add(idx)
+                changed.add(new)
+        pair_counts.pop(pair, None)
+        for changed_pair in changed:
+            count = pair_counts.get(changed_pair, 0)
+            if count > 0:
+                heapq.heappush(heap, (-count, changed_pair))
+            else:
+                pair_counts.pop(changed_pair, None)
+    return ranks
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Train a byte-level BPE vocabulary in tiktoken rank format.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_cmd = sub.add_parser("train")
+    train_cmd.add_argument("corpus", nargs="+", help="Text files to learn merges from")
+    train_cmd.add_argument("--vocab-size", type=int, default=16384)
+    train_cmd.add_argument("--output", default=BUNDLED_VOCAB)
+    args = parser.parse_args(argv)
+
+    def read_all():
+        for path in args.corpus:
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                yield f.read()
+    ranks = train(read_all(), args.vocab_size)
+    save_ranks(ranks, args.output)
+    print(f"Wrote {len(ranks)} tokens to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,41 @@
 # Utility functions for agent_builder
+import functools
+import threading
+
+_env_loaded = False
+_env_lock = threading.Lock()
+
 
 def print_banner():
-    print("AI Agent Builder - Modular Agent Framework") 
\ No newline at end of file
+    print("AI Agent Builder - Modular Agent Framework")
+
+
+def load_env(dotenv_path=None, override=False):
+    """
+    Load variables from a .env file into os.environ, once per process. Providers call this when
+    they are constructed; applications may call it earlier (or with a specific path) themselves.
+    Returns True if this call loaded the file.
+    """
+    global _env_loaded
+    with _env_lock:
+        if _env_loaded and dotenv_path is None:
+            return False
+        try:
+            from dotenv import load_dotenv
+        except ImportError:
+            return False
+        load_dotenv(dotenv_path=dotenv_path, override=override)
+        _env_loaded = True
+        return True
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Run a blocking callable in the default executor so it does not stall the event loop. It runs
+    in a copy of the caller's context, so context variables such as the request priority apply.
+    """
+    import asyncio
+    import contextvars
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(None, functools.partial(context.run, func, *args, **kwargs))
@@ -0,0 +1,68 @@
+"""
+Import-time benchmark.
+
+    python benchmarks/import_time_benchmark.py [--module agent_builder.agent] [--max-ms 250]
+
+Imports each module in a fresh interpreter under `python -X importtime` and reports the
+cumulative import time of the module and its heaviest dependencies. Exits non-zero when a module
+takes longer than --max-ms, so it can guard the lazy provider imports in CI.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_MODULES = [
+    'agent_builder.agent',
+    'agent_builder.components.planner',
+    'agent_builder.llm_providers',
+]
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(module):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''))
+    code = f'import {module}' if module else 'pass'
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          capture_output=True, text=True, env=env, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            times[match.group(4)] = int(match.group(2))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', action='append', dest='modules')
+    parser.add_argument('--max-ms', type=float, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    # Modules loaded by interpreter startup (site, .pth hooks) are not part of our import cost
+    startup = set(import_times(None))
+    results, failed = {}, False
+    for module in args.modules or DEFAULT_MODULES:
+        # Best of several runs: the first one also pays for writing .pyc files
+        runs = [import_times(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda t: t.get(module, 0))
+        heaviest = sorted(((name, us) for name, us in best.items() if name != module and name not in startup), key=lambda x: -x[1])
+        ms = best.get(module, 0) / 1000
+        results[module] = {
+            "cumulative_ms": ms,
+            "heaviest": {name: us / 1000 for name, us in heaviest[:args.top]},
+        }
+        if args.max_ms is not None and ms > args.max_ms:
+            failed = True
+    print(json.dumps(results, indent=2))
+    if failed:
+        sys.exit(f"import time above {args.max_ms} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Tokenizer throughput benchmark.
+
+    python benchmarks/tokenizer_benchmark.py [--size-kb 512] [--repeat 5]
+
+Reports tokens per second for the whitespace baseline, the pure-Python BPE engine, the bundled
+vocabulary on tiktoken (when installed), and the memoized engine TokenCounterTool uses, on a cold
+large prompt and on a prompt that repeats a long memory-context prefix.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from agent_builder.tools.tokenizers import BPETokenizer, MemoizedTokenizer, bundled_tokenizer
+from agent_builder.tools.tokenizers.bpe import BUNDLED_VOCAB, load_ranks
+
+
+def make_corpus(size_bytes, seed=0):
+    rng = random.Random(seed)
+    root = os.path.join(os.path.dirname(__file__), '..')
+    sources = []
+    for dirpath, _, filenames in os.walk(os.path.join(root, 'agent_builder')):
+        sources.extend(os.path.join(dirpath, f) for f in filenames if f.endswith('.py'))
+    sources.append(os.path.join(root, 'README.md'))
+    lines = []
+    for path in sources:
+        with open(path, encoding='utf-8') as f:
+            lines.extend(f.read().splitlines(keepends=True))
+    out, total = [], 0
+    while total < size_bytes:
+        line = rng.choice(lines)
+        out.append(line)
+        total += len(line)
+    return "".join(out)
+
+
+def measure(count, text, repeat):
+    best = float('inf')
+    tokens = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = count(text)
+        best = min(best, time.perf_counter() - start)
+    return {"tokens": tokens, "seconds": best, "tokens_per_second": tokens / best if best else float('inf')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-kb', type=int, default=512)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    text = make_corpus(args.size_kb * 1024)
+    prefix = make_corpus(args.size_kb * 1024, seed=1)
+    prompts = [f"{prefix}\nUser: question {i}\n" for i in range(args.repeat)]
+
+    pure = BPETokenizer(load_ranks(BUNDLED_VOCAB))
+    engines = {
+        "whitespace": lambda t: len(t.split()),
+        "bpe_pure_python": lambda t: BPETokenizer(pure.ranks).count(t),  # fresh piece cache: cold
+        "bpe_pure_python_warm": pure.count,
+        "bundled": bundled_tokenizer().count,
+        "memoized": lambda t: MemoizedTokenizer(bundled_tokenizer()).count(t),  # fresh memo: cold
+    }
+    results = {"prompt_bytes": len(text), "large_prompt": {}, "repeated_prefix": {}}
+    for name, count in engines.items():
+        results["large_prompt"][name] = measure(count, text, args.repeat)
+
+    # Memory-context style: every prompt shares the same long prefix and differs in the last line
+    for name in ("bundled", "memoized"):
+        count = bundled_tokenizer().count if name == "bundled" else MemoizedTokenizer(bundled_tokenizer()).count
+        start = time.perf_counter()
+        tokens = sum(count(p) for p in prompts)
+        elapsed = time.perf_counter() - start
+        results["repeated_prefix"][name] = {"tokens": tokens, "seconds": elapsed, "tokens_per_second": tokens / elapsed}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -11,12 +11,8 @@ from agent_builder.agent import Agent
 from agent_builder.components.memory import Memory
 from agent_builder.components.planner import Planner, OllamaPlanner, OpenAIPlanner, AnthropicPlanner, AnacondaPlanner
 from agent_builder.components.executor import Executor
-from agent_builder.llm_providers.ollama_llm import OllamaLLM
-from agent_builder.llm_providers.openai_llm import OpenAILLM
-from agent_builder.llm_providers.anthropic_llm import AnthropicLLM
-from agent_builder.llm_providers.anaconda_llm import AnacondaLLM
 from agent_builder.utils import print_banner
-from agent_builder.llm_providers import CommandLLM
+from agent_builder.llm_providers import CommandLLM, cached_list_models, get_llm, get_residency
 from agent_builder.langchain_llm_wrapper import LangChainLLMWrapper
 
 
@@ -73,17 +69,28 @@ def handle_langchain_backend(verbose, memory):
     executor = Executor()
     agent = Agent(memory, planner, executor)
     print(f"Type 'exit' to return to main menu. Using LangChain provider: {provider_name}, model: {model}")
-    chat_loop(agent, executor, verbose)
+    chat_loop(agent, verbose)
+
+
+def warm_ollama_model(model, previous=None):
+    """Load the selected Ollama model while the user types, and keep it loaded while chatting.
+    The previously selected model is unloaded to free memory for this one."""
+    residency = get_residency()
+    if previous and previous != model:
+        residency.release(previous)
+    residency.pin(model)
+    residency.preload_in_background([model])
 
 
 def handle_custom_backend(verbose, memory):
     """Handle the custom backend selection and chat loop for each provider."""
     providers = [
-        ("Ollama", OllamaLLM, OllamaPlanner),
-        ("OpenAI", OpenAILLM, OpenAIPlanner),
-        ("Anthropic", AnthropicLLM, AnthropicPlanner),
-        ("Anaconda", AnacondaLLM, AnacondaPlanner)
+        ("Ollama", "ollama", OllamaPlanner),
+        ("OpenAI", "openai", OpenAIPlanner),
+        ("Anthropic", "anthropic", AnthropicPlanner),
+        ("Anaconda", "anaconda", AnacondaPlanner)
     ]
+    ollama_model = None
     while True:
         options = [p[0] for p in providers] + ["Test all providers (CommandLLM)", "Back to main menu"]
         idx = select_from_list("Available LLM providers:", options)
@@ -94,21 +101,26 @@ def handle_custom_backend(verbose, memory):
             continue
         if idx == len(providers) + 1:
             break
-        provider_name, LLMClass, PlannerClass = providers[idx]
+        provider_name, provider_key, PlannerClass = providers[idx]
         try:
-            llm = LLMClass()
-            models = llm.list_models()
+            # Shared instance and cached model list: returning to this menu costs no extra requests,
+            # and the planner below reuses the registry's instance for the selected model
+            models = cached_list_models(get_llm(provider_key))
             if not models:
                 print(f"No {provider_name} models found or API key missing.")
                 continue
             model_idx = select_from_list(f"Available {provider_name} models:", models)
             selected_model = models[model_idx] if model_idx is not None else models[0]
             selected_model_name = selected_model if provider_name == "Anaconda" else selected_model.split(" (Running)")[0]
+            if provider_key == "ollama":
+                # Switching models otherwise pays the model load on the first reply
+                warm_ollama_model(selected_model_name, previous=ollama_model)
+                ollama_model = selected_model_name
             planner = PlannerClass(model=selected_model_name)
             executor = Executor()
             agent = Agent(memory, planner, executor)
             print("Type 'exit' to return to provider selection.")
-            chat_loop(agent, executor, verbose)
+            chat_loop(agent, verbose)
         except Exception as e:
             print(f"Error: {e}")
 
@@ -133,16 +145,13 @@ def test_all_providers():
             print(f"Error with provider {prov}: {e}")
 
 
-def chat_loop(agent, executor, verbose):
-    """Main chat loop for user interaction with the agent."""
+def chat_loop(agent, verbose):
+    """Main chat loop for user interaction with the agent. Tool commands such as echo "hi" are
+    resolved by the planner's router without an LLM call."""
     while True:
         user_input = input("You: ")
         if user_input.lower() == 'exit':
             break
-        if user_input.strip().lower().startswith('echo'):
-            text = user_input[len('echo'):].strip().strip('"')
-            print(f"Agent: {executor.echo_tool.run(text)}")
-            continue
         try:
             result = agent.act(user_input, format_response=True, show_full_details=verbose)
             print(f"Agent: {result}")
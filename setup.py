@@ -6,6 +6,9 @@ setup(
     description='A modular Python framework for building AI agents',
     author='Your Name',
     packages=find_packages(),
+    package_data={'agent_builder.tools.tokenizers': ['data/*.tiktoken']},
     install_requires=[],
+    entry_points={'console_scripts': ['agent-builder-bench=agent_builder.bench.loadtest:main',
+                                      'agent-builder-serve=agent_builder.server:main']},
     python_requires='>=3.7',
 ) 
\ No newline at end of file
@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal Ollama/llama.cpp stand-in used by provider tests."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, obj, code=200):
+        body = json.dumps(obj).encode()
+        self.server.peers.add(self.client_address)
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.gets.append(self.path)
+        if self.path == "/models":
+            self._send({"data": [{"id": "stub-model"}]})
+        elif self.path == "/api/tags":
+            self._send({"models": [{"name": "llama2"}]})
+        elif self.path == "/api/ps":
+            self._send({"models": [{"name": name, "model": name} for name in sorted(self.server.loaded)]})
+        else:
+            self._send({"status": "ok"})
+
+    def _stream(self, lines):
+        self.server.peers.add(self.client_address)
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for line in lines:
+            data = (line + "\n").encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _context(body):
+        # Stands in for Ollama's token context: one entry per prompt processed
+        return body.get("context", []) + [len(body.get("prompt", ""))]
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        self.server.requests.append((self.path, body))
+        if self.path == "/api/generate":
+            # Ollama unloads a model asked to keep_alive 0, and loads it for anything else
+            name = body.get("model", "")
+            name = name if ":" in name else f"{name}:latest"
+            if body.get("keep_alive") == 0:
+                self.server.loaded.discard(name)
+                self._send({"model": body.get("model"), "response": "", "done": True, "done_reason": "unload"})
+                return
+            self.server.loaded.add(name)
+        words = f"{body.get('prompt', '')} streamed back".split(" ")
+        if self.path == "/api/generate" and body.get("stream"):
+            self._stream([json.dumps({"response": w + " ", "done": False}) for w in words]
+                         + [json.dumps({"response": "", "done": True, "context": self._context(body)})])
+        elif self.path == "/completion" and body.get("stream"):
+            self._stream([f"data: {json.dumps({'content': w + ' ', 'stop': False})}\n" for w in words]
+                         + [f"data: {json.dumps({'content': '', 'stop': True})}\n"])
+        elif self.path == "/api/generate":
+            self._send({"response": f"ollama: {body.get('prompt', '')}", "done": True, "context": self._context(body)})
+        elif self.path == "/api/embed":
+            self._send({"embeddings": [[float(len(text)), 1.0] for text in body.get("input", [])]})
+        elif self.path == "/completion":
+            self._send({"content": f"llama: {body.get('prompt', '')}", "tokens_evaluated": 1, "tokens_predicted": 3})
+        else:
+            self._send({"error": "not found"}, 404)
+
+
+def start_stub_server(handler=StubHandler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.peers = set()
+    server.requests = []
+    server.gets = []
+    server.loaded = set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -1,4 +1,5 @@
 import unittest
+import asyncio
 from agent_builder.agent import Agent
 from agent_builder.components.memory import Memory
 from agent_builder.components.planner import Planner, OllamaPlanner, OpenAIPlanner, AnthropicPlanner, AnacondaPlanner
@@ -20,6 +21,17 @@ class MockLLM:
     def generate(self, prompt):
         return self.response
 
+class AsyncMockLLM(MockLLM):
+    async def agenerate(self, prompt):
+        await asyncio.sleep(0)
+        return self.response
+
+class AsyncUpperTool:
+    async def arun(self, input_text, context=None):
+        return input_text.upper()
+    def run(self, input_text, context=None):
+        raise AssertionError("aexecute should prefer arun")
+
 class LangChainLLMWrapper:
     def __init__(self, model="gpt-3.5-turbo", api_key="sk-test", base_url="https://api.openai.com/v1"):
         self.llm = ChatOpenAI(model=model, api_key=api_key, base_url=base_url)
@@ -93,6 +105,33 @@ class TestAgent(unittest.TestCase):
         result = agent.act('hello')
         self.assertEqual(result, 'Echo: langchain response')
 
+class TestAsyncAgent(unittest.TestCase):
+    def test_aact_with_async_llm(self):
+        memory = Memory()
+        agent = Agent(memory, Planner(llm=AsyncMockLLM("echo: async hello")), Executor())
+        result = asyncio.run(agent.aact('hello'))
+        self.assertEqual(result, 'Echo: async hello')
+        self.assertEqual(memory.get_history()[0]['result'], 'Echo: async hello')
+
+    def test_aact_falls_back_to_sync_llm(self):
+        agent = Agent(Memory(), Planner(llm=MockLLM("echo: sync hello")), Executor())
+        self.assertEqual(asyncio.run(agent.aact('hello')), 'Echo: sync hello')
+
+    def test_concurrent_sessions(self):
+        async def run_all():
+            agents = [Agent(Memory(), Planner(llm=AsyncMockLLM(f"echo: {i}")), Executor()) for i in range(20)]
+            return await asyncio.gather(*(agent.aact('hi') for agent in agents))
+        results = asyncio.run(run_all())
+        self.assertEqual(results, [f'Echo: {i}' for i in range(20)])
+
+    def test_aexecute_async_tool(self):
+        executor = Executor()
+        executor.tool_registry.register('upper', AsyncUpperTool())
+        result = asyncio.run(executor.aexecute({'type': 'tool', 'tool': 'upper', 'input_text': 'abc'}))
+        self.assertEqual(result, 'ABC')
+        result = asyncio.run(executor.aexecute({'type': 'tool', 'tool': 'echo', 'input_text': 'abc'}))
+        self.assertEqual(result, 'Echo: abc')
+
 if __name__ == '__main__':
     print("Select LLM backend:")
     print("  1. LangChain (ChatOpenAI)")
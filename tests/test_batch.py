@@ -0,0 +1,85 @@
+import asyncio
+import itertools
+import threading
+import time
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+from agent_builder.components.executor import Executor
+from agent_builder.components.batch import bounded_map
+
+
+class SlowEchoLLM:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+    def generate(self, prompt):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        # Later inputs finish first, so as-completed order differs from input order
+        time.sleep(0.02 if "0" in prompt else 0.001)
+        with self.lock:
+            self.active -= 1
+        return f"echo: {prompt}"
+    async def agenerate(self, prompt):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return f"echo: {prompt}"
+
+
+class TestBatch(unittest.TestCase):
+    def test_act_many_ordered_with_bounded_concurrency(self):
+        llm = SlowEchoLLM()
+        agent = Agent(Memory(), Planner(llm=llm), Executor())
+        results = list(agent.act_many([f"q{i}" for i in range(20)], concurrency=4))
+        self.assertEqual(results, [f"Echo: q{i}" for i in range(20)])
+        self.assertLessEqual(llm.peak, 4)
+        self.assertEqual(agent.memory.get_history(), [])
+
+    def test_act_many_as_completed_yields_indexes(self):
+        agent = Agent(Memory(), Planner(llm=SlowEchoLLM()), Executor())
+        results = list(agent.act_many(["q0", "q1", "q2"], concurrency=3, ordered=False))
+        self.assertEqual(sorted(results), [(0, "Echo: q0"), (1, "Echo: q1"), (2, "Echo: q2")])
+        self.assertEqual(results[-1], (0, "Echo: q0"))
+
+    def test_inputs_are_consumed_lazily(self):
+        consumed = []
+        def inputs():
+            for i in itertools.count():
+                consumed.append(i)
+                yield i
+        results = bounded_map(lambda x: x * 2, inputs(), concurrency=3)
+        self.assertEqual([next(results) for _ in range(5)], [0, 2, 4, 6, 8])
+        self.assertLessEqual(len(consumed), 5 + 3)
+        results.close()
+
+    def test_per_input_memory_factory(self):
+        memories = []
+        def factory():
+            memories.append(Memory())
+            return memories[-1]
+        agent = Agent(Memory(), Planner(llm=SlowEchoLLM()), Executor())
+        list(agent.act_many(["a", "b"], memory_factory=factory))
+        self.assertEqual(sorted(m.get_history()[0]['input'] for m in memories), ["a", "b"])
+
+    def test_aact_many_and_plan_batch(self):
+        llm = SlowEchoLLM()
+        agent = Agent(Memory(), Planner(llm=llm), Executor())
+
+        async def collect():
+            return [r async for r in agent.aact_many([f"q{i}" for i in range(10)], concurrency=5)]
+        self.assertEqual(asyncio.run(collect()), [f"Echo: q{i}" for i in range(10)])
+        self.assertLessEqual(llm.peak, 5)
+        plans = list(agent.planner.plan_batch(["x", "y"], concurrency=2))
+        self.assertEqual([p['input_text'] for p in plans], ["x", "y"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import contextlib
+import io
+import json
+import unittest
+from agent_builder.bench import LatencyModel, start_stand_in_server
+from agent_builder.bench.loadtest import main, percentile
+from agent_builder.llm_providers.ollama_llm import OllamaLLM
+
+
+class TestStandInServer(unittest.TestCase):
+    def test_latency_models(self):
+        self.assertEqual(LatencyModel("fixed", 0.01).sample(), 0.01)
+        model = LatencyModel("uniform", 0.01, 0.5, seed=1)
+        self.assertTrue(all(0.005 <= model.sample() <= 0.015 for _ in range(100)))
+        lognormal = LatencyModel("lognormal", 0.01, 1.0, seed=1)
+        samples = [lognormal.sample() for _ in range(5000)]
+        self.assertAlmostEqual(sum(samples) / len(samples), 0.01, delta=0.002)
+        with self.assertRaises(ValueError):
+            LatencyModel("bimodal")
+
+    def test_server_records_service_time(self):
+        server = start_stand_in_server(latency=LatencyModel("fixed", 0.0), reply_tokens=3)
+        try:
+            llm = OllamaLLM(model=server.model_name, base_url=server.url)
+            self.assertEqual(llm.generate("hello"), "w0 w1 w2")
+            self.assertEqual("".join(llm.stream("hello")), "w0 w1 w2 ")
+            self.assertEqual(len(server.service_times()), 2)
+            server.reset_stats()
+            self.assertEqual(server.service_times(), [])
+        finally:
+            server.stop()
+
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+
+class TestLoadTest(unittest.TestCase):
+    def run_bench(self, *args):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(main(["--turns", "6", "--concurrency", "2", "--warmup", "1",
+                                   "--latency-ms", "1", "--reply-tokens", "4", *args]), 0)
+        return json.loads(out.getvalue())
+
+    def test_report_per_provider_and_mode(self):
+        for mode in ("sync", "async", "stream"):
+            with self.subTest(mode=mode):
+                report = self.run_bench("--mode", mode, "--in-process")
+                self.assertEqual([r["provider"] for r in report["results"]], ["ollama", "anaconda", "openai"])
+                for result in report["results"]:
+                    self.assertEqual(result["turns"], 6)
+                    self.assertEqual(result["errors"], 0)
+                    self.assertGreater(result["throughput_turns_per_s"], 0)
+                    self.assertEqual(set(result["latency_ms"]), {"mean", "p50", "p95", "p99", "max"})
+                    self.assertIn("overhead_ms_per_turn", result)
+                    self.assertIn("execute", result["stages_ms"])
+                    self.assertEqual(mode == "stream", "first_token_ms" in result)
+
+    def test_child_process_server(self):
+        report = self.run_bench("--provider", "ollama")
+        self.assertEqual(report["results"][0]["errors"], 0)
@@ -0,0 +1,120 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+from agent_builder.components.executor import Executor
+from agent_builder.llm_providers.cached_llm import CachedLLM, ResponseCache, LRUCache, SQLiteCache
+
+
+class CountingLLM:
+    def __init__(self, response="answer", model="m1"):
+        self.response = response
+        self.model = model
+        self.calls = 0
+    def generate(self, prompt):
+        self.calls += 1
+        return {"content": f"{self.response}: {prompt}", "raw": {"id": self.calls}}
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_hit_skips_llm(self):
+        llm = CountingLLM()
+        cached = CachedLLM(llm)
+        first = cached.generate("hello")
+        second = cached.generate("hello")
+        self.assertEqual(first, second)
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(cached.cache.stats()["hits"], 1)
+        self.assertEqual(cached.cache.stats()["misses"], 1)
+
+    def test_key_includes_model_and_params(self):
+        cache = ResponseCache()
+        CachedLLM(CountingLLM(model="a"), cache=cache).generate("p")
+        llm_b = CountingLLM(model="b")
+        CachedLLM(llm_b, cache=cache).generate("p")
+        CachedLLM(llm_b, cache=cache, params={"temperature": 0.2}).generate("p")
+        self.assertEqual(llm_b.calls, 2)
+
+    def test_errors_are_not_cached(self):
+        llm = CountingLLM(response="An error occurred with Ollama")
+        cached = CachedLLM(llm)
+        cached.generate("x")
+        cached.generate("x")
+        self.assertEqual(llm.calls, 2)
+
+    def test_lru_evicts_by_count_and_bytes(self):
+        lru = LRUCache(max_entries=2, max_bytes=10)
+        lru.set("a", b"1234")
+        lru.set("b", b"1234")
+        lru.get("a")
+        lru.set("c", b"1234")
+        self.assertIsNone(lru.get("b"))
+        self.assertIsNotNone(lru.get("a"))
+        lru.set("d", b"12345678")
+        self.assertEqual(list(lru.entries), ["d"])
+        self.assertLessEqual(lru.total_bytes, 10)
+
+    def test_disk_tier_survives_new_process_cache_and_expires(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "cache.sqlite")
+            llm = CountingLLM()
+            CachedLLM(llm, cache=ResponseCache(disk_path=path)).generate("q")
+            fresh = ResponseCache(disk_path=path)
+            CachedLLM(llm, cache=fresh).generate("q")
+            self.assertEqual(llm.calls, 1)
+            self.assertEqual(fresh.stats()["disk_hits"], 1)
+            short = ResponseCache(disk_path=os.path.join(tmp, "ttl.sqlite"), ttl=0.01)
+            CachedLLM(llm, cache=short).generate("r")
+            short.memory.clear()
+            time.sleep(0.02)
+            CachedLLM(llm, cache=short).generate("r")
+            self.assertEqual(llm.calls, 3)
+
+    def test_expired_rows_are_purged_on_write(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            disk = SQLiteCache(os.path.join(tmp, "ttl.sqlite"), ttl=0.01, purge_interval=0)
+            disk.set("a", b"1")
+            disk.set("b", b"2")
+            time.sleep(0.02)
+            disk.set("c", b"3")
+            self.assertEqual(disk.conn.execute("SELECT key FROM responses").fetchall(), [("c",)])
+            disk.conn.close()
+
+    def test_disk_tier_stores_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResponseCache(disk_path=os.path.join(tmp, "cache.sqlite"))
+            CachedLLM(CountingLLM(), cache=cache).generate("q")
+            blob = cache.disk.conn.execute("SELECT value FROM responses").fetchone()[0]
+            self.assertEqual(json.loads(blob)["content"], "answer: q")
+            # Values JSON cannot represent are not cached; unreadable rows are misses
+            cache.set("k", {"content": object()})
+            self.assertEqual(cache.get("k"), (False, None))
+            cache.disk.set("old", b"\x80\x04pickled")
+            self.assertEqual(cache.get("old"), (False, None))
+
+    def test_key_follows_model_changes(self):
+        llm = CountingLLM()
+        cached = CachedLLM(llm)
+        cached.generate("q")
+        llm.model = "other-model"
+        cached.generate("q")
+        self.assertEqual(llm.calls, 2)
+
+    def test_planner_with_cache_async_and_stream(self):
+        llm = CountingLLM(response="echo")
+        cached = CachedLLM(llm)
+        agent = Agent(Memory(), Planner(llm=cached), Executor())
+        self.assertEqual(agent.act("hi", format_response=False), "echo: hi")
+        self.assertEqual(asyncio.run(cached.agenerate("hi"))["content"], "echo: hi")
+        self.assertEqual(list(cached.stream("s")), ["echo: s"])
+        self.assertEqual(list(cached.stream("s")), ["echo: s"])
+        self.assertEqual(llm.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from agent_builder.llm_providers.coalescing import CoalescingLLM, SingleFlight
+from agent_builder.llm_providers.errors import LLMServerError
+
+
+class SlowLLM:
+    def __init__(self, delay=0.2, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _count(self):
+        with self.lock:
+            self.calls += 1
+
+    def generate(self, prompt):
+        self._count()
+        time.sleep(self.delay)
+        if self.fail:
+            raise LLMServerError("backend down")
+        return {"content": f"reply to {prompt}"}
+
+    async def agenerate(self, prompt):
+        self._count()
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise LLMServerError("backend down")
+        return {"content": f"reply to {prompt}"}
+
+
+class TestCoalescingLLM(unittest.TestCase):
+    def test_threads_share_one_call(self):
+        upstream = SlowLLM()
+        llm = CoalescingLLM(upstream)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(llm.generate, ["hello"] * 8))
+        self.assertEqual(upstream.calls, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(llm.stats()["shared"], 7)
+        # Nothing is kept: the next call goes upstream again
+        llm.generate("hello")
+        self.assertEqual(upstream.calls, 2)
+
+    def test_different_prompts_are_not_coalesced(self):
+        upstream = SlowLLM(delay=0.05)
+        llm = CoalescingLLM(upstream)
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(llm.generate, ["a", "b", "a", "b"]))
+        self.assertEqual(upstream.calls, 2)
+
+    def test_tasks_share_one_call(self):
+        upstream = SlowLLM()
+        llm = CoalescingLLM(upstream)
+
+        async def burst():
+            return await asyncio.gather(*(llm.agenerate("hello") for _ in range(8)))
+        results = asyncio.run(burst())
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+
+    def test_tasks_wait_on_a_thread_call(self):
+        upstream = SlowLLM()
+        llm = CoalescingLLM(upstream)
+        leader = threading.Thread(target=llm.generate, args=("hello",))
+        leader.start()
+        time.sleep(0.05)
+
+        async def follow():
+            return await asyncio.gather(*(llm.agenerate("hello") for _ in range(3)))
+        results = asyncio.run(follow())
+        leader.join()
+        self.assertEqual(upstream.calls, 1)
+        self.assertEqual(results[0], {"content": "reply to hello"})
+
+    def test_errors_reach_every_caller(self):
+        upstream = SlowLLM(fail=True)
+        llm = CoalescingLLM(upstream)
+        errors = []
+
+        def call():
+            try:
+                llm.generate("hello")
+            except LLMServerError as e:
+                errors.append(e)
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((upstream.calls, len(errors)), (1, 4))
+
+    def test_cancelled_leader_hands_over(self):
+        upstream = SlowLLM()
+        llm = CoalescingLLM(upstream)
+
+        async def run():
+            leader = asyncio.ensure_future(llm.agenerate("hello"))
+            await asyncio.sleep(0.01)
+            follower = asyncio.ensure_future(llm.agenerate("hello"))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+        self.assertEqual(asyncio.run(run()), {"content": "reply to hello"})
+        self.assertEqual(upstream.calls, 2)
+        self.assertEqual(llm.flights.in_flight(), 0)
+
+    def test_key_follows_model_changes(self):
+        upstream = SlowLLM(delay=0)
+        upstream.model = "first"
+        llm = CoalescingLLM(upstream)
+        key = llm._key("hi", "generate")
+        upstream.model = "second"
+        self.assertNotEqual(llm._key("hi", "generate"), key)
+        self.assertEqual(llm.model, "second")
+
+    def test_wrapping_does_not_read_the_model(self):
+        class LazyModelLLM(SlowLLM):
+            reads = 0
+
+            @property
+            def model(self):
+                # Providers may look their model up over the network
+                self.reads += 1
+                return "lazy"
+
+        upstream = LazyModelLLM(delay=0)
+        llm = CoalescingLLM(upstream)
+        self.assertEqual(upstream.reads, 0)
+        llm.generate("hi")
+        self.assertEqual(upstream.reads, 1)
+
+    def test_single_flight_keys(self):
+        flights = SingleFlight()
+        self.assertEqual(flights.do(("k",), lambda: 42), 42)
+        self.assertEqual(flights.stats(), {"calls": 1, "shared": 0, "share_rate": 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import unittest
+from agent_builder.llm_providers import (
+    AllProvidersFailedError, CircuitBreaker, CommandLLM, LLMAbortedError, LLMConnectionError,
+    LLMRequestError, LLMTimeoutError, RetryPolicy, clear_llms, register_provider, reset_circuit_breakers,
+)
+from agent_builder.llm_providers import registry
+from agent_builder.llm_providers.errors import to_llm_error
+from agent_builder.llm_providers.ollama_llm import OllamaLLM
+
+
+class FakeLLM:
+    """Fails with the queued errors, then answers."""
+    errors = {}
+    calls = {}
+
+    def __init__(self, model=None, timeout=60, raise_errors=False):
+        self.model = model
+
+    @classmethod
+    def _next(cls, model):
+        cls.calls[model] = cls.calls.get(model, 0) + 1
+        queue = cls.errors.get(model, [])
+        if queue:
+            raise queue.pop(0)
+        return f"{model}: ok"
+
+    def generate(self, prompt):
+        return self._next(self.model)
+
+    async def agenerate(self, prompt):
+        return self._next(self.model)
+
+    def stream(self, prompt):
+        yield self._next(self.model)
+
+    def list_models(self):
+        return [self.model]
+
+
+FAST = RetryPolicy(max_attempts=3, base_delay=0.001, max_delay=0.001)
+
+
+class TestCommandLLM(unittest.TestCase):
+    def setUp(self):
+        register_provider("fake", FakeLLM)
+        FakeLLM.errors, FakeLLM.calls = {}, {}
+        clear_llms()
+        reset_circuit_breakers()
+
+    def tearDown(self):
+        registry._PROVIDERS.pop("fake", None)
+        clear_llms()
+        reset_circuit_breakers()
+
+    def test_retries_transient_errors(self):
+        FakeLLM.errors["a"] = [LLMTimeoutError("slow"), LLMConnectionError("reset")]
+        llm = CommandLLM(model="a", providers=["fake"], retry=FAST)
+        self.assertEqual(llm.generate("hi"), "a: ok")
+        self.assertEqual(FakeLLM.calls["a"], 3)
+
+    def test_fails_over_without_retrying_request_errors(self):
+        FakeLLM.errors["a"] = [LLMRequestError("bad model")]
+        llm = CommandLLM(providers=[("fake", "a"), ("fake", "b")], retry=FAST)
+        self.assertEqual(llm.generate("hi"), "b: ok")
+        self.assertEqual(FakeLLM.calls, {"a": 1, "b": 1})
+
+    def test_all_providers_failed(self):
+        FakeLLM.errors["a"] = [LLMTimeoutError("slow")] * 3
+        FakeLLM.errors["b"] = [LLMRequestError("bad model")]
+        llm = CommandLLM(providers=[("fake", "a"), ("fake", "b")], retry=FAST)
+        with self.assertRaises(AllProvidersFailedError) as ctx:
+            asyncio.run(llm.agenerate("hi"))
+        self.assertEqual([type(e) for e in ctx.exception.errors], [LLMTimeoutError] * 3 + [LLMRequestError])
+
+    def test_abort_is_not_failed_over(self):
+        FakeLLM.errors["a"] = [LLMAbortedError("declined")]
+        llm = CommandLLM(providers=[("fake", "a"), ("fake", "b")], retry=FAST)
+        with self.assertRaises(LLMAbortedError):
+            llm.generate("hi")
+        self.assertNotIn("b", FakeLLM.calls)
+
+    def test_circuit_breaker_skips_failing_backend(self):
+        FakeLLM.errors["a"] = [LLMTimeoutError("slow")] * 10
+        register_provider("backup", FakeLLM)
+        self.addCleanup(registry._PROVIDERS.pop, "backup", None)
+        llm = CommandLLM(providers=[("fake", "a"), ("backup", "b")], retry=RetryPolicy(max_attempts=1),
+                         failure_threshold=2, reset_timeout=60)
+        for _ in range(4):
+            self.assertEqual(llm.generate("hi"), "b: ok")
+        # The shared breaker opened after two timeouts; later requests go straight to b
+        self.assertEqual(FakeLLM.calls["a"], 2)
+
+    def test_stream_fails_over_before_first_delta(self):
+        FakeLLM.errors["a"] = [LLMRequestError("bad model")]
+        llm = CommandLLM(providers=[("fake", "a"), ("fake", "b")], retry=FAST)
+        self.assertEqual(list(llm.stream("hi")), ["b: ok"])
+
+    def test_unknown_provider(self):
+        with self.assertRaises(ValueError):
+            CommandLLM(providers=["nope"])
+
+
+class TestResilience(unittest.TestCase):
+    def test_breaker_half_open(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(breaker.allow())   # trial request
+        self.assertFalse(breaker.allow())  # only one trial at a time
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_retry_delays(self):
+        delays = list(RetryPolicy(max_attempts=4, base_delay=1, max_delay=2).delays())
+        self.assertEqual(len(delays), 3)
+        self.assertTrue(all(0 <= d <= 2 for d in delays))
+
+    def test_provider_raises_typed_errors(self):
+        llm = OllamaLLM(base_url="http://127.0.0.1:9", timeout=1, raise_errors=True)
+        with self.assertRaises(LLMConnectionError):
+            llm.generate("hi")
+        self.assertIn("error occurred", OllamaLLM(base_url="http://127.0.0.1:9", timeout=1).generate("hi"))
+
+    def test_status_codes(self):
+        class HTTPError(Exception):
+            def __init__(self, status_code):
+                self.status_code = status_code
+        self.assertTrue(to_llm_error(HTTPError(503), "x").retryable)
+        self.assertTrue(to_llm_error(HTTPError(429), "x").retryable)
+        self.assertFalse(to_llm_error(HTTPError(404), "x").retryable)
+
+
+if __name__ == '__main__':
+    unittest.main()
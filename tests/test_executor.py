@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor, ToolRegistry
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+
+
+class SlowTool:
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.threads = set()
+
+    def run(self, input_text, context=None):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        return f"slow({input_text})"
+
+
+class AsyncSlowTool:
+    async def arun(self, input_text, context=None):
+        await asyncio.sleep(0.1)
+        return f"async({input_text})"
+
+    def run(self, input_text, context=None):
+        raise AssertionError("aexecute should use arun")
+
+
+class JoinTool:
+    def run(self, input_text, context=None):
+        return f"{input_text} | {sorted(context.items()) if isinstance(context, dict) else context}"
+
+
+class FailingTool:
+    def run(self, input_text, context=None):
+        raise RuntimeError("boom")
+
+
+def make_executor(**kwargs):
+    registry = ToolRegistry()
+    registry.register('slow', SlowTool())
+    registry.register('aslow', AsyncSlowTool())
+    registry.register('join', JoinTool())
+    registry.register('fail', FailingTool())
+    return Executor(registry, **kwargs)
+
+
+def fan_out_plan(tool='slow'):
+    return {'type': 'plan', 'actions': [
+        {'id': 'a', 'type': 'tool', 'tool': tool, 'input_text': 'x'},
+        {'id': 'b', 'type': 'tool', 'tool': tool, 'input_text': 'y'},
+        {'id': 'c', 'type': 'tool', 'tool': tool, 'input_text': 'z'},
+        {'id': 'd', 'type': 'tool', 'tool': 'join', 'input_text': '{a}+{b}', 'depends_on': ['a', 'b']},
+    ]}
+
+
+class TestPlanExecution(unittest.TestCase):
+    def test_independent_actions_run_concurrently(self):
+        executor = make_executor()
+        start = time.perf_counter()
+        result = executor.execute(fan_out_plan())
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 0.25)
+        self.assertEqual(list(result), ['a', 'b', 'c', 'd'])
+        self.assertEqual(result['c'], 'slow(z)')
+        self.assertEqual(result['d'], "slow(x)+slow(y) | [('a', 'slow(x)'), ('b', 'slow(y)')]")
+
+    def test_close_shuts_down_the_pool(self):
+        before = set(threading.enumerate())
+        with make_executor() as executor:
+            executor.execute(fan_out_plan())
+            workers = [t for t in threading.enumerate() if t not in before and t.name.startswith("agent-executor")]
+            self.assertTrue(workers)
+        for worker in workers:
+            worker.join(1)
+            self.assertFalse(worker.is_alive())
+        # A closed executor starts a new pool for the next plan
+        self.assertEqual(executor.execute(fan_out_plan())['c'], 'slow(z)')
+        executor.close()
+
+    def test_chain_runs_in_order_on_calling_thread(self):
+        executor = make_executor()
+        plan = {'actions': [
+            {'tool': 'slow', 'input_text': '1'},
+            {'tool': 'slow', 'input_text': '{1}', 'depends_on': '1'},
+        ]}
+        result = executor.execute(plan)
+        self.assertEqual(result, {'1': 'slow(1)', '2': 'slow(slow(1))'})
+        self.assertEqual(executor.tool_registry.get('slow').threads, {threading.current_thread().name})
+
+    def test_failure_skips_dependents_only(self):
+        executor = make_executor()
+        result = executor.execute({'type': 'plan', 'actions': [
+            {'id': 'bad', 'type': 'tool', 'tool': 'fail', 'input_text': ''},
+            {'id': 'after', 'type': 'tool', 'tool': 'join', 'input_text': '', 'depends_on': ['bad']},
+            {'id': 'ok', 'type': 'tool', 'tool': 'slow', 'input_text': 'fine'},
+            {'id': 'missing', 'type': 'tool', 'tool': 'nope', 'input_text': ''},
+        ]})
+        self.assertEqual(result['bad'], 'Execution error: boom')
+        self.assertEqual(result['after'], "Skipped: dependency 'bad' failed")
+        self.assertEqual(result['ok'], 'slow(fine)')
+        self.assertIn("Tool 'nope' not found", result['missing'])
+
+    def test_invalid_graphs(self):
+        executor = make_executor()
+        cycle = {'type': 'plan', 'actions': [
+            {'id': 'a', 'tool': 'slow', 'depends_on': ['b']},
+            {'id': 'b', 'tool': 'slow', 'depends_on': ['a']},
+        ]}
+        self.assertIn('Dependency cycle', executor.execute(cycle))
+        unknown = {'type': 'plan', 'actions': [{'id': 'a', 'tool': 'slow', 'depends_on': ['zz']}]}
+        self.assertIn("unknown action 'zz'", executor.execute(unknown))
+
+    def test_aexecute_plan(self):
+        executor = make_executor()
+        start = time.perf_counter()
+        result = asyncio.run(executor.aexecute(fan_out_plan('aslow')))
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertEqual(result['a'], 'async(x)')
+        self.assertTrue(result['d'].startswith('async(x)+async(y)'))
+        # Sync-only tools are run in worker threads
+        result = asyncio.run(executor.aexecute(fan_out_plan('slow')))
+        self.assertEqual(result['b'], 'slow(y)')
+
+
+class PlanLLM:
+    def __init__(self, text):
+        self.text = text
+
+    def generate(self, prompt):
+        return self.text
+
+    def stream(self, prompt):
+        for i in range(0, len(self.text), 5):
+            yield self.text[i:i + 5]
+
+
+class TestPlannerPlans(unittest.TestCase):
+    PLAN = ('```json\n{"actions": [{"id": "a", "tool": "echo", "input": "one"},'
+            ' {"id": "b", "tool": "Echo", "input": "two"},'
+            ' {"id": "c", "tool": "echo", "input": "{a} and {b}", "depends_on": ["a", "b"]}]}\n```')
+
+    def test_parse_json_plan(self):
+        plan = Planner(llm=PlanLLM(self.PLAN)).plan('q', Memory())
+        self.assertEqual(plan['type'], 'plan')
+        self.assertEqual([a['tool'] for a in plan['actions']], ['echo', 'echo', 'echo'])
+        self.assertEqual(plan['actions'][2]['depends_on'], ['a', 'b'])
+
+    def test_agent_runs_plan(self):
+        agent = Agent(Memory(), Planner(llm=PlanLLM(self.PLAN)), Executor())
+        result = agent.act('q')
+        self.assertEqual(result, {'a': 'Echo: one', 'b': 'Echo: two', 'c': 'Echo: Echo: one and Echo: two'})
+
+    def test_plan_is_not_streamed_as_text(self):
+        agent = Agent(Memory(), Planner(llm=PlanLLM(self.PLAN)), Executor())
+        deltas = list(agent.act_stream('q'))
+        self.assertEqual(len(deltas), 1)
+        self.assertIn('Echo: Echo: one and Echo: two', deltas[0])
+
+    def test_json_that_is_not_a_plan_is_text(self):
+        for text in ('{"answer": 42}', '{"actions": [broken'):
+            with self.subTest(text=text):
+                planner = Planner(llm=PlanLLM(text))
+                self.assertEqual(planner.plan('q', Memory())['type'], 'llm_response')
+                agent = Agent(Memory(), planner, Executor())
+                self.assertEqual("".join(agent.act_stream('q')), text)
+
+
+if __name__ == '__main__':
+    unittest.main()
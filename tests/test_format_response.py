@@ -0,0 +1,115 @@
+import json
+import pickle
+import unittest
+from types import SimpleNamespace
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+from agent_builder.llm_providers.openai_llm import OpenAILLM
+from agent_builder.llm_providers.raw_response import RawResponse
+from agent_builder.tools import format_response_tool
+from agent_builder.tools.format_response_tool import DeferredFormat, FormatResponseTool
+
+
+class FakeCompletion:
+    """Shaped like an OpenAI ChatCompletion; counts model_dump() calls."""
+    dumps = 0
+
+    def __init__(self, content):
+        self.id = "chatcmpl-1"
+        self.choices = [SimpleNamespace(message=SimpleNamespace(role="assistant", content=content))]
+        self.usage = SimpleNamespace(prompt_tokens=3, completion_tokens=2)
+
+    def model_dump(self):
+        FakeCompletion.dumps += 1
+        return {"id": self.id, "model": "gpt-test",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.choices[0].message.content}}],
+                "usage": {"prompt_tokens": 3, "completion_tokens": 2}}
+
+
+class FakeOpenAILLM:
+    def __init__(self):
+        self.llm = OpenAILLM(model="gpt-test", api_key="test", confirm_tokens=False)
+
+    def generate(self, prompt):
+        return self.llm._parse_response(FakeCompletion("hello there"))
+
+
+class TestRawResponse(unittest.TestCase):
+    def setUp(self):
+        FakeCompletion.dumps = 0
+
+    def test_lazy_until_accessed(self):
+        raw = RawResponse(FakeCompletion("hi"))
+        self.assertFalse(raw.materialized)
+        self.assertIn("lazy FakeCompletion", repr(raw))
+        self.assertEqual(raw["usage"]["prompt_tokens"], 3)
+        self.assertEqual(raw.get("missing"), None)
+        self.assertEqual(FakeCompletion.dumps, 1)
+        self.assertEqual(dict(raw), raw.materialize())
+        self.assertEqual(FakeCompletion.dumps, 1)
+
+    def test_pickles_as_plain_dict(self):
+        restored = pickle.loads(pickle.dumps(RawResponse(FakeCompletion("hi"))))
+        self.assertIs(type(restored), dict)
+        self.assertEqual(restored["id"], "chatcmpl-1")
+
+    def test_openai_content_without_model_dump(self):
+        result = FakeOpenAILLM().generate("q")
+        self.assertEqual(result["content"], "hello there")
+        self.assertIsInstance(result["raw"], RawResponse)
+        self.assertEqual(FakeCompletion.dumps, 0)
+
+    def test_agent_materializes_only_for_full_details(self):
+        agent = Agent(Memory(), Planner(llm=FakeOpenAILLM()), Executor())
+        self.assertIn("hello there", agent.act("q"))
+        self.assertEqual(FakeCompletion.dumps, 0)
+        details = agent.act("q", show_full_details=True)
+        self.assertEqual(FakeCompletion.dumps, 1)
+        self.assertIn("Formatted Response (Full Details):", details)
+        self.assertIn('"prompt_tokens": 3', details)
+
+
+class TestFormatResponseTool(unittest.TestCase):
+    RESPONSE = {"id": "x", "usage": {"total": 5}, "tools": [{"name": "t"}],
+                "choices": [{"index": 0, "text": "a"}, {"index": 1, "text": "b"}]}
+
+    def test_each_section_once(self):
+        text = FormatResponseTool().run(self.RESPONSE)
+        self.assertEqual(text.count('"name": "t"'), 1)
+        self.assertEqual(text.count('"text": "a"'), 1)
+        self.assertIn("Choices:\nChoice 0:", text)
+        self.assertIn('usage: {\n  "total": 5\n}', text)
+
+    def test_backends_agree(self):
+        value = {"a": [1, 2.5, None, True], "b": {"c": "d"}, "e": []}
+        self.assertEqual(format_response_tool._dumps(value), json.dumps(value, indent=2))
+        self.assertEqual(format_response_tool._dumps({"big": 2 ** 70}), json.dumps({"big": 2 ** 70}, indent=2))
+        backend = format_response_tool._orjson
+        format_response_tool._orjson = False
+        try:
+            self.assertEqual(format_response_tool._dumps(value), json.dumps(value, indent=2))
+        finally:
+            format_response_tool._orjson = backend
+
+    def test_deferred_format(self):
+        calls = []
+
+        class CountingFormatter(FormatResponseTool):
+            def run(self, input_text, context=None):
+                calls.append(input_text)
+                return super().run(input_text, context)
+
+        agent = Agent(Memory(), Planner(llm=FakeOpenAILLM()), Executor())
+        agent.formatter = CountingFormatter()
+        result = agent.act("q", defer_format=True)
+        self.assertIsInstance(result, DeferredFormat)
+        self.assertEqual(calls, [])
+        self.assertEqual(f"{result}", "Formatted Response:\n```\nhello there\n```")
+        self.assertEqual(result, "Formatted Response:\n```\nhello there\n```")
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
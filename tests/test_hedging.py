@@ -0,0 +1,107 @@
+import asyncio
+import time
+import unittest
+from agent_builder.llm_providers.errors import LLMServerError
+from agent_builder.llm_providers.hedging import HedgedLLM
+
+
+class SlowLLM:
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = False
+
+    def generate(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise LLMServerError(f"{self.name} failed")
+        return f"{self.name}: {prompt}"
+
+    async def agenerate(self, prompt):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.fail:
+            raise LLMServerError(f"{self.name} failed")
+        return f"{self.name}: {prompt}"
+
+    def stream(self, prompt):
+        self.calls += 1
+        time.sleep(self.delay)
+        yield self.name
+        yield " done"
+
+    async def astream(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        yield self.name
+        yield " done"
+
+
+class TestHedgedLLM(unittest.TestCase):
+    def test_fast_primary_is_not_hedged(self):
+        primary, replica = SlowLLM("a"), SlowLLM("b")
+        llm = HedgedLLM([primary, replica], delay=0.2)
+        self.assertEqual(llm.generate("hi"), "a: hi")
+        self.assertEqual((replica.calls, llm.stats()["hedges"]), (0, 0))
+
+    def test_labels_follow_the_primary_model(self):
+        primary = SlowLLM("a")
+        primary.model = "first"
+        llm = HedgedLLM([primary, SlowLLM("b")], delay=0.2)
+        primary.model = "second"
+        self.assertEqual((llm.provider, llm.model), ("SlowLLM", "second"))
+
+    def test_slow_primary_is_hedged(self):
+        llm = HedgedLLM([SlowLLM("a", delay=1.0), SlowLLM("b")], delay=0.05)
+        started = time.monotonic()
+        self.assertEqual(llm.generate("hi"), "b: hi")
+        self.assertLess(time.monotonic() - started, 0.5)
+        stats = llm.stats()
+        self.assertEqual((stats["hedges"], stats["hedge_wins"], stats["hedge_rate"], stats["win_rate"]), (1, 1, 1.0, 1.0))
+
+    def test_budget_caps_hedges(self):
+        replica = SlowLLM("b")
+        llm = HedgedLLM([SlowLLM("a", delay=0.1), replica], delay=0.01, budget=0.0, burst=1.0)
+        self.assertEqual(llm.generate("1"), "b: 1")
+        self.assertEqual(llm.generate("2"), "a: 2")
+        self.assertEqual((replica.calls, llm.stats()["budget_denied"]), (1, 1))
+
+    def test_failure_fails_over_without_budget(self):
+        llm = HedgedLLM([SlowLLM("a", fail=True), SlowLLM("b")], delay=5.0, budget=0.0, burst=0.0)
+        self.assertEqual(llm.generate("hi"), "b: hi")
+        self.assertEqual(llm.stats()["hedges"], 0)
+        with self.assertRaises(LLMServerError):
+            HedgedLLM([SlowLLM("a", fail=True), SlowLLM("b", fail=True)]).generate("hi")
+
+    def test_delay_tracks_latency_quantile(self):
+        llm = HedgedLLM([SlowLLM("a")], quantile=0.9, min_samples=10, initial_delay=2.0, min_delay=0.0)
+        self.assertEqual(llm.hedge_delay(), 2.0)
+        for i in range(1, 11):
+            llm._won(i / 100, hedge=False)
+        self.assertAlmostEqual(llm.hedge_delay(), 0.09)
+
+    def test_async_loser_is_cancelled(self):
+        primary, replica = SlowLLM("a", delay=1.0), SlowLLM("b")
+        llm = HedgedLLM([primary, replica], delay=0.05)
+        self.assertEqual(asyncio.run(llm.agenerate("hi")), "b: hi")
+        self.assertTrue(primary.cancelled)
+
+    def test_streams_hedge_on_first_delta(self):
+        llm = HedgedLLM([SlowLLM("a", delay=1.0), SlowLLM("b")], delay=0.05)
+        self.assertEqual("".join(llm.stream("hi")), "b done")
+
+        async def collect():
+            return "".join([delta async for delta in llm.astream("hi")])
+        self.assertEqual(asyncio.run(collect()), "b done")
+        self.assertEqual(llm.stats()["hedge_wins"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
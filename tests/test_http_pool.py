@@ -0,0 +1,42 @@
+import asyncio
+import unittest
+from agent_builder.llm_providers.http_pool import get_pool
+from agent_builder.llm_providers.ollama_llm import OllamaLLM
+from agent_builder.llm_providers.anaconda_llm import AnacondaLLM
+from tests.stub_llm_server import start_stub_server
+
+
+class TestHTTPPool(unittest.TestCase):
+    def setUp(self):
+        self.server, self.url = start_stub_server()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_pool_is_shared_per_base_url(self):
+        self.assertIs(get_pool(self.url), get_pool(self.url + "/"))
+        self.assertIsNot(get_pool(self.url), get_pool(self.url, pool_maxsize=2))
+        self.assertEqual(get_pool(self.url, gzip=False).session.headers["Accept-Encoding"], "identity")
+
+    def test_ollama_reuses_connection(self):
+        llm = OllamaLLM(base_url=self.url)
+        for i in range(5):
+            self.assertEqual(llm.generate(str(i)), f"ollama: {i}")
+        llm.list_models()
+        # Five completions and model listing all travel over one socket
+        self.assertEqual(len(self.server.peers), 1)
+
+    def test_anaconda_reuses_connection_async(self):
+        llm = AnacondaLLM(base_url=self.url)
+        self.assertEqual(llm.model, "stub-model")
+
+        async def run():
+            return [await llm.agenerate(str(i)) for i in range(3)]
+        self.assertEqual(asyncio.run(run()), ["llama: 0", "llama: 1", "llama: 2"])
+        # One socket for the sync model listing, one for the event loop
+        self.assertEqual(len(self.server.peers), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HEAVY = ['openai', 'anthropic', 'requests', 'httpx', 'dotenv', 'langchain_openai', 'langchain_anthropic', 'langchain_ollama']
+
+
+def loaded_after(code):
+    probe = f"import sys\n{code}\nprint(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    out = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, env=env, check=True)
+    return [m for m in out.stdout.strip().split(',') if m]
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_core_imports_skip_provider_sdks(self):
+        code = ("import agent_builder.agent, agent_builder.components.planner, agent_builder.components.executor\n"
+                "from agent_builder.llm_providers import CommandLLM, create_provider\n"
+                "import agent_builder.langchain_llm_wrapper")
+        self.assertEqual(loaded_after(code), [])
+
+    def test_provider_sdk_loaded_on_first_use(self):
+        loaded = loaded_after("from agent_builder.llm_providers import get_provider_class\nget_provider_class('ollama')")
+        self.assertIn('requests', loaded)
+        self.assertNotIn('openai', loaded)
+        self.assertNotIn('anthropic', loaded)
+
+    def test_lazy_attribute(self):
+        from agent_builder import llm_providers
+        from agent_builder.llm_providers.ollama_llm import OllamaLLM
+        self.assertIs(llm_providers.OllamaLLM, OllamaLLM)
+        with self.assertRaises(AttributeError):
+            llm_providers.NoSuchLLM
+
+
+if __name__ == '__main__':
+    unittest.main()
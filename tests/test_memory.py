@@ -0,0 +1,155 @@
+import random
+import threading
+import unittest
+from agent_builder.components.memory import Memory
+
+
+def reference_context(history):
+    # Rendering used by the original list-based Memory.get_context
+    lines = []
+    for h in history:
+        if "user" in h and "agent" in h:
+            lines.append(f"User: {h['user']}\nAgent: {h['agent']}")
+        else:
+            lines.append(f"Input: {h['input']}\nResult: {h['result']}")
+    return "\n".join(lines)
+
+
+class TestMemory(unittest.TestCase):
+    def test_context_matches_reference_rendering(self):
+        rng = random.Random(7)
+        for max_turns in (0, 1, 3, 10):
+            memory = Memory(max_turns=max_turns)
+            expected = []
+            for i in range(40):
+                if rng.random() < 0.5:
+                    memory.add_interaction(user=f"u{i}\nline", agent=f"a{i}")
+                    expected.append({"user": f"u{i}\nline", "agent": f"a{i}"})
+                else:
+                    memory.add_interaction(input_data=f"in{i}", result={"n": i})
+                    expected.append({"input": f"in{i}", "result": {"n": i}})
+                expected = expected[-max_turns:] if max_turns else []
+                self.assertEqual(memory.get_context(), reference_context(expected))
+                self.assertEqual(memory.get_history(), expected)
+
+    def test_malformed_entry_is_ignored(self):
+        memory = Memory()
+        memory.add_interaction(user="only user")
+        self.assertEqual(memory.get_history(), [])
+        self.assertEqual(memory.get_context(), "")
+
+    def test_reset_and_resize(self):
+        memory = Memory(max_turns=5)
+        for i in range(5):
+            memory.add_interaction(input_data=i, result=i)
+        memory.max_turns = 2
+        self.assertEqual(memory.get_context(), "Input: 3\nResult: 3\nInput: 4\nResult: 4")
+        memory.reset()
+        self.assertEqual(memory.get_context(), "")
+        memory.add_interaction(input_data="x", result="y")
+        self.assertEqual(memory.get_context(), "Input: x\nResult: y")
+
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.prompts = []
+        self.release = threading.Event()
+        self.release.set()
+    def generate(self, prompt):
+        self.release.wait(5)
+        self.prompts.append(prompt)
+        return f"summary#{len(self.prompts)}"
+
+
+class TestTokenBudget(unittest.TestCase):
+    def test_history_stays_list_compatible(self):
+        memory = Memory(max_turns=3)
+        memory.history = [{'user': 'hi', 'agent': 'hello'}, {'input': 'q', 'result': 'r'}]
+        self.assertEqual(memory.get_context(), "User: hi\nAgent: hello\nInput: q\nResult: r")
+        memory.history.append({'input': 'q2', 'result': 'r2'})
+        self.assertEqual(len(memory.history), 3)
+        self.assertTrue(memory.get_context().endswith("Input: q2\nResult: r2"))
+        memory.history.pop(0)
+        self.assertEqual(memory.history, [{'input': 'q', 'result': 'r'}, {'input': 'q2', 'result': 'r2'}])
+        self.assertEqual(memory.get_context(), "Input: q\nResult: r\nInput: q2\nResult: r2")
+        memory.history = [{'input': str(i), 'result': i} for i in range(5)]
+        self.assertEqual(memory.history[-1], {'input': '4', 'result': 4})
+        self.assertEqual(len(memory.get_history()), 3)
+
+    def test_budget_keeps_newest_turns(self):
+        memory = Memory(max_turns=100, token_budget=8, tokenizer=lambda text: len(text.split()))
+        for i in range(5):
+            memory.add_interaction(input_data=f"q{i}", result=f"a{i}")
+        # Each turn renders to four whitespace tokens
+        self.assertEqual([h['input'] for h in memory.get_history()], ["q3", "q4"])
+        memory.add_interaction(input_data="huge", result="word " * 50)
+        self.assertEqual(memory.get_history(), [])
+        self.assertEqual(memory.get_context(), "")
+
+    def test_evicted_turns_are_summarized_in_background(self):
+        summarizer = RecordingSummarizer()
+        summarizer.release.clear()
+        memory = Memory(max_turns=2, summarizer=summarizer)
+        for i in range(4):
+            memory.add_interaction(input_data=f"q{i}", result=f"a{i}")
+        # add_interaction returned while the summarizer is still blocked
+        self.assertEqual(memory.summary, "")
+        self.assertEqual(memory.get_context(), "Input: q2\nResult: a2\nInput: q3\nResult: a3")
+        summarizer.release.set()
+        memory.wait_for_compaction(timeout=5)
+        self.assertIn("Input: q0", summarizer.prompts[0])
+        self.assertTrue(memory.get_context().startswith("Summary of earlier conversation: summary#"))
+        self.assertTrue(memory.get_context().endswith("Input: q3\nResult: a3"))
+
+    def test_reset_discards_running_compaction(self):
+        class StartedSummarizer(RecordingSummarizer):
+            started = threading.Event()
+
+            def generate(self, prompt):
+                self.started.set()
+                return super().generate(prompt)
+
+        summarizer = StartedSummarizer()
+        summarizer.release.clear()
+        memory = Memory(max_turns=1, summarizer=summarizer)
+        memory.add_interaction(input_data="secret", result="a")
+        memory.add_interaction(input_data="q", result="b")
+        self.assertTrue(summarizer.started.wait(5))
+        memory.reset()
+        summarizer.release.set()
+        memory.wait_for_compaction(timeout=5)
+        self.assertIn("Input: secret", summarizer.prompts[0])
+        self.assertEqual((memory.summary, memory.get_context()), ("", ""))
+
+    def test_failed_summary_keeps_pending_turns(self):
+        class FailingSummarizer:
+            def generate(self, prompt):
+                return "An error occurred with Ollama: boom"
+        memory = Memory(max_turns=1, summarizer=FailingSummarizer())
+        memory.add_interaction(input_data="a", result="b")
+        memory.add_interaction(input_data="c", result="d")
+        memory.wait_for_compaction(timeout=5)
+        self.assertEqual(memory.summary, "")
+        self.assertEqual(len(memory._pending), 1)
+
+    def test_failing_summarizer_backlog_is_capped(self):
+        class FailingSummarizer:
+            def __init__(self):
+                self.prompts = []
+
+            def generate(self, prompt):
+                self.prompts.append(prompt)
+                return "An error occurred with Ollama: boom"
+        summarizer = FailingSummarizer()
+        memory = Memory(max_turns=1, summarizer=summarizer, max_pending=3)
+        with self.assertLogs(level="WARNING"):
+            for i in range(8):
+                memory.add_interaction(input_data=f"q{i}", result=f"a{i}")
+                memory.wait_for_compaction(timeout=5)
+        self.assertEqual([turn.first for turn in memory._pending], ["q4", "q5", "q6"])
+        self.assertEqual(memory.dropped_turns, 4)
+        self.assertLessEqual(max(prompt.count("Input: ") for prompt in summarizer.prompts), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
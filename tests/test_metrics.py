@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+from agent_builder import metrics
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+from agent_builder.llm_providers.anaconda_llm import AnacondaLLM
+from agent_builder.llm_providers.cached_llm import CachedLLM
+from tests.stub_llm_server import start_stub_server
+
+
+class MockLLM:
+    provider = "mock"
+    model = "m1"
+
+    def generate(self, prompt):
+        return "echo: hi"
+
+
+class FailingLLM(MockLLM):
+    def generate(self, prompt):
+        raise TimeoutError("slow")
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.clear()
+
+    def test_histogram_render(self):
+        registry = metrics.MetricsRegistry()
+        h = registry.histogram("demo_seconds", "Demo", ("stage",), buckets=(0.1, 1))
+        for value in (0.05, 0.5, 5):
+            h.observe(value, stage="a")
+        registry.counter("demo_total", "Demo", ("kind",)).inc(2, kind='say "hi"')
+        text = registry.render()
+        self.assertIn('demo_seconds_bucket{stage="a",le="0.1"} 1', text)
+        self.assertIn('demo_seconds_bucket{stage="a",le="1"} 2', text)
+        self.assertIn('demo_seconds_bucket{stage="a",le="+Inf"} 3', text)
+        self.assertIn('demo_seconds_count{stage="a"} 3', text)
+        self.assertIn('demo_total{kind="say \\"hi\\""} 2', text)
+        self.assertIn("# TYPE demo_seconds histogram", text)
+        with self.assertRaises(ValueError):
+            registry.counter("demo_seconds", "Clash")
+
+    def test_agent_stages_and_llm_latency(self):
+        agent = Agent(Memory(), Planner(llm=CachedLLM(MockLLM())), Executor())
+        agent.act("hi")
+        agent.act("hi")
+        for stage in ("act", "plan", "execute", "memory", "format"):
+            self.assertEqual(metrics.STAGE_SECONDS.count(stage=stage), 2)
+        self.assertEqual(metrics.LLM_REQUEST_SECONDS.count(provider="mock", model="m1"), 2)
+        self.assertEqual(metrics.CACHE_LOOKUPS.value(result="hit"), 1)
+        self.assertEqual(metrics.CACHE_LOOKUPS.value(result="miss"), 1)
+
+    def test_errors_counted(self):
+        Agent(Memory(), Planner(llm=FailingLLM()), Executor()).act("hi")
+        self.assertEqual(metrics.LLM_ERRORS.value(provider="mock", model="m1", type="TimeoutError"), 1)
+
+    def test_provider_usage(self):
+        server, url = start_stub_server()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        llm = AnacondaLLM(model="stub-model", base_url=url)
+        llm.generate("hi")
+        self.assertEqual(metrics.LLM_TOKENS.value(provider="anaconda", model="stub-model", direction="in"), 1)
+        self.assertEqual(metrics.LLM_TOKENS.value(provider="anaconda", model="stub-model", direction="out"), 3)
+
+    def test_disabled(self):
+        metrics.set_enabled(False)
+        self.addCleanup(metrics.set_enabled, True)
+        metrics.STAGE_SECONDS.observe(1, stage="x")
+        self.assertEqual(metrics.STAGE_SECONDS.count(stage="x"), 0)
+
+    def test_exporters(self):
+        metrics.STAGE_SECONDS.observe(0.2, stage="plan")
+        server = metrics.start_http_server(port=0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            self.assertIn("text/plain", response.headers["Content-Type"])
+            self.assertIn('agent_stage_seconds_count{stage="plan"} 1', response.read().decode())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "agent.prom")
+            metrics.write_metrics(path)
+            with open(path) as f:
+                self.assertIn("agent_stage_seconds_sum", f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import CONVERSATION_TEMPLATE, OllamaPlanner, Planner, reuses_prefix
+from agent_builder.llm_providers.anaconda_llm import AnacondaLLM
+from agent_builder.llm_providers.anthropic_llm import AnthropicLLM
+from agent_builder.llm_providers.ollama_llm import OllamaLLM
+from agent_builder.llm_providers.sessions import PromptSessions, SessionPrompt, SlotTable
+from tests.stub_llm_server import start_stub_server
+
+
+class TestPromptSessions(unittest.TestCase):
+    def test_split_detects_appended_prompts(self):
+        sessions = PromptSessions()
+        first = SessionPrompt("\nUser: hi\n", "s")
+        self.assertEqual(sessions.split(first), ("", "\nUser: hi\n", None))
+        sessions.update(first, "state")
+        second = SessionPrompt("User: hi\nAgent: hello\nUser: bye\n", "s")
+        self.assertEqual(sessions.split(second), ("User: hi\n", "Agent: hello\nUser: bye\n", "state"))
+        # A prompt that does not extend the previous one is sent in full
+        self.assertEqual(sessions.split(SessionPrompt("User: other\n", "s"))[2], None)
+        self.assertEqual(sessions.split(SessionPrompt("User: hi\n", "s"))[2], None)
+        self.assertEqual(sessions.split("User: hi\nmore")[2], None)
+
+    def test_least_recent_sessions_are_forgotten(self):
+        sessions = PromptSessions(max_sessions=2)
+        for session in "abc":
+            sessions.update(SessionPrompt("x", session), session)
+        self.assertIsNone(sessions.split(SessionPrompt("xy", "a"))[2])
+        self.assertEqual(sessions.split(SessionPrompt("xy", "c"))[2], "c")
+
+    def test_slot_table_pins_sessions(self):
+        slots = SlotTable(2)
+        self.assertEqual([slots.slot("a"), slots.slot("b"), slots.slot("a")], [0, 1, 0])
+        # b is the least recently used, so c takes its slot
+        self.assertEqual(slots.slot("c"), 1)
+        self.assertIsNone(slots.slot(None))
+        self.assertIsNone(SlotTable(0).slot("a"))
+
+
+class TestProviderPrefixReuse(unittest.TestCase):
+    def setUp(self):
+        self.server, self.url = start_stub_server()
+
+    def tearDown(self):
+        self.server.shutdown()
+
+    def generate_bodies(self, path):
+        return [body for request_path, body in self.server.requests if request_path == path]
+
+    def test_ollama_sends_context_and_new_text_only(self):
+        planner = Planner(OllamaLLM(model="llama2", base_url=self.url), CONVERSATION_TEMPLATE)
+        memory = Memory()
+        agent = Agent(memory, planner, Executor())
+        agent.act("first question", format_response=False)
+        second_prompt = planner._render_prompt("second question", memory)
+        agent.act("second question", format_response=False)
+        first, second = self.generate_bodies("/api/generate")
+        self.assertNotIn("context", first)
+        self.assertEqual(second["context"], [len(first["prompt"])])
+        # The context covers the first prompt and its reply: only the new input is sent
+        reply = f"ollama: {first['prompt']}".strip()
+        self.assertEqual(first["prompt"].lstrip() + reply + second["prompt"], second_prompt.lstrip())
+        self.assertEqual(second["prompt"], "\nInput: second question\nResult: ")
+
+        # A reset conversation no longer extends the previous prompt
+        memory.reset()
+        agent.act("again", format_response=False)
+        self.assertNotIn("context", self.generate_bodies("/api/generate")[-1])
+
+    def test_ollama_streaming_keeps_context(self):
+        planner = Planner(OllamaLLM(model="llama2", base_url=self.url), CONVERSATION_TEMPLATE)
+        agent = Agent(Memory(), planner, Executor())
+        "".join(agent.act_stream("first"))
+        "".join(agent.act_stream("second"))
+        self.assertIn("context", self.generate_bodies("/api/generate")[-1])
+
+    def test_only_conversation_templates_are_tagged(self):
+        self.assertTrue(reuses_prefix(CONVERSATION_TEMPLATE))
+        self.assertTrue(reuses_prefix("You are terse.\n" + CONVERSATION_TEMPLATE))
+        self.assertFalse(reuses_prefix("User: {input}\n"))
+        self.assertFalse(reuses_prefix("{memory}\nUser: {input}\n"))
+        planner = Planner(OllamaLLM(model="llama2", base_url=self.url), "User: {input}\n")
+        self.assertNotIsInstance(planner._render_prompt("hi", Memory()), SessionPrompt)
+        # Provider planners opt in through their prompt_template
+        self.assertNotIsInstance(OllamaPlanner()._render_prompt("hi", Memory()), SessionPrompt)
+        planner = OllamaPlanner(prompt_template=CONVERSATION_TEMPLATE)
+        self.assertIsInstance(planner._render_prompt("hi", Memory()), SessionPrompt)
+
+    def test_ollama_without_sessions_or_reuse(self):
+        llm = OllamaLLM(model="llama2", base_url=self.url, reuse_context=False)
+        agent = Agent(Memory(), Planner(llm, CONVERSATION_TEMPLATE), Executor())
+        agent.act("first", format_response=False)
+        agent.act("second", format_response=False)
+        OllamaLLM(model="llama2", base_url=self.url).generate("plain prompt")
+        self.assertTrue(all("context" not in body for body in self.generate_bodies("/api/generate")))
+
+    def test_llama_cpp_caches_prompt_and_pins_slots(self):
+        llm = AnacondaLLM(model="stub-model", base_url=self.url, slots=2)
+        llm.generate(SessionPrompt("hello", "a"))
+        llm.generate(SessionPrompt("hello", "b"))
+        llm.generate(SessionPrompt("hello again", "a"))
+        llm.generate("no session")
+        bodies = self.generate_bodies("/completion")
+        self.assertTrue(all(body["cache_prompt"] for body in bodies))
+        self.assertEqual([body.get("id_slot") for body in bodies], [0, 1, 0, None])
+
+
+class TestAnthropicCacheBlocks(unittest.TestCase):
+    def test_conversation_is_sent_as_cached_blocks(self):
+        llm = AnthropicLLM(model="claude-test", api_key="test-key", confirm_tokens=False)
+        first = SessionPrompt("\nUser: hi\n", "s")
+        messages, blocks = llm._messages(first)
+        self.assertEqual(messages[0]["content"], [{"type": "text", "text": "User: hi\n", "cache_control": {"type": "ephemeral"}}])
+        llm._remember(first, blocks)
+        messages, _ = llm._messages(SessionPrompt("User: hi\nAgent: hello\nUser: bye\n", "s"))
+        self.assertEqual(messages[0]["content"], [
+            {"type": "text", "text": "User: hi\n"},
+            {"type": "text", "text": "Agent: hello\nUser: bye\n", "cache_control": {"type": "ephemeral"}},
+        ])
+        self.assertEqual(llm._messages("plain")[0], [{"role": "user", "content": "plain"}])
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+from agent_builder.llm_providers.rate_limit import (
+    BULK, INTERACTIVE, RateLimitedLLM, RateLimiter, TokenBucket, priority, request_priority,
+)
+
+
+class CountingLLM:
+    provider = "counting"
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        return f"echo: {prompt}"
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_wait_time(self):
+        bucket = TokenBucket(60)  # one per second, burst of 60
+        now = bucket.updated
+        self.assertEqual(bucket.wait_time(60, now), 0.0)
+        bucket.take(60)
+        self.assertAlmostEqual(bucket.wait_time(2, now), 2.0)
+        # Requests larger than the bucket wait for a full bucket instead of forever
+        self.assertAlmostEqual(bucket.wait_time(1000, now), 60.0)
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_requests_per_minute(self):
+        limiter = RateLimiter(rpm=600)  # burst of 600, then one per 0.1s
+        limiter.requests.tokens = 1
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+        self.assertEqual(limiter.admitted, 3)
+
+    def test_tokens_per_minute(self):
+        limiter = RateLimiter(tpm=6000)  # 100 tokens per second
+        limiter.tokens.tokens = 0
+        self.assertGreaterEqual(limiter.acquire(10), 0.08)
+
+    def test_interactive_overtakes_bulk(self):
+        limiter = RateLimiter(rpm=1200)  # one per 50ms once the burst is spent
+        limiter.requests.tokens = 0
+        order = []
+
+        def call(name, level):
+            with priority(level):
+                limiter.acquire()
+            order.append(name)
+
+        bulk = [threading.Thread(target=call, args=(f"bulk{i}", BULK)) for i in range(3)]
+        for t in bulk:
+            t.start()
+        while limiter.queued() < 3:
+            time.sleep(0.001)
+        interactive = threading.Thread(target=call, args=("interactive", INTERACTIVE))
+        interactive.start()
+        for t in bulk + [interactive]:
+            t.join()
+        self.assertLessEqual(order.index("interactive"), 1)
+
+    def test_async_acquire_and_cancel(self):
+        limiter = RateLimiter(rpm=600)
+        limiter.requests.tokens = 0
+
+        async def run():
+            blocked = asyncio.ensure_future(limiter.aacquire())
+            await asyncio.sleep(0.01)
+            blocked.cancel()
+            await asyncio.gather(blocked, return_exceptions=True)
+            self.assertEqual(limiter.queued(), 0)
+            return await limiter.aacquire()
+        self.assertGreater(asyncio.run(run()), 0)
+
+
+class TestRateLimitedLLM(unittest.TestCase):
+    def test_charges_prompt_tokens(self):
+        llm = RateLimitedLLM(CountingLLM(), tpm=600, completion_tokens=5, limiter=RateLimiter(tpm=600))
+        cost = llm._cost("hello world")
+        self.assertGreater(cost, 5)
+        self.assertEqual(llm.generate("hello world"), "echo: hello world")
+        self.assertAlmostEqual(llm.limiter.tokens.tokens, 600 - cost, delta=1)
+
+    def test_default_priority(self):
+        self.assertEqual(request_priority.get(), INTERACTIVE)
+        with priority(BULK):
+            self.assertEqual(request_priority.get(), BULK)
+        self.assertEqual(request_priority.get(), INTERACTIVE)
+
+    def test_bulk_priority_reaches_sync_llms_in_aact_many(self):
+        seen = []
+
+        class PriorityLLM:
+            def generate(self, prompt):
+                # No agenerate: run in a worker thread by run_sync
+                seen.append(request_priority.get())
+                return "ok"
+
+        agent = Agent(Memory(), Planner(llm=PriorityLLM()), Executor())
+
+        async def run():
+            return [result async for result in agent.aact_many(["a", "b"], concurrency=2)]
+
+        self.assertEqual(asyncio.run(run()), ["ok", "ok"])
+        self.assertEqual(seen, [BULK, BULK])
+
+
+if __name__ == '__main__':
+    unittest.main()
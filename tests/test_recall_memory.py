@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import unittest
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from agent_builder.components.planner import Planner
+from agent_builder.components.recall_memory import HashingEmbedder, OllamaEmbedder, RecallMemory, VectorIndex
+from agent_builder.llm_providers.errors import LLMError
+from tests.stub_llm_server import start_stub_server
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.batches = []
+
+    def embed(self, texts):
+        self.batches.append(len(texts))
+        return super().embed(texts)
+
+
+class BlockingEmbedder(HashingEmbedder):
+    def __init__(self):
+        super().__init__()
+        self.started, self.release = threading.Event(), threading.Event()
+
+    def embed(self, texts):
+        self.started.set()
+        self.release.wait(5)
+        return super().embed(texts)
+
+
+class FailingEmbedder:
+    def embed(self, texts):
+        raise LLMError("embedding server down")
+
+
+class PromptLLM:
+    def generate(self, prompt):
+        return prompt
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class TestVectorIndex(unittest.TestCase):
+    def test_top_k_matches_exact_ranking(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((3000, 32)).astype(np.float32)
+        index = VectorIndex(capacity=16)
+        for chunk in np.array_split(vectors, 7):
+            index.add(chunk)
+        self.assertEqual(len(index), 3000)
+        query = rng.standard_normal(32)
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = list(np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5])
+        hits = index.search(query, 5)
+        self.assertEqual([row for row, _ in hits], expected)
+        self.assertTrue(all(a[1] >= b[1] for a, b in zip(hits, hits[1:])))
+
+    def test_limit_and_dimension_checks(self):
+        index = VectorIndex()
+        index.add(np.eye(3))
+        self.assertEqual([row for row, _ in index.search([0, 0, 1], 3, limit=2)], [0, 1])
+        self.assertEqual(index.search([1, 0, 0], 1, limit=0), [])
+        with self.assertRaises(ValueError):
+            index.add([1.0, 2.0])
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class TestRecallMemory(unittest.TestCase):
+    def fill(self, memory):
+        memory.add_interaction(user="My dog is called Rex", agent="Nice name!")
+        for i in range(20):
+            memory.add_interaction(user=f"Forecast for day {i}?", agent="Sunny and warm")
+
+    def test_recalls_relevant_turn_outside_window(self):
+        memory = RecallMemory(max_turns=2, top_k=1)
+        self.fill(memory)
+        context = memory.get_context(query="What is my dog called?")
+        self.assertTrue(context.startswith("Relevant earlier conversation:\nUser: My dog is called Rex"))
+        self.assertTrue(context.endswith(memory.get_context()))
+        (entry, score), = memory.recall("dog called")
+        self.assertEqual(entry, {"user": "My dog is called Rex", "agent": "Nice name!"})
+        self.assertGreater(score, 0.2)
+
+    def test_window_turns_are_not_recalled(self):
+        memory = RecallMemory(max_turns=5)
+        memory.add_interaction(user="My dog is called Rex", agent="Nice name!")
+        self.assertEqual(memory.get_context(query="dog"), "User: My dog is called Rex\nAgent: Nice name!")
+
+    def test_turns_are_embedded_once_in_batches(self):
+        embedder = CountingEmbedder()
+        memory = RecallMemory(embedder, max_turns=2)
+        self.fill(memory)
+        memory.get_context(query="dog")
+        memory.add_interaction(user="one more", agent="ok")
+        memory.get_context(query="dog")
+        self.assertEqual(embedder.batches, [22, 2])
+
+    def test_embedder_failure_falls_back_to_recent_turns(self):
+        memory = RecallMemory(FailingEmbedder(), max_turns=2)
+        self.fill(memory)
+        with self.assertLogs(level="ERROR"):
+            self.assertEqual(memory.get_context(query="dog"), memory.get_context())
+
+    def test_planner_passes_input_as_query(self):
+        memory = RecallMemory(max_turns=1, top_k=1)
+        self.fill(memory)
+        plan = Planner(PromptLLM(), prompt_template="{memory}\n{input}").plan("dog name?", memory)
+        self.assertIn("My dog is called Rex", plan["content"])
+
+    def test_async_planner_embeds_off_the_event_loop(self):
+        threads = []
+
+        class ThreadEmbedder(HashingEmbedder):
+            def embed(self, texts):
+                threads.append(threading.current_thread())
+                return super().embed(texts)
+
+        memory = RecallMemory(ThreadEmbedder(), max_turns=1, top_k=1)
+        self.fill(memory)
+        plan = asyncio.run(Planner(PromptLLM(), prompt_template="{memory}\n{input}").aplan("dog name?", memory))
+        self.assertIn("My dog is called Rex", plan["content"])
+        self.assertNotIn(threading.main_thread(), threads)
+
+    def test_slow_embedder_does_not_block_new_turns(self):
+        embedder = BlockingEmbedder()
+        memory = RecallMemory(embedder, max_turns=2, top_k=1)
+        self.fill(memory)
+        search = threading.Thread(target=memory.get_context, kwargs={"query": "dog"})
+        search.start()
+        self.assertTrue(embedder.started.wait(5))
+        added = threading.Thread(target=memory.add_interaction, kwargs={"user": "late", "agent": "ok"})
+        added.start()
+        added.join(1)
+        self.assertFalse(added.is_alive())
+        embedder.release.set()
+        search.join(5)
+        # The turn added during the search is indexed by the next one
+        self.assertEqual(len(memory.index), 21)
+        self.assertIn("My dog is called Rex", memory.get_context(query="dog"))
+        self.assertEqual(len(memory.index), 22)
+
+    def test_reset(self):
+        memory = RecallMemory(max_turns=1)
+        self.fill(memory)
+        memory.get_context(query="dog")
+        memory.reset()
+        self.assertEqual((memory.get_context(query="dog"), len(memory.index)), ("", 0))
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class TestOllamaEmbedder(unittest.TestCase):
+    def test_embeds_through_api(self):
+        server, url = start_stub_server()
+        try:
+            vectors = OllamaEmbedder(base_url=url).embed(["ab", "abcd"])
+            self.assertEqual(vectors.tolist(), [[2.0, 1.0], [4.0, 1.0]])
+            self.assertEqual(server.requests[-1], ("/api/embed", {"model": "nomic-embed-text", "input": ["ab", "abcd"]}))
+        finally:
+            server.shutdown()
@@ -0,0 +1,99 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+from agent_builder.components.planner import AnacondaPlanner, OllamaPlanner
+from agent_builder.llm_providers import cached_list_models, clear_llms, get_llm, register_provider
+from agent_builder.llm_providers.registry import _PROVIDERS
+from agent_builder.llm_providers.anaconda_llm import AnacondaLLM
+from agent_builder.llm_providers.ollama_llm import OllamaLLM
+from tests.stub_llm_server import start_stub_server
+
+
+class TestProviderRegistry(unittest.TestCase):
+    def setUp(self):
+        self.server, self.url = start_stub_server()
+        clear_llms()
+
+    def tearDown(self):
+        clear_llms()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_construction_is_offline(self):
+        llm = AnacondaLLM(base_url=self.url)
+        OllamaLLM(base_url=self.url)
+        self.assertEqual(self.server.gets, [])
+        # The default model is resolved on first use
+        self.assertEqual(llm.model, "stub-model")
+        self.assertEqual(self.server.gets, ["/models"])
+
+    def test_shared_instances(self):
+        llm = get_llm("ollama", model="llama2", base_url=self.url)
+        self.assertIs(get_llm("OLLAMA", model="llama2", base_url=self.url + "/"), llm)
+        self.assertIsNot(get_llm("ollama", model="mistral", base_url=self.url), llm)
+
+    def test_anthropic_instances_use_their_base_url(self):
+        first = get_llm("anthropic", model="claude-test", base_url="http://first.local/v1", api_key="k")
+        second = get_llm("anthropic", model="claude-test", base_url="http://second.local", api_key="k")
+        self.assertEqual(str(first.client.base_url), "http://first.local")
+        self.assertEqual(str(second.client.base_url), "http://second.local")
+
+        async def async_base_url():
+            return str(second.async_client.base_url)
+        self.assertEqual(asyncio.run(async_base_url()), "http://second.local")
+
+    def test_slow_constructor_blocks_only_its_key(self):
+        class SlowLLM:
+            created = 0
+
+            def __init__(self, model=None, base_url=None):
+                SlowLLM.created += 1
+                time.sleep(0.3)
+        register_provider("slow", SlowLLM)
+        self.addCleanup(_PROVIDERS.pop, "slow", None)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_llm("slow"))) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        get_llm("ollama", model="llama2", base_url=self.url)
+        self.assertLess(time.monotonic() - started, 0.2)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(SlowLLM.created, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_planners_share_provider(self):
+        with mock.patch.dict("os.environ", {"OLLAMA_BASE_URL": self.url, "ANACONDA_BASE_URL": self.url}):
+            first, second = OllamaPlanner(model="llama2"), OllamaPlanner(model="llama2")
+            AnacondaPlanner()
+        self.assertIs(first.llm, second.llm)
+        self.assertEqual(self.server.gets, [])
+
+    def test_model_list_is_cached(self):
+        llm = get_llm("anaconda", base_url=self.url)
+        self.assertEqual(cached_list_models(llm), ["stub-model"])
+        self.assertEqual(cached_list_models(llm), ["stub-model"])
+        self.assertEqual(llm.model, "stub-model")
+        self.assertEqual(self.server.gets, ["/models"])
+        cached_list_models(llm, refresh=True)
+        self.assertEqual(cached_list_models(llm, ttl=0), ["stub-model"])
+        self.assertEqual(self.server.gets, ["/models"] * 3)
+
+    def test_health_checks(self):
+        llm = OllamaLLM(base_url=self.url)
+        llm.check_health()
+        llm.check_health()  # remembered for the TTL
+        self.assertEqual(self.server.gets, ["/"])
+        background = OllamaLLM(base_url=self.url)
+        background.health.check_in_background().join()
+        self.assertTrue(background.health.healthy)
+        with self.assertRaises(RuntimeError):
+            OllamaLLM(base_url="http://127.0.0.1:9", timeout=1, health_check="eager")
+
+
+if __name__ == '__main__':
+    unittest.main()
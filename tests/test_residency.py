@@ -0,0 +1,95 @@
+import asyncio
+import time
+import unittest
+from agent_builder.llm_providers.ollama_llm import OllamaLLM
+from agent_builder.llm_providers.residency import ModelResidency, get_residency, model_key, reset_residency
+from tests.stub_llm_server import start_stub_server
+
+
+class TestModelResidency(unittest.TestCase):
+    def setUp(self):
+        self.server, self.url = start_stub_server()
+
+    def tearDown(self):
+        self.server.shutdown()
+        reset_residency()
+
+    def generate_bodies(self):
+        return [body for path, body in self.server.requests if path == "/api/generate"]
+
+    def test_preload_sends_empty_generate_with_keep_alive(self):
+        residency = ModelResidency(self.url, models=["llama2"])
+        self.assertFalse(residency.is_loaded("llama2"))
+        self.assertEqual(residency.preload(), {"llama2": True})
+        self.assertEqual(self.generate_bodies(), [{"model": "llama2", "keep_alive": -1}])
+        self.assertTrue(residency.is_loaded("llama2:latest"))
+        # Already loaded: nothing to do
+        residency.preload()
+        self.assertEqual(len(self.generate_bodies()), 1)
+
+    def test_background_preload(self):
+        residency = ModelResidency(self.url, models=["llama2"])
+        residency.preload_in_background().join(5)
+        self.assertIn("llama2:latest", self.server.loaded)
+
+    def test_load_state_comes_from_ps(self):
+        self.server.loaded.add("mistral:latest")
+        residency = ModelResidency(self.url)
+        self.assertTrue(residency.is_loaded("mistral"))
+        self.assertEqual(residency.loaded(), ["mistral:latest"])
+        self.assertEqual(self.server.gets.count("/api/ps"), 1)
+        residency.release("mistral")
+        self.assertFalse(residency.is_loaded("mistral"))
+
+    def test_pinned_models_carry_keep_alive(self):
+        residency = get_residency(self.url, models=["llama2"], keep_alive="1h")
+        OllamaLLM(model="llama2", base_url=self.url).generate("hi")
+        OllamaLLM(model="mistral", base_url=self.url, keep_alive="10m").generate("hi")
+        OllamaLLM(model="phi", base_url=self.url).generate("hi")
+        bodies = self.generate_bodies()
+        self.assertEqual([body.get("keep_alive") for body in bodies], ["1h", "10m", None])
+        self.assertTrue(residency.is_loaded("phi"))
+
+    def test_cold_request_is_warned_about(self):
+        get_residency(self.url)
+        llm = OllamaLLM(model="llama2", base_url=self.url)
+        with self.assertLogs(level="WARNING") as logs:
+            llm.generate("first")
+        self.assertIn("llama2 is not loaded", logs.output[0])
+        # The completed request shows the model is loaded now
+        with self.assertNoLogs(level="WARNING"):
+            llm.generate("second")
+
+    def test_cold_request_is_routed_to_loaded_fallback(self):
+        self.server.loaded.add("small:latest")
+        residency = get_residency(self.url, fallbacks=["small"], on_cold="route")
+        llm = OllamaLLM(model="big", base_url=self.url)
+        self.assertEqual(llm.generate("hi"), "ollama: hi")
+        routed = [body for body in self.generate_bodies() if "prompt" in body]
+        self.assertEqual(routed[0]["model"], "small")
+        # Meanwhile the requested model is loaded in the background
+        for _ in range(100):
+            if residency.is_loaded("big"):
+                break
+            time.sleep(0.01)
+        asyncio.run(llm.agenerate("again"))
+        self.assertEqual(self.generate_bodies()[-1]["model"], "big")
+
+    def test_model_key(self):
+        self.assertEqual(model_key("llama2"), "llama2:latest")
+        self.assertEqual(model_key("llama3:8b"), "llama3:8b")
+        self.assertEqual(model_key("registry.local:5000/llama2"), "registry.local:5000/llama2:latest")
+
+
+class TestListModels(unittest.TestCase):
+    def test_running_models_come_from_ps(self):
+        server, url = start_stub_server()
+        try:
+            server.loaded.add("llama2")
+            self.assertEqual(OllamaLLM(base_url=url).list_models(), ["llama2 (Running)"])
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
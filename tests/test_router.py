@@ -0,0 +1,130 @@
+import asyncio
+import timeit
+import unittest
+from agent_builder import metrics
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor, ToolRegistry
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+from agent_builder.components.router import Router
+from agent_builder.tools.echo_tool import EchoTool
+
+
+class CountingLLM:
+    def __init__(self, reply="llm reply"):
+        self.reply = reply
+        self.calls = 0
+
+    def generate(self, prompt):
+        self.calls += 1
+        return self.reply
+
+    async def agenerate(self, prompt):
+        return self.generate(prompt)
+
+    def stream(self, prompt):
+        yield self.generate(prompt)
+
+
+class UpperTool:
+    route_patterns = (r'shout\s+(?P<input>.+)',)
+
+    def run(self, input_text, context=None):
+        return input_text.upper()
+
+
+class SecretTool:
+    routable = False
+
+    def run(self, input_text, context=None):
+        return "secret"
+
+
+class TestRouter(unittest.TestCase):
+    def setUp(self):
+        self.registry = ToolRegistry()
+        self.registry.register('echo', EchoTool())
+        self.registry.register('upper', UpperTool())
+        self.registry.register('secret', SecretTool())
+        self.router = Router(self.registry)
+
+    def test_prefix_and_patterns(self):
+        self.assertEqual(self.router.route('  Echo:  hi there '),
+                         {'type': 'tool', 'tool': 'echo', 'input_text': 'hi there', 'context': None})
+        self.assertEqual(self.router.route('echo "quoted text"')['input_text'], 'quoted text')
+        self.assertEqual(self.router.route('shout hello')['tool'], 'upper')
+        self.assertEqual(self.router.route('upper: multi\nline')['input_text'], 'multi\nline')
+
+    def test_non_commands_are_not_routed(self):
+        for text in ('hello world', 'echo chamber effects', 'Note: fine', 'secret: x', '', 'echoes: x', 42):
+            with self.subTest(text=text):
+                self.assertIsNone(self.router.route(text))
+
+    def test_llm_tool_calls_include_non_routable_tools(self):
+        self.assertEqual(self.router.match_tool_call('Secret: x')['tool'], 'secret')
+        self.assertIsNone(self.router.match_tool_call('unknown: x'))
+
+    def test_rules_follow_registry_changes(self):
+        self.assertIsNone(self.router.route('later: x'))
+        self.registry.register('later', UpperTool())
+        self.assertEqual(self.router.route('later: x')['tool'], 'later')
+        self.router.add_rule('echo', r'say (?P<input>.+)')
+        self.assertEqual(self.router.route('say hi')['tool'], 'echo')
+        self.router.add_rule('upper', r'(?:loud|LOUD)!(?P<input>.*)')
+        self.assertEqual(self.router.route('loud!x')['input_text'], 'x')
+        self.assertIn('later', self.router.tool_names)
+
+    def test_patterns_not_ending_their_first_word(self):
+        # These can match inputs whose first word is longer than the pattern's leading literal
+        self.router.add_rule('echo', r'say(?P<input>.*)')
+        self.router.add_rule('upper', r'hello\w* (?P<input>.+)')
+        self.router.add_rule('upper', r'ping\s*(?P<input>.*)')
+        self.assertEqual(self.router.route('say hi')['input_text'], 'hi')
+        self.assertEqual(self.router.route('saying hi')['input_text'], 'ing hi')
+        self.assertEqual(self.router.route('hellooo there')['tool'], 'upper')
+        self.assertEqual(self.router.route('pingpong')['input_text'], 'pong')
+        self.assertIn('echo', self.router._by_keyword)
+        self.assertNotIn('say', self.router._by_keyword)
+
+    def test_routing_is_cheap(self):
+        self.router.route('warm up')
+        per_call = timeit.timeit(lambda: self.router.route('echo: hi'), number=2000) / 2000
+        self.assertLess(per_call, 50e-6)
+
+
+class TestPlannerRouting(unittest.TestCase):
+    def setUp(self):
+        metrics.REGISTRY.clear()
+
+    def test_commands_skip_the_llm(self):
+        llm = CountingLLM()
+        memory = Memory()
+        agent = Agent(memory, Planner(llm=llm), Executor())
+        self.assertEqual(agent.act('echo: hi'), 'Echo: hi')
+        self.assertEqual(agent.act('echo "Hello"'), 'Echo: Hello')
+        self.assertEqual(asyncio.run(agent.aact('echo: async')), 'Echo: async')
+        self.assertEqual(list(agent.act_stream('echo: streamed')), ['Echo: streamed'])
+        self.assertEqual(llm.calls, 0)
+        self.assertEqual(agent.act('what is up', format_response=False), 'llm reply')
+        self.assertEqual(llm.calls, 1)
+        self.assertEqual(len(memory.get_history()), 5)
+        self.assertEqual(metrics.ROUTED_INPUTS.value(tool='echo'), 4)
+
+    def test_planner_uses_executor_tools(self):
+        registry = ToolRegistry()
+        registry.register('upper', UpperTool())
+        llm = CountingLLM("upper: from the llm")
+        agent = Agent(Memory(), Planner(llm=llm), Executor(registry))
+        self.assertEqual(agent.act('shout quietly'), 'QUIETLY')
+        self.assertEqual(agent.act('anything'), 'FROM THE LLM')
+        self.assertIn('upper', agent.planner.tool_names)
+
+    def test_route_inputs_off(self):
+        llm = CountingLLM()
+        agent = Agent(Memory(), Planner(llm=llm, route_inputs=False), Executor())
+        self.assertEqual(agent.act('echo: hi', format_response=False), 'llm reply')
+        self.assertEqual(llm.calls, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.memory import Memory
+from agent_builder.components.routing_planner import ModelTier, RoutingPlanner
+from agent_builder.llm_providers.errors import LLMServerError
+
+
+class TierLLM:
+    def __init__(self, model, fail=None):
+        self.provider = "stub"
+        self.model = model
+        self.fail = fail
+        self.prompts = []
+
+    def generate(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail == "raise":
+            raise LLMServerError(f"{self.model} down")
+        if self.fail == "message":
+            return f"An error occurred with {self.model}"
+        return f"{self.model} answered"
+
+    async def agenerate(self, prompt):
+        return self.generate(prompt)
+
+    def stream(self, prompt):
+        value = self.generate(prompt)
+        yield from value.split(" ")
+
+
+class TestRoutingPlanner(unittest.TestCase):
+    def make_planner(self, small_fail=None, **kwargs):
+        self.small, self.large = TierLLM("small", fail=small_fail), TierLLM("large")
+        return RoutingPlanner([ModelTier(self.small, max_tokens=20), self.large], **kwargs)
+
+    def test_short_prompts_go_to_the_small_tier(self):
+        planner = self.make_planner()
+        self.assertEqual(planner.plan("hi", Memory())["content"], "small answered")
+        self.assertEqual(planner.plan("word " * 100, Memory())["content"], "large answered")
+        self.assertEqual((len(self.small.prompts), len(self.large.prompts)), (1, 1))
+
+    def test_rules_and_classifier(self):
+        self.small, self.large = TierLLM("small"), TierLLM("large")
+        planner = RoutingPlanner([ModelTier(self.small, when=lambda text: "prove" not in text), self.large])
+        self.assertEqual(planner.plan("prove it", Memory())["content"], "large answered")
+        planner.classifier = lambda text, tokens: "stub:large" if text.startswith("!") else None
+        self.assertEqual(planner.plan("!hi", Memory())["content"], "large answered")
+        self.assertEqual(planner.plan("hi", Memory())["content"], "small answered")
+        planner.classifier = lambda text, tokens: "missing"
+        self.assertIn("Planning error", planner.plan("hi", Memory())["content"])
+
+    def test_errors_fall_back_to_larger_tier(self):
+        for fail in ("raise", "message"):
+            with self.assertLogs(level="WARNING"):
+                planner = self.make_planner(small_fail=fail)
+                self.assertEqual(planner.plan("hi", Memory())["content"], "large answered")
+            stats = planner.stats()
+            self.assertEqual(stats["stub:small"]["errors"], 1)
+            self.assertEqual(stats["stub:large"]["calls"], 1)
+        planner = self.make_planner(small_fail="message", fallback=False)
+        self.assertEqual(planner.plan("hi", Memory())["content"], "An error occurred with small")
+
+    def test_async_and_streaming_paths(self):
+        planner = self.make_planner(small_fail="raise")
+        with self.assertLogs(level="WARNING"):
+            self.assertEqual(asyncio.run(planner.aplan("hi", Memory()))["content"], "large answered")
+            agent = Agent(Memory(), planner, Executor())
+            self.assertEqual("".join(agent.act_stream("hi")), "largeanswered")
+
+            async def collect():
+                return "".join([delta async for delta in agent.aact_stream("hi")])
+            # Without astream the async path answers in one delta
+            self.assertEqual(asyncio.run(collect()), "large answered")
+
+    def test_tier_names_must_be_distinct(self):
+        first, second = TierLLM("same"), TierLLM("same")
+        with self.assertRaises(ValueError):
+            RoutingPlanner([ModelTier(first, max_tokens=20), second])
+        planner = RoutingPlanner([ModelTier(first, max_tokens=20, name="short"), second])
+        self.assertEqual(set(planner.stats()), {"short", "stub:same"})
+
+    def test_stats_record_latency_per_tier(self):
+        planner = self.make_planner()
+        planner.plan("hi", Memory())
+        stats = planner.stats()
+        self.assertEqual(stats["stub:small"]["calls"], 1)
+        self.assertIsNotNone(stats["stub:small"]["p50"])
+        self.assertIsNone(stats["stub:large"]["p95"])
+
+
+if __name__ == '__main__':
+    unittest.main()
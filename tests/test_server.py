@@ -0,0 +1,171 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+import unittest
+from agent_builder.components.planner import Planner
+from agent_builder.server import AgentServer
+from agent_builder.tools.token_counter_tool import TokenCounterTool, set_confirmations
+
+
+class EchoPromptLLM:
+    """Replies with the prompt it was given, so tests can see what memory contributed."""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+
+    def generate(self, prompt):
+        if self.delay:
+            time.sleep(self.delay)
+        return f"<{prompt.strip()}>"
+
+    async def agenerate(self, prompt):
+        await asyncio.sleep(self.delay)
+        return f"<{prompt.strip()}>"
+
+    def stream(self, prompt):
+        reply = self.generate(prompt)
+        yield reply[:3]
+        yield reply[3:]
+
+
+class ServerTestCase(unittest.TestCase):
+    llm_delay = 0.0
+    server_options = {}
+
+    def setUp(self):
+        planner = Planner(EchoPromptLLM(self.llm_delay), prompt_template="{memory}|{input}")
+        self.server = AgentServer(planner, port=0, **self.server_options)
+        self.thread = self.server.start_in_thread()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join(5)
+
+    def request(self, method, path, payload=None):
+        conn = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=10)
+        try:
+            body = json.dumps(payload) if payload is not None else None
+            conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+    def chat(self, payload):
+        status, _, body = self.request("POST", "/v1/chat", payload)
+        return status, json.loads(body)
+
+
+class TestAgentServer(ServerTestCase):
+    def test_chat_keeps_sessions_apart(self):
+        status, first = self.chat({"message": "hi", "session_id": "a"})
+        self.assertEqual(status, 200)
+        self.assertEqual(first, {"session_id": "a", "reply": "<|hi>"})
+        _, second = self.chat({"message": "again", "session_id": "a"})
+        self.assertIn("hi", second["reply"])
+        self.assertIn("again", second["reply"])
+        _, other = self.chat({"message": "fresh", "session_id": "b"})
+        self.assertEqual(other["reply"], "<|fresh>")
+
+    def test_new_session_id_is_assigned(self):
+        _, reply = self.chat({"message": "hi"})
+        self.assertTrue(reply["session_id"])
+
+    def test_stream(self):
+        status, headers, body = self.request("POST", "/v1/chat", {"message": "hi", "session_id": "s", "stream": True})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Type"], "text/event-stream")
+        self.assertEqual(headers["X-Session-Id"], "s")
+        events = [line[len("data: "):] for line in body.decode().split("\n\n") if line]
+        self.assertEqual(events[-1], "[DONE]")
+        self.assertEqual("".join(json.loads(e)["delta"] for e in events[:-1]), "<|hi>")
+        # The streamed turn is in the session's memory
+        _, reply = self.chat({"message": "next", "session_id": "s"})
+        self.assertIn("hi", reply["reply"])
+
+    def test_delete_session(self):
+        self.chat({"message": "hi", "session_id": "gone"})
+        status, _, body = self.request("DELETE", "/v1/sessions/gone")
+        self.assertEqual((status, json.loads(body)["deleted"]), (200, True))
+        _, reply = self.chat({"message": "back", "session_id": "gone"})
+        self.assertEqual(reply["reply"], "<|back>")
+
+    def test_bad_requests(self):
+        self.assertEqual(self.chat({"session_id": "x"})[0], 400)
+        self.assertEqual(self.request("GET", "/v1/chat")[0], 405)
+        self.assertEqual(self.request("GET", "/nowhere")[0], 404)
+
+    def test_health_and_metrics(self):
+        status, _, body = self.request("GET", "/health")
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)["status"], "ok")
+        self.chat({"message": "hi"})
+        status, headers, body = self.request("GET", "/metrics")
+        self.assertTrue(headers["Content-Type"].startswith("text/plain"))
+        self.assertIn('agent_http_requests_total{route="/v1/chat",status="200"}', body.decode())
+
+
+class TestBackpressure(ServerTestCase):
+    llm_delay = 0.3
+    server_options = {"workers": 1, "max_queue": 1}
+
+    def test_rejects_beyond_queue(self):
+        statuses = []
+        lock = threading.Lock()
+
+        def send(i):
+            status, _ = self.chat({"message": "hi", "session_id": f"s{i}"})
+            with lock:
+                statuses.append((status, f"s{i}"))
+
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.02)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(status for status, _ in statuses), [200, 200, 429, 429])
+        # Rejected requests did not create sessions
+        self.assertEqual(sorted(self.server._sessions), sorted(session for status, session in statuses if status == 200))
+
+
+class TestTimeout(ServerTestCase):
+    llm_delay = 0.5
+    server_options = {"turn_timeout": 0.05}
+
+    def test_slow_turn_returns_504(self):
+        self.assertEqual(self.chat({"message": "hi"})[0], 504)
+
+
+class SyncSlowLLM:
+    """No agenerate: the agent runs it in a worker thread, which a timeout cannot stop."""
+    def generate(self, prompt):
+        if "slow" in prompt.rsplit("|", 1)[-1]:
+            time.sleep(0.3)
+        return f"<{prompt.strip()}>"
+
+
+class TestAbandonedTurn(ServerTestCase):
+    server_options = {"turn_timeout": 0.05}
+
+    def setUp(self):
+        self.server = AgentServer(Planner(SyncSlowLLM(), prompt_template="{memory}|{input}"), port=0,
+                                  **self.server_options)
+        self.thread = self.server.start_in_thread()
+
+    def test_timed_out_turn_keeps_its_session_until_done(self):
+        self.assertEqual(self.chat({"session_id": "s", "message": "slow"})[0], 504)
+        # The next turn waits for the abandoned one, and sees it in memory
+        status, body = self.chat({"session_id": "s", "message": "fast"})
+        self.assertEqual(status, 200)
+        self.assertIn("Input: slow", body["reply"])
+
+
+class TestTokenCounterConfirmations(unittest.TestCase):
+    def tearDown(self):
+        set_confirmations(None)
+
+    def test_disabled_confirmations_never_prompt(self):
+        set_confirmations(False)
+        self.assertTrue(TokenCounterTool(interactive=True).run("count these tokens"))
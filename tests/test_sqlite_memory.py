@@ -0,0 +1,171 @@
+import asyncio
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.executor import Executor
+from agent_builder.components.planner import Planner
+from agent_builder.components.sqlite_memory import MemoryWriteError, SQLiteMemory, SQLiteMemoryStore
+
+
+class EchoLLM:
+    def generate(self, prompt):
+        return f"reply to {prompt.splitlines()[-1]}"
+
+
+class FlakyStore(SQLiteMemoryStore):
+    """Fails its first `failures` transactions."""
+    def __init__(self, path, failures, **kwargs):
+        self.failures = failures
+        super().__init__(path, **kwargs)
+
+    def _write(self, conn, batch):
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        super()._write(conn, batch)
+
+
+class StuckStore(SQLiteMemoryStore):
+    """Its writer blocks until unblock is set."""
+    def __init__(self, path, **kwargs):
+        self.unblock = threading.Event()
+        super().__init__(path, **kwargs)
+
+    def _write(self, conn, batch):
+        self.unblock.wait(5)
+        super()._write(conn, batch)
+
+
+class TestSQLiteMemory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "memory.db")
+        self.store = SQLiteMemoryStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_same_interface_as_memory(self):
+        memory = SQLiteMemory(session_id="s1", max_turns=2, store=self.store)
+        memory.add_interaction(user="hi", agent="hello")
+        memory.add_interaction(input_data="q", result={"a": 1})
+        memory.add_interaction(input_data="q2", result="r2")
+        memory.add_interaction(input_data=None, result=None)
+        self.assertEqual(memory.get_history(), [{'input': 'q', 'result': {'a': 1}}, {'input': 'q2', 'result': 'r2'}])
+        self.assertEqual(memory.get_context(), "Input: q\nResult: {'a': 1}\nInput: q2\nResult: r2")
+        memory.reset()
+        self.assertEqual(memory.get_context(), "")
+
+    def test_sessions_are_isolated_and_durable(self):
+        a = SQLiteMemory(session_id="a", store=self.store)
+        b = SQLiteMemory(session_id="b", store=self.store)
+        a.add_interaction(user="from a", agent="ok")
+        b.add_interaction(user="from b", agent="ok")
+        b.reset()
+        b.add_interaction(user="b again", agent="ok")
+        self.store.close()
+        reopened = SQLiteMemoryStore(self.path)
+        try:
+            self.assertEqual(SQLiteMemory(session_id="a", store=reopened).get_history(), [{'user': 'from a', 'agent': 'ok'}])
+            self.assertEqual(SQLiteMemory(session_id="b", store=reopened).get_history(), [{'user': 'b again', 'agent': 'ok'}])
+            self.assertEqual(sorted(reopened.sessions()), ["a", "b"])
+        finally:
+            reopened.close()
+
+    def test_failed_writes_are_retried_or_reported(self):
+        path = os.path.join(self.tmp.name, "flaky.db")
+        store = FlakyStore(path, failures=2, write_retries=3)
+        try:
+            memory = SQLiteMemory(session_id="s", store=store)
+            with self.assertLogs(level="WARNING"):
+                memory.add_interaction(user="hi", agent="hello")
+                self.assertEqual(memory.get_history(), [{'user': 'hi', 'agent': 'hello'}])
+            store.failures = 10
+            with self.assertLogs(level="WARNING"):
+                memory.add_interaction(user="lost", agent="turn")
+                with self.assertRaises(MemoryWriteError):
+                    memory.get_context()
+                with self.assertRaises(MemoryWriteError):
+                    store.flush()
+            # Reported once; the turns that were written are still readable
+            self.assertEqual(memory.get_history(), [{'user': 'hi', 'agent': 'hello'}])
+            self.assertEqual(store.failed_writes, 1)
+        finally:
+            store.close()
+
+    def test_stuck_writer_does_not_stall_the_event_loop(self):
+        store = StuckStore(os.path.join(self.tmp.name, "stuck.db"), read_timeout=0.3)
+        try:
+            memory = SQLiteMemory(session_id="s", store=store)
+            memory.add_interaction(user="hi", agent="hello")
+            agent = Agent(memory, Planner(llm=EchoLLM(), prompt_template="{memory}\nUser: {input}"), Executor())
+
+            async def turn_and_ticks():
+                turn, ticks = asyncio.ensure_future(agent.aact("next", format_response=False)), 0
+                while not turn.done():
+                    ticks += 1
+                    await asyncio.sleep(0.01)
+                return turn.result(), ticks
+
+            with self.assertLogs(level="WARNING"):
+                reply, ticks = asyncio.run(turn_and_ticks())
+            # The read gave up after read_timeout, and the loop kept running meanwhile
+            self.assertEqual(reply, "reply to User: next")
+            self.assertGreater(ticks, 5)
+        finally:
+            store.unblock.set()
+            store.close()
+
+    def test_wal_and_index(self):
+        SQLiteMemory(session_id="x", store=self.store).add_interaction(user="u", agent="a")
+        self.store.flush()
+        conn = sqlite3.connect(self.path)
+        try:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            plan = " ".join(str(row) for row in conn.execute(
+                "EXPLAIN QUERY PLAN SELECT text FROM memory_turns WHERE session_id = ? ORDER BY id DESC LIMIT 5", ("x",)))
+            self.assertIn("memory_turns_session", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+        finally:
+            conn.close()
+
+    def test_concurrent_sessions_share_commits(self):
+        store = SQLiteMemoryStore(os.path.join(self.tmp.name, "batched.db"), flush_interval=0.02)
+        def run_sessions():
+            def worker(i):
+                memory = SQLiteMemory(session_id=f"s{i}", store=store)
+                for turn in range(5):
+                    memory.add_interaction(input_data=f"{i}-{turn}", result="ok")
+                self.assertEqual(len(memory.get_history()), 5)
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        try:
+            run_sessions()
+            store.flush()
+            conn = sqlite3.connect(store.path)
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM memory_turns").fetchone()[0], 100)
+            conn.close()
+            # Turns from concurrent sessions were grouped into shared transactions
+            self.assertLess(store.transactions, 100)
+        finally:
+            store.close()
+
+    def test_agent_with_sqlite_memory(self):
+        memory = SQLiteMemory(session_id="chat", store=self.store)
+        planner = Planner(llm=EchoLLM(), prompt_template="{memory}\nUser: {input}")
+        agent = Agent(memory, planner, Executor())
+        agent.act("first", format_response=False)
+        self.assertEqual(agent.act("second", format_response=False), "reply to User: second")
+        self.assertEqual([turn['input'] for turn in memory.get_history()], ["first", "second"])
+        self.assertIn("Result: reply to User: first", memory.get_context())
+
+
+if __name__ == '__main__':
+    unittest.main()
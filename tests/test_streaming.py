@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+from agent_builder.agent import Agent
+from agent_builder.components.memory import Memory
+from agent_builder.components.planner import Planner
+from agent_builder.components.executor import Executor
+from agent_builder.llm_providers.ollama_llm import OllamaLLM
+from agent_builder.llm_providers.anaconda_llm import AnacondaLLM
+from tests.stub_llm_server import start_stub_server
+
+
+class StreamingMockLLM:
+    def __init__(self, deltas):
+        self.deltas = deltas
+    def generate(self, prompt):
+        return "".join(self.deltas)
+    def stream(self, prompt):
+        yield from self.deltas
+    async def astream(self, prompt):
+        for delta in self.deltas:
+            yield delta
+
+
+class TestStreaming(unittest.TestCase):
+    def test_act_stream_yields_deltas_and_records_memory(self):
+        memory = Memory()
+        agent = Agent(memory, Planner(llm=StreamingMockLLM(["Hel", "lo", " there", "!"])), Executor())
+        self.assertEqual(list(agent.act_stream('hi')), ["Hel", "lo", " there", "!"])
+        self.assertEqual(memory.get_history()[0]['result'], 'Hello there!')
+
+    def test_tool_call_is_not_streamed_as_text(self):
+        memory = Memory()
+        agent = Agent(memory, Planner(llm=StreamingMockLLM(["ec", "ho", ": hi ", "there"])), Executor())
+        self.assertEqual(list(agent.act_stream('hi')), ['Echo: hi there'])
+        self.assertEqual(memory.get_history()[0]['result'], 'Echo: hi there')
+
+    def test_colon_after_plain_text_is_streamed(self):
+        agent = Agent(Memory(), Planner(llm=StreamingMockLLM(["Note", ": fine"])), Executor())
+        self.assertEqual("".join(agent.act_stream('hi')), 'Note: fine')
+
+    def test_non_streaming_llm_yields_single_delta(self):
+        class PlainLLM:
+            def generate(self, prompt):
+                return {"content": "whole answer", "raw": None}
+        agent = Agent(Memory(), Planner(llm=PlainLLM()), Executor())
+        self.assertEqual(list(agent.act_stream('hi')), ['whole answer'])
+
+    def test_aact_stream(self):
+        agent = Agent(Memory(), Planner(llm=StreamingMockLLM(["a", "b", "c"])), Executor())
+
+        async def collect():
+            return [delta async for delta in agent.aact_stream('hi')]
+        self.assertEqual(asyncio.run(collect()), ["a", "b", "c"])
+
+
+class TestProviderStreaming(unittest.TestCase):
+    def setUp(self):
+        self.server, self.url = start_stub_server()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_ollama_stream(self):
+        llm = OllamaLLM(base_url=self.url)
+        self.assertEqual(list(llm.stream("hi")), ["hi ", "streamed ", "back "])
+
+        async def collect():
+            return [delta async for delta in llm.astream("hi")]
+        self.assertEqual(asyncio.run(collect()), ["hi ", "streamed ", "back "])
+
+    def test_anaconda_stream(self):
+        llm = AnacondaLLM(base_url=self.url)
+        self.assertEqual("".join(llm.stream("hi")), "hi streamed back ")
+
+        async def collect():
+            return [delta async for delta in llm.astream("hi")]
+        self.assertEqual("".join(asyncio.run(collect())), "hi streamed back ")
+
+
+if __name__ == '__main__':
+    unittest.main()
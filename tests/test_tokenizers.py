@@ -0,0 +1,57 @@
+import random
+import unittest
+from agent_builder.tools.token_counter_tool import TokenCounterTool
+from agent_builder.tools.tokenizers import (
+    BPETokenizer, MemoizedTokenizer, bundled_tokenizer, get_tokenizer, register_tokenizer,
+)
+from agent_builder.tools.tokenizers.bpe import BUNDLED_VOCAB, load_ranks, train
+
+SAMPLE = (
+    "User: What's the weather like in Paris today?\n"
+    "Agent: It's sunny, around 24°C — perfect for a walk along the Seine.\n"
+    "Input: echo: hello world\nResult: Echo: hello world\n"
+    "    def generate(self, prompt):\n        return self.llm.generate(prompt)  # 42 tokens?\n\n"
+)
+
+
+class TestTokenizers(unittest.TestCase):
+    def test_pure_python_engine_matches_bundled_engine(self):
+        pure = BPETokenizer(load_ranks(BUNDLED_VOCAB))
+        self.assertEqual(pure.encode(SAMPLE), bundled_tokenizer().encode(SAMPLE))
+        self.assertEqual(pure.count(SAMPLE), len(pure.encode(SAMPLE)))
+
+    def test_memoized_chunk_counts_are_exact(self):
+        pure = BPETokenizer(load_ranks(BUNDLED_VOCAB))
+        memo = MemoizedTokenizer(pure)
+        rng = random.Random(3)
+        lines = SAMPLE.splitlines(keepends=True) + ["\n", "  \n", "x\r\n", "\tindent\n"]
+        for _ in range(200):
+            text = "".join(rng.choice(lines) for _ in range(rng.randint(0, 12)))
+            self.assertEqual(memo.count(text), pure.count(text))
+        self.assertEqual(memo.count_many(["a b", "", SAMPLE]), [pure.count("a b"), 0, pure.count(SAMPLE)])
+
+    def test_subword_counts_exceed_whitespace_split(self):
+        counter = TokenCounterTool()
+        self.assertGreater(counter.tokenizer(SAMPLE), len(SAMPLE.split()))
+        self.assertEqual(counter.count_many([SAMPLE, SAMPLE]), [counter.tokenizer(SAMPLE)] * 2)
+        self.assertEqual(TokenCounterTool(tokenizer=lambda t: len(t.split())).count_many(["a b c"]), [3])
+
+    def test_register_tokenizer_per_provider(self):
+        class CharTokenizer:
+            name = "chars"
+            def count(self, text):
+                return len(text)
+            def encode(self, text):
+                return list(text.encode())
+        register_tokenizer("charprovider", lambda model: CharTokenizer())
+        self.assertEqual(get_tokenizer("charprovider", "any").count("abc\ndef"), 7)
+        self.assertEqual(TokenCounterTool(provider="charprovider").tokenizer("abcd"), 4)
+
+    def test_train_learns_frequent_pairs(self):
+        ranks = train(["hello hello hello world"], vocab_size=260)
+        self.assertEqual(len(ranks), 260)
+        self.assertLess(BPETokenizer(ranks).count(" hello"), len(" hello"))
+
+
+if __name__ == '__main__':
+    unittest.main()